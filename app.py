@@ -1,10 +1,18 @@
 import streamlit as st
 import cv2
 import numpy as np
-from ultralytics import YOLO
+from yolo_core.model_registry import get_model
+from yolo_core.detections import Detections
+from yolo_core.detection_store import DetectionStore
+from yolo_core.metrics import metrics, profiler
+from yolo_core.renderer import AnnotationRenderer
+from yolo_core.recorder import VideoRecorder, capture_fps
+from yolo_core.rules import EventRule, RuleEngine
+from yolo_core.motion import GatedDetector, MotionGate, load_motion_config
+from yolo_core.tracker import TrackedDetector, Tracker
+from collections import deque
 import time
 import pandas as pd
-from datetime import datetime
 import os
 
 # Configuración de la página
@@ -41,17 +49,61 @@ confidence = st.sidebar.slider("Umbral de confianza", 0.0, 1.0, 0.5)
 # Selección de cámara
 camera_index = st.sidebar.number_input("Índice de cámara", 0, 10, 0)
 
+# Ventanas de estadísticas y frecuencia de refresco del panel
+stats_windows = st.sidebar.multiselect(
+    "Ventanas de estadísticas (s)", [10, 30, 60, 300], default=[10, 60]
+) or [10]
+refresh_interval = st.sidebar.slider("Refresco de estadísticas (s)", 0.1, 5.0, 1.0)
+
 # Opciones de grabación
 record_video = st.sidebar.checkbox("Grabar video")
 if record_video:
     st.sidebar.info("El video se guardará en la carpeta 'recordings'")
 
-# Cargar modelo
-@st.cache_resource
-def load_model(model_path):
-    return YOLO(model_path)
+# Profiler de muestreo activable en caliente (el módulo persiste entre re-ejecuciones)
+profile = st.sidebar.checkbox("Profiler de muestreo", value=profiler.running)
+if profile and not profiler.running:
+    profiler.start()
+elif not profile and profiler.running:
+    profiler.stop()
+    path = profiler.write_folded(os.getenv("PROFILE_OUTPUT", "profile.folded"))
+    st.sidebar.success(f"Perfil guardado en {path}")
+
+# Cargar modelo (el registro compartido mantiene un LRU acotado de modelos residentes)
+model = get_model(model_type)
+
+# Grabación en segundo plano: continua o sólo alrededor de detecciones de ciertas clases
+record_classes = []
+if record_video:
+    record_mode = st.sidebar.radio("Modo de grabación", ["Continua", "Por evento"])
+    if record_mode == "Por evento":
+        record_classes = st.sidebar.multiselect("Grabar al detectar", list(model.names.values()))
+        pre_roll = st.sidebar.slider("Segundos antes del evento", 0, 30, 5)
+        post_roll = st.sidebar.slider("Segundos después del evento", 1, 60, 10)
+    segment_minutes = st.sidebar.number_input("Duración de cada archivo (min)", 1, 120, 5)
+    max_disk_mb = st.sidebar.number_input("Espacio máximo en disco (MB, 0 = sin límite)", 0, 1000000, 0)
+
+# Inferencia sólo cuando la escena cambia; los valores se guardan por cámara (MOTION_CONFIG da los iniciales)
+motion_defaults = load_motion_config(camera_index)
+motion_enabled = st.sidebar.checkbox("Inferir sólo con movimiento", value=bool(motion_defaults),
+                                     key=f"motion_{camera_index}")
+if motion_enabled:
+    motion_settings = dict(motion_defaults)
+    motion_settings['threshold'] = st.sidebar.slider(
+        "Umbral de cambio (% de píxeles)", 0.0, 5.0, motion_defaults.get('threshold', 0.002) * 100, 0.05,
+        key=f"motion_threshold_{camera_index}") / 100
+    motion_settings['max_stale'] = st.sidebar.slider(
+        "Inferir al menos cada (s)", 0.5, 30.0, float(motion_defaults.get('max_stale', 2.0)),
+        key=f"motion_stale_{camera_index}")
+    motion_settings['regions'] = st.sidebar.checkbox(
+        "Sólo la región con cambios", value=motion_defaults.get('regions', False),
+        key=f"motion_regions_{camera_index}")
 
-model = load_model(model_type)
+# Seguimiento: IDs estables; las estadísticas cuentan objetos que entran, no cajas por frame
+track_objects = st.sidebar.checkbox("Seguimiento de objetos", value=False)
+detect_every = 1
+if track_objects:
+    detect_every = st.sidebar.slider("Detectar cada N frames", 1, 10, 1)
 
 # Crear columnas para la visualización
 col1, col2 = st.columns(2)
@@ -61,88 +113,156 @@ if 'frame_count' not in st.session_state:
     st.session_state.frame_count = 0
 if 'start_time' not in st.session_state:
     st.session_state.start_time = time.time()
-if 'detections' not in st.session_state:
-    st.session_state.detections = []
+# Buffer circular de detecciones con agregados incrementales por ventana
+if ('detections' not in st.session_state
+        or st.session_state.detections.windows != tuple(sorted(stats_windows))):
+    st.session_state.detections = DetectionStore(
+        capacity=10000, num_classes=len(model.names), windows=stats_windows)
+
+# Renderizador con etiquetas cacheadas: dibuja sobre el frame capturado y da RGB sin ida y vuelta
+renderer = AnnotationRenderer(model.names)
+
+def detect(image):
+    with metrics.time('model'):
+        results = model(image, conf=confidence)
+    metrics.observe_speed(results)
+    # Una sola transferencia a NumPy por resultado
+    return Detections.from_results(results)
+
+# Con la compuerta de movimiento los frames estáticos reutilizan las detecciones anteriores
+gated = GatedDetector(detect, MotionGate(**motion_settings), camera=camera_index) if motion_enabled else None
+detector = (lambda image: gated(image)[0]) if gated is not None else detect
+tracked = None
+track_log = deque(maxlen=20)
+if track_objects:
+    tracked = TrackedDetector(detector, Tracker(names=model.names, camera=camera_index), detect_every)
 
 # Función para procesar el frame
 def process_frame(frame):
-    results = model(frame, conf=confidence)
-    annotated_frame = results[0].plot()
+    track_events = None
+    if tracked is not None:
+        detections, track_events = tracked(frame)
+        # Cada objeto cuenta una vez, al entrar
+        entered = [e['track_id'] for e in track_events if e['type'] == 'enter']
+        counted = detections[np.isin(detections.track_id, entered)]
+        for event in track_events:
+            track_log.appendleft({'hora': time.strftime('%H:%M:%S'), 'evento': event['type'],
+                                  'clase': event['class'], 'id': event['track_id'],
+                                  'duración (s)': round(event['duration'], 1)})
+    else:
+        detections = counted = detector(frame)
 
     # Actualizar estadísticas
     st.session_state.frame_count += 1
-    for r in results:
-        for box in r.boxes:
-            st.session_state.detections.append({
-                'class': model.names[int(box.cls[0])],
-                'confidence': float(box.conf[0]),
-                'timestamp': datetime.now()
-            })
+    st.session_state.detections.add(counted)
+
+    # BGR sólo si se graba; RGB siempre para mostrarlo
+    with metrics.time('plot'):
+        annotated_bgr, annotated_rgb = renderer.render(frame, detections, bgr=record_video, rgb=True)
 
-    return annotated_frame, results
+    if record_triggers is not None and record_triggers.evaluate(detections, track_events=track_events):
+        out.trigger()
+
+    return annotated_bgr, annotated_rgb
 
 # Configurar captura de video
 cap = cv2.VideoCapture(camera_index)
 
-# Configurar grabación si está activada
-if record_video and not os.path.exists('recordings'):
-    os.makedirs('recordings')
-
+# Configurar grabación si está activada (codifica en su propio hilo, rota y aplica la cuota)
+out = None
+record_triggers = None
 if record_video:
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(
-        f'recordings/recording_{datetime.now().strftime("%Y%m%d_%H%M%S")}.mp4',
-        fourcc, fps, (width, height)
+    event_mode = bool(record_classes)
+    out = VideoRecorder(
+        output_dir='recordings',
+        fps=capture_fps(cap),
+        segment_seconds=segment_minutes * 60,
+        max_total_bytes=max_disk_mb * 1024 * 1024 or None,
+        mode='event' if event_mode else 'continuous',
+        pre_roll=pre_roll if event_mode else 0,
+        post_roll=post_roll if event_mode else 0,
     )
+    if event_mode:
+        # La regla se repite cada segundo mientras la clase siga presente y alarga el clip
+        record_triggers = RuleEngine(model.names, [
+            EventRule(name, {'min_confidence': confidence, 'repeat_interval': 1.0})
+            for name in record_classes])
 
 # Placeholder para el video
 video_placeholder = col1.empty()
 stats_placeholder = col2.empty()
+chart_placeholder = col2.empty()
+tracks_placeholder = col2.empty()
+fps_placeholder = st.sidebar.empty()
+metrics_expander = st.sidebar.expander("Métricas por etapa")
+metrics_placeholder = metrics_expander.empty()
+frames_done = metrics.counter('frames_total', 'Frames fully processed')
+
+def render_stats():
+    store = st.session_state.detections
+    now = time.time()
+    tables = []
+    for window in store.windows:
+        summary = store.summary(window, model.names, now)
+        df = pd.DataFrame(summary).set_index('class')
+        df.columns = [f"{c} ({window}s)" for c in df.columns]
+        tables.append(df)
+    table = pd.concat(tables, axis=1).fillna(0)
+    stats_placeholder.dataframe(table)
+    first = store.windows[0]
+    chart_placeholder.bar_chart(table[f"count ({first}s)"])
+    if tracked is not None:
+        tracks = tracked.tracker.stats()
+        with tracks_placeholder.container():
+            st.caption(f"Con seguimiento, count es el número de objetos nuevos. Activos: {tracks['active']}, "
+                       f"entradas {tracks['entered']}, salidas {tracks['exited']}")
+            if track_log:
+                st.dataframe(pd.DataFrame(list(track_log)))
+    lines = metrics.summary_lines()
+    if gated is not None:
+        gate = gated.stats()
+        lines.append(f"movimiento: {gate['skipped']} frames saltados ({gate['skip_ratio']:.0%}), "
+                     f"{gate['region_inferences']} por región, ~{gate['saved_s']:.1f} s ahorrados")
+    if profiler.running:
+        lines += [f"{name}: {share:.1%}" for name, share in profiler.top(10)]
+    metrics_placeholder.code("\n".join(lines))
+
+last_refresh = 0.0
 
 try:
     while True:
-        ret, frame = cap.read()
+        with metrics.time('capture'):
+            ret, frame = cap.read()
         if not ret:
             st.error("Error al acceder a la cámara")
             break
 
         # Procesar frame
-        processed_frame, results = process_frame(frame)
-
-        # Convertir frame para Streamlit
-        processed_frame = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB)
+        processed_bgr, processed_rgb = process_frame(frame)
 
         # Mostrar frame
-        video_placeholder.image(processed_frame, channels="RGB", use_column_width=True)
-
-        # Guardar frame si está activada la grabación
-        if record_video:
-            out.write(cv2.cvtColor(processed_frame, cv2.COLOR_RGB2BGR))
-
-        # Mostrar estadísticas
-        elapsed_time = time.time() - st.session_state.start_time
-        fps = st.session_state.frame_count / elapsed_time if elapsed_time > 0 else 0
-
-        # Crear DataFrame con las últimas detecciones
-        if st.session_state.detections:
-            df = pd.DataFrame(st.session_state.detections[-100:])  # Últimas 100 detecciones
-            stats_placeholder.dataframe(df)
+        with metrics.time('display'):
+            video_placeholder.image(processed_rgb, channels="RGB", use_column_width=True)
 
-        # Mostrar FPS
-        st.sidebar.metric("FPS", f"{fps:.1f}")
+        # Guardar frame si está activada la grabación (sólo se encola, nunca bloquea)
+        if out is not None:
+            out.write(processed_bgr)
+        frames_done.inc()
 
-        # Limpiar detecciones antiguas
-        if len(st.session_state.detections) > 1000:
-            st.session_state.detections = st.session_state.detections[-1000:]
+        # Redibujar estadísticas a frecuencia limitada, no en cada frame
+        now = time.time()
+        if now - last_refresh >= refresh_interval:
+            last_refresh = now
+            elapsed_time = now - st.session_state.start_time
+            fps = st.session_state.frame_count / elapsed_time if elapsed_time > 0 else 0
+            fps_placeholder.metric("FPS", f"{fps:.1f}")
+            render_stats()
 
 except Exception as e:
     st.error(f"Error: {str(e)}")
 
 finally:
     cap.release()
-    if record_video:
-        out.release()
+    if out is not None:
+        out.close()
     cv2.destroyAllWindows()
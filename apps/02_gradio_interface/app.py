@@ -1,50 +1,158 @@
+"""
+Gradio interface for YOLO object detection.
+
+Requests are queued and batched by Gradio (batch=True): one handler call receives up to
+max_batch_size images and runs them through the model in a single call. The handler is async
+and hands inference to a dedicated worker pool, so Gradio's event loop keeps serving the UI and
+the queue while the model runs.
+
+Configuration (environment):
+    MODEL_PATH            weights (default yolov8n.pt)
+    GRADIO_MAX_BATCH_SIZE images per model call (default 8)
+    GRADIO_CONCURRENCY    batches handled at the same time (default 2)
+    GRADIO_QUEUE_SIZE     requests waiting before new ones are refused (default 64)
+    INFER_WORKERS         inference threads; each extra worker loads its own model copy (default 1)
+    RESULT_CACHE_*        result cache for resubmitted images (see yolo_core/result_cache.py)
+"""
+import asyncio
 import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import gradio as gr
-from ultralytics import YOLO
-import cv2
-import numpy as np
 
-# Load YOLO model
+# Outside Docker the shared modules live at the repository root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from yolo_core.model_registry import ModelRegistry, get_model, registry
+from yolo_core.detections import Detections
+from yolo_core.metrics import metrics, install_profiler_signal, start_logger_from_env
+from yolo_core.renderer import AnnotationRenderer
+from yolo_core.result_cache import ResultCache, image_key
+from yolo_core.tiling import TiledDetector
+
 model_path = os.getenv("MODEL_PATH", "yolov8n.pt")
-model = YOLO(model_path)
+tile_size = int(os.getenv("TILE_SIZE", "640"))
+tile_overlap = float(os.getenv("TILE_OVERLAP", "0.2"))
+max_batch_size = int(os.getenv("GRADIO_MAX_BATCH_SIZE", "8"))
+concurrency = int(os.getenv("GRADIO_CONCURRENCY", "2"))
+queue_size = int(os.getenv("GRADIO_QUEUE_SIZE", "64"))
+infer_workers = int(os.getenv("INFER_WORKERS", "1"))
+
+# Resubmitted images (retries, refreshes) are answered from the cache without inference
+cache = ResultCache.from_env('gradio')
+
+# Inference runs here, never on Gradio's event loop
+executor = ThreadPoolExecutor(max_workers=infer_workers, thread_name_prefix="yolo-infer")
 
-def process_image(image):
-    """Process image with YOLO model."""
-    if image is None:
-        return None, "No image provided"
+# Each worker thread keeps its own renderer (and its own model when there are several workers)
+_local = threading.local()
 
-    # Run inference
-    results = model(image)
 
-    # Get the first result
-    result = results[0]
+def get_renderer():
+    renderer = getattr(_local, "renderer", None)
+    if renderer is None:
+        renderer = _local.renderer = AnnotationRenderer()
+    return renderer
 
-    # Draw boxes on the image
-    annotated_img = result.plot()
 
-    # Get detection information
-    detections = []
-    for box in result.boxes:
-        class_id = int(box.cls[0])
-        confidence = float(box.conf[0])
-        class_name = result.names[class_id]
-        detections.append(f"{class_name}: {confidence:.2f}")
+def worker_model():
+    """The shared model with one worker; a private copy per worker otherwise (models are not thread-safe)."""
+    if infer_workers <= 1:
+        return get_model(model_path)
+    own = getattr(_local, "registry", None)
+    if own is None:
+        own = _local.registry = ModelRegistry(max_models=1, warmup=registry.warmup, imgsz=registry.imgsz,
+                                              backend=registry.backend)
+    return own.get(model_path)
 
-    return annotated_img, "\n".join(detections)
+
+def infer_batch(images, tiled):
+    """Detect on a batch of images (one model call for the non-tiled ones) and annotate them."""
+    model = worker_model()
+    detections = [None] * len(images)
+    keys = [None] * len(images)
+    if cache is not None:
+        with metrics.time('hash'):
+            for i, (image, t) in enumerate(zip(images, tiled)):
+                if image is not None:
+                    keys[i] = image_key(image, model_path, registry.backend, registry.imgsz,
+                                        (tile_size, tile_overlap) if t else None)
+                    detections[i] = cache.get(keys[i])
+
+    whole = [i for i, (image, t) in enumerate(zip(images, tiled))
+             if image is not None and not t and detections[i] is None]
+    if whole:
+        t0 = time.perf_counter()
+        with metrics.time('model'):
+            results = model([images[i] for i in whole], verbose=False)
+        per_image = (time.perf_counter() - t0) / len(whole)
+        metrics.observe_speed(results)
+        metrics.histogram('batch_size', 'Images per model call',
+                          buckets=(1, 2, 4, 8, 16, 32, 64)).observe(len(whole))
+        for i, result in zip(whole, results):
+            detections[i] = Detections.from_result(result)
+            if cache is not None:
+                cache.put(keys[i], detections[i], per_image)
+    for i, (image, t) in enumerate(zip(images, tiled)):
+        if image is not None and t and detections[i] is None:
+            # Sliced mode runs all tiles of a large image as one batch
+            t0 = time.perf_counter()
+            detections[i] = TiledDetector(model, tile=tile_size, overlap=tile_overlap)(image)
+            if cache is not None:
+                cache.put(keys[i], detections[i], time.perf_counter() - t0)
+
+    annotated, texts = [], []
+    renderer = get_renderer()
+    for image, found in zip(images, detections):
+        if found is None:
+            annotated.append(None)
+            texts.append("No image provided")
+            continue
+        # Draw boxes on a copy of the uploaded image (Gradio images are RGB)
+        with metrics.time('plot'):
+            annotated.append(renderer.draw(image.copy(), found, rgb=True))
+        texts.append("\n".join(f"{name}: {conf:.2f}"
+                                for name, conf in zip(found.labels(), found.conf.tolist())))
+    return annotated, texts
+
+
+async def process_images(images, tiled):
+    """Batched handler: Gradio passes one list per input and expects one list per output."""
+    metrics.counter('requests_total', 'HTTP requests', endpoint='process_image').inc(len(images))
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, infer_batch, images, tiled)
 
 # Create Gradio interface
 iface = gr.Interface(
-    fn=process_image,
-    inputs=gr.Image(type="numpy"),
+    fn=process_images,
+    inputs=[
+        gr.Image(type="numpy"),
+        gr.Checkbox(label="Tiled inference (for 4K and larger images with small objects)")
+    ],
     outputs=[
         gr.Image(label="Detected Objects"),
         gr.Textbox(label="Detection Results")
     ],
     title="YOLO Object Detection",
-    description="Upload an image to detect objects using YOLO"
+    description="Upload an image to detect objects using YOLO",
+    batch=True,
+    max_batch_size=max_batch_size,
 )
+# Bounded queue; api_open=False so REST calls cannot skip it
+if int(gr.__version__.split(".")[0]) >= 4:
+    # Gradio 4 renamed concurrency_count (the root requirements.txt allows 4.x)
+    iface.queue(default_concurrency_limit=concurrency, max_size=queue_size, api_open=False)
+else:
+    iface.queue(concurrency_count=concurrency, max_size=queue_size, api_open=False)
 
 # Launch the app
 if __name__ == "__main__":
     server_name = os.getenv("GRADIO_SERVER_NAME", "0.0.0.0")
+    # Load and warm up the model before accepting requests
+    get_model(model_path)
+    # Periodic metric dump (METRICS_LOG_INTERVAL) and SIGUSR1 profiler toggle
+    start_logger_from_env(default_interval=60)
+    install_profiler_signal()
     iface.launch(server_name=server_name, server_port=7860, share=True)
@@ -0,0 +1,146 @@
+"""
+Dynamic micro-batcher for the YOLO FastAPI service.
+
+Requests from many clients are queued and grouped into a single
+``model([...])`` call, bounded by a maximum batch size and a short
+maximum wait window.
+"""
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+
+class BatchStats:
+    """Latency and throughput accounting for one batch-size setting."""
+
+    def __init__(self, window=2048):
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.images = 0
+        self.batches = 0
+        self.busy_time = 0.0
+        self.first_ts = None
+        self.last_ts = None
+
+    def record_batch(self, size, infer_time, latencies):
+        now = time.perf_counter()
+        if self.first_ts is None:
+            self.first_ts = now - infer_time
+        self.last_ts = now
+        self.images += size
+        self.batches += 1
+        self.busy_time += infer_time
+        self.batch_sizes.append(size)
+        self.latencies.extend(latencies)
+
+    def summary(self):
+        if not self.latencies:
+            return {"images": 0, "batches": 0}
+        lat_ms = np.asarray(self.latencies) * 1000.0
+        wall = (self.last_ts - self.first_ts) if self.first_ts is not None else 0.0
+        return {
+            "images": self.images,
+            "batches": self.batches,
+            "mean_batch_size": float(np.mean(self.batch_sizes)),
+            "latency_p50_ms": float(np.percentile(lat_ms, 50)),
+            "latency_p99_ms": float(np.percentile(lat_ms, 99)),
+            "images_per_sec": self.images / wall if wall > 0 else 0.0,
+            "inference_images_per_sec": self.images / self.busy_time if self.busy_time > 0 else 0.0,
+        }
+
+
+class MicroBatcher:
+    """
+    Collects images submitted concurrently and runs them through the model in batches.
+
+    ``infer_fn`` receives a list of images and must return one result per image.
+    It runs in the default executor so the event loop stays responsive.
+    """
+
+    def __init__(self, infer_fn, max_batch_size=8, max_wait_ms=10, max_queue=1024):
+        self.infer_fn = infer_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue = max_queue
+        self.stats = {}
+        self._queue = None
+        self._task = None
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def configure(self, max_batch_size=None, max_wait_ms=None):
+        """Change the batching settings; stats are kept separately per setting."""
+        if max_batch_size is not None:
+            self.max_batch_size = max(1, int(max_batch_size))
+        if max_wait_ms is not None:
+            self.max_wait_ms = max(0.0, float(max_wait_ms))
+
+    def _setting_key(self):
+        return f"batch={self.max_batch_size},wait_ms={self.max_wait_ms:g}"
+
+    async def submit(self, image):
+        """Queue one image and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        items = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while len(items) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return items
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            # Descarta peticiones cuyo cliente ya se fue
+            items = [item for item in items if not item[1].cancelled()]
+            if not items:
+                continue
+            key = self._setting_key()
+            images = [item[0] for item in items]
+            t0 = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(None, self.infer_fn, images)
+            except Exception as e:
+                for _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            done = time.perf_counter()
+            for (_, future, _), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+            stats = self.stats.setdefault(key, BatchStats())
+            stats.record_batch(len(items), done - t0, [done - item[2] for item in items])
+
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def summary(self):
+        return {
+            "current": self._setting_key(),
+            "queue_depth": self.queue_depth(),
+            "settings": {key: stats.summary() for key, stats in self.stats.items()},
+        }
@@ -1,7 +1,147 @@
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
-app = FastAPI(title="YOLO FastAPI Service")
+import cv2
+import numpy as np
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from batcher import MicroBatcher
+from streaming import MJPEG_BOUNDARY, FrameSource, LatestSlot, StreamLimiter, encode_binary, mjpeg_part
+
+# Fuera de Docker los módulos compartidos están en la raíz del repositorio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from yolo_core.model_registry import get_model, registry
+from yolo_core.detections import Detections
+from yolo_core.metrics import metrics, profiler
+from yolo_core.renderer import AnnotationRenderer
+from yolo_core.result_cache import ResultCache, image_key
+from yolo_core.tiling import TiledDetector
+
+MODEL_PATH = os.getenv("MODEL_PATH", "yolov8n.pt")
+MIN_CONF = float(os.getenv("MIN_CONF", "0.25"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+TILE_SIZE = int(os.getenv("TILE_SIZE", "640"))
+TILE_OVERLAP = float(os.getenv("TILE_OVERLAP", "0.2"))
+MAX_STREAMS = int(os.getenv("MAX_STREAMS", "4"))
+# Fuentes que /stream/mjpeg puede abrir (índices de cámara o rutas), separadas por comas
+STREAM_SOURCES = [s.strip() for s in os.getenv("STREAM_SOURCES", "0").split(",") if s.strip()]
+
+logger = logging.getLogger("yolo_service")
+
+# Sin estado entre imágenes: se comparte entre peticiones
+tiler = TiledDetector(tile=TILE_SIZE, overlap=TILE_OVERLAP)
+
+model = None
+batcher = None
+# Resultados por contenido de imagen (RESULT_CACHE_*); conf se filtra después, así que no forma parte de la clave
+cache = ResultCache.from_env('predict')
+_inflight = {}
+if cache is not None:
+    metrics.gauge('result_cache_bytes', 'Memory used by the result cache', fn=lambda: cache.bytes, cache='predict')
+streams = StreamLimiter(MAX_STREAMS)
+metrics.gauge('streams_active', 'Open WebSocket and MJPEG streams', fn=lambda: len(streams.active))
+
+
+def run_batch(images):
+    """Run one batched inference call and return one Detections per image."""
+    with metrics.time('model'):
+        results = model(images, conf=MIN_CONF, verbose=False)
+    metrics.observe_speed(results)
+    metrics.histogram('batch_size', 'Images per model call',
+                      buckets=(1, 2, 4, 8, 16, 32, 64)).observe(len(images))
+    return [Detections.from_result(r) for r in results]
+
+
+async def detect_tiled(image):
+    """Sliced inference: the tiles of one image go through the batcher together and are merged."""
+    plan = tiler.plan(image)
+    detections = await asyncio.gather(*(batcher.submit(crop) for crop in plan.crops))
+    with metrics.time('merge'):
+        return tiler.merge(plan, detections)
+
+
+async def detect_cached(image, tiled):
+    """Detect through the result cache: identical pixels with the same settings skip inference."""
+    detect = detect_tiled if tiled else batcher.submit
+    if cache is None:
+        return await detect(image)
+    loop = asyncio.get_running_loop()
+    settings = (MODEL_PATH, registry.backend, registry.imgsz, MIN_CONF, (TILE_SIZE, TILE_OVERLAP) if tiled else None)
+    # El hash de una imagen 4K tarda decenas de ms: fuera del bucle de eventos
+    with metrics.time('hash'):
+        key = await loop.run_in_executor(None, image_key, image, *settings)
+    detections = cache.get(key)
+    if detections is not None:
+        return detections
+    # La misma imagen ya en inferencia (reintentos simultáneos): se espera ese resultado
+    while key in _inflight:
+        pending = _inflight[key]
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            # Si se canceló la petición que infería, ésta lo intenta; si la cancelada es ésta, se propaga
+            if not pending.cancelled():
+                raise
+    future = _inflight[key] = loop.create_future()
+    t0 = time.perf_counter()
+    try:
+        detections = await detect(image)
+        future.set_result(detections)
+    except BaseException as e:
+        # También al cancelarse (CancelledError): quien espera no puede quedarse colgado
+        if isinstance(e, asyncio.CancelledError):
+            future.cancel()
+        else:
+            future.set_exception(e)
+            # Nadie más esperaba: se marca como consumida para que asyncio no avise
+            future.exception()
+        raise
+    finally:
+        if not future.done():
+            future.cancel()
+        del _inflight[key]
+    cache.put(key, detections, time.perf_counter() - t0)
+    return detections
+
+
+def conf_error(conf):
+    """
+    Error message for a confidence threshold a client cannot get, else None. The model runs, and
+    results are batched and cached, at MIN_CONF, so lower thresholds cannot be honoured.
+    """
+    if not MIN_CONF <= conf <= 1:
+        return f"conf debe estar entre {MIN_CONF} (MIN_CONF del servicio) y 1"
+    return None
+
+
+def check_conf(conf):
+    error = conf_error(conf)
+    if error is not None:
+        raise HTTPException(status_code=422, detail=error)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global model, batcher
+    model = get_model(MODEL_PATH)
+    batcher = MicroBatcher(run_batch, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS)
+    await batcher.start()
+    metrics.gauge('queue_depth', 'Items waiting in a stage queue', fn=batcher.queue_depth, queue='batcher')
+    yield
+    await batcher.stop()
+    if cache is not None:
+        cache.close()
+
+
+app = FastAPI(title="YOLO FastAPI Service", lifespan=lifespan)
 
 @app.get("/health")
 def health():
@@ -11,7 +151,263 @@ def health():
 def root():
     return {"message": "Bienvenido a la API de YOLO (demo)"}
 
-@app.get("/predict")
-def predict():
-    # Demo endpoint
-    return JSONResponse(content={"result": "Aquí iría la inferencia de YOLO (demo)"})
+@app.post("/predict")
+async def predict(files: List[UploadFile] = File(...), conf: float = 0.5, tiled: bool = False):
+    """
+    Detect objects in one or more images. conf must be between MIN_CONF (the threshold the model
+    runs at, default 0.25) and 1; lower values are rejected with 422.
+    """
+    check_conf(conf)
+    start = time.perf_counter()
+    metrics.counter('requests_total', 'HTTP requests', endpoint='predict').inc()
+    images = []
+    for f in files:
+        data = np.frombuffer(await f.read(), dtype=np.uint8)
+        with metrics.time('decode'):
+            image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+        if image is None:
+            metrics.counter('errors_total', 'Failed requests', endpoint='predict').inc()
+            raise HTTPException(status_code=400, detail=f"No se pudo decodificar la imagen {f.filename}")
+        images.append(image)
+    metrics.counter('images_total', 'Images received').inc(len(images))
+
+    # Cada imagen entra en la cola del batcher y se agrupa con las de otros clientes;
+    # con tiled=true cada imagen grande aporta sus tiles al mismo lote
+    results = await asyncio.gather(*(detect_cached(image, tiled) for image in images))
+    with metrics.time('encode'):
+        response = JSONResponse(content={
+            "results": [
+                {"filename": f.filename, "detections": r.filter(min_conf=conf).to_records()}
+                for f, r in zip(files, results)
+            ]
+        })
+    metrics.histogram('request_seconds', 'End-to-end request latency', endpoint='predict').observe(
+        time.perf_counter() - start)
+    return response
+
+def _stream_counters(kind):
+    return {result: metrics.counter('stream_frames_total', 'Frames seen by streaming endpoints',
+                                    kind=kind, result=result)
+            for result in ('processed', 'dropped')}
+
+@app.websocket("/ws/predict")
+async def ws_predict(websocket: WebSocket, conf: float = 0.5, format: str = "json"):
+    """
+    Send JPEG frames as binary messages; each processed frame gets one reply, as JSON or as the
+    compact binary layout in streaming.py (format=binary). A text message {"conf": 0.4}
+    changes the threshold. Frames sent while inference is busy are replaced by newer ones.
+    conf below MIN_CONF closes the socket (1008) or, sent as a message, gets an error reply.
+    """
+    await websocket.accept()
+    error = conf_error(conf)
+    if error is not None:
+        # 1008: Policy Violation
+        await websocket.close(code=1008, reason=error)
+        return
+    client = f"{websocket.client.host}:{websocket.client.port}" if websocket.client else "?"
+    opened = streams.open('websocket', client)
+    if opened is None:
+        # 1013: Try Again Later
+        await websocket.close(code=1013, reason="Demasiados streams abiertos")
+        return
+    stream_id, stats = opened
+    counters = _stream_counters('websocket')
+    mailbox = LatestSlot()
+    settings = {'conf': conf}
+
+    async def receive():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                if message.get('bytes') is not None:
+                    stats.received += 1
+                    dropped = mailbox.dropped
+                    mailbox.put((stats.received, message['bytes'], time.perf_counter()))
+                    counters['dropped'].inc(mailbox.dropped - dropped)
+                    stats.dropped = mailbox.dropped
+                elif message.get('text'):
+                    try:
+                        conf = float(json.loads(message['text'])['conf'])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    error = conf_error(conf)
+                    if error is not None:
+                        await websocket.send_json({"error": error, "conf": settings['conf']})
+                    else:
+                        settings['conf'] = conf
+        finally:
+            mailbox.close()
+
+    async def send(reply):
+        try:
+            if isinstance(reply, bytes):
+                await websocket.send_bytes(reply)
+            else:
+                await websocket.send_json(reply)
+        except RuntimeError as e:
+            # Starlette lanza RuntimeError al enviar por un socket que el cliente ya cerró
+            raise WebSocketDisconnect(code=1006) from e
+
+    def receiver_done(task):
+        # Sin await en el finally (la tarea puede estar cancelada): el error se recoge aquí
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None and not isinstance(error, (WebSocketDisconnect, RuntimeError)):
+            logger.error("Error recibiendo en /ws/predict (%s)", client, exc_info=error)
+
+    receiver = asyncio.create_task(receive())
+    receiver.add_done_callback(receiver_done)
+    try:
+        while True:
+            item = await mailbox.get()
+            if item is None:
+                break
+            seq, data, t0 = item
+            with metrics.time('decode'):
+                image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                stats.errors += 1
+                await send({"seq": seq, "error": "No se pudo decodificar el frame"})
+                continue
+            detections = (await batcher.submit(image)).filter(min_conf=settings['conf'])
+            latency = time.perf_counter() - t0
+            if format == "binary":
+                await send(encode_binary(seq, detections, latency * 1000))
+            else:
+                await send({"seq": seq, "latency_ms": latency * 1000, "dropped": stats.dropped,
+                            "detections": detections.to_records()})
+            stats.processed += 1
+            stats.latencies.append(latency)
+            counters['processed'].inc()
+    except WebSocketDisconnect:
+        # El cliente cerró mientras se enviaba la respuesta
+        pass
+    except Exception:
+        stats.errors += 1
+        metrics.counter('errors_total', 'Failed requests', endpoint='ws_predict').inc()
+        logger.exception("Error en /ws/predict (%s)", client)
+        try:
+            # 1011: Internal Error
+            await websocket.close(code=1011, reason="Error interno")
+        except RuntimeError:
+            pass
+    finally:
+        receiver.cancel()
+        streams.close(stream_id)
+
+@app.get("/stream/mjpeg")
+async def stream_mjpeg(request: Request, source: Optional[str] = None, conf: float = 0.5, quality: int = 80):
+    """
+    Annotated frames from one of STREAM_SOURCES as multipart/x-mixed-replace (for an <img> tag).
+    conf must be between MIN_CONF and 1.
+    """
+    check_conf(conf)
+    source = source if source is not None else STREAM_SOURCES[0]
+    if source not in STREAM_SOURCES:
+        raise HTTPException(status_code=403, detail="Fuente no permitida (ver STREAM_SOURCES)")
+    client = f"{request.client.host}:{request.client.port}" if request.client else "?"
+    opened = streams.open('mjpeg', client)
+    if opened is None:
+        raise HTTPException(status_code=503, detail="Demasiados streams abiertos")
+    stream_id, stats = opened
+    frames = FrameSource(source)
+    if not frames.opened():
+        frames.close()
+        streams.close(stream_id)
+        raise HTTPException(status_code=404, detail=f"No se pudo abrir la fuente {source}")
+    frames.start()
+    counters = _stream_counters('mjpeg')
+    renderer = AnnotationRenderer(model.names)
+
+    def annotate(frame, detections):
+        with metrics.time('plot'):
+            renderer.draw(frame, detections)
+        with metrics.time('encode'):
+            ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return mjpeg_part(jpeg.tobytes()) if ok else None
+
+    async def generate():
+        loop = asyncio.get_running_loop()
+        last = 0
+        try:
+            while True:
+                seq, frame = await loop.run_in_executor(None, frames.read, last)
+                if seq is None:
+                    break
+                if frame is None:
+                    if await request.is_disconnected():
+                        break
+                    continue
+                t0 = time.perf_counter()
+                # Los frames que llegaron mientras se infería el anterior se descartan
+                stats.received += seq - last
+                stats.dropped += seq - last - 1
+                counters['dropped'].inc(seq - last - 1)
+                last = seq
+                detections = (await batcher.submit(frame)).filter(min_conf=conf)
+                part = await loop.run_in_executor(None, annotate, frame, detections)
+                if part is None:
+                    stats.errors += 1
+                    continue
+                yield part
+                stats.processed += 1
+                stats.latencies.append(time.perf_counter() - t0)
+                counters['processed'].inc()
+        finally:
+            frames.close()
+            streams.close(stream_id)
+
+    return StreamingResponse(generate(), media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}")
+
+@app.get("/streams")
+def stream_stats():
+    """Per-connection frame counts and p50/p99 latency of the open (and recently closed) streams."""
+    return streams.summary()
+
+@app.get("/cache")
+def cache_stats():
+    """Result cache size, hit rate and inference time saved."""
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+@app.delete("/cache")
+def cache_clear():
+    if cache is not None:
+        cache.clear()
+    return cache_stats()
+
+@app.get("/batcher")
+def batcher_stats():
+    """p50/p99 latency and images/sec for each batch-size setting used so far."""
+    return batcher.summary()
+
+@app.put("/batcher")
+def configure_batcher(max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None):
+    batcher.configure(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    return batcher.summary()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage timings, counters and queue depths in Prometheus text format."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/profiler")
+def profiler_status(top: int = 20):
+    return {"running": profiler.running, "samples": profiler.samples,
+            "top": [{"function": name, "share": share} for name, share in profiler.top(top)]}
+
+@app.post("/profiler/start")
+def profiler_start():
+    profiler.start()
+    return profiler_status()
+
+@app.post("/profiler/stop")
+def profiler_stop():
+    """Stop sampling and write folded stacks to PROFILE_OUTPUT."""
+    profiler.stop()
+    profiler.write_folded(os.getenv("PROFILE_OUTPUT", "profile.folded"))
+    return profiler_status()
@@ -0,0 +1,203 @@
+"""
+Live streaming helpers for the YOLO FastAPI service.
+
+- WebSocket: the client sends JPEG frames as binary messages and gets one reply per processed
+  frame. Frames that arrive while the previous one is still being inferred replace each other
+  in a one-slot mailbox, so a client sending faster than inference runs always gets results for
+  its newest frame (the skipped ones are counted as dropped).
+- MJPEG: annotated frames from a file or camera source as multipart/x-mixed-replace, which
+  browsers show in an <img> tag.
+
+Binary replies (format=binary) are little-endian: a header of frame sequence number (uint32),
+detection count (uint32) and server latency in ms (float32), then count rows of six float32
+values: x1, y1, x2, y2, confidence, class id.
+"""
+import asyncio
+import struct
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+BINARY_HEADER = struct.Struct('<IIf')
+MJPEG_BOUNDARY = 'frame'
+
+
+def encode_binary(seq, detections, latency_ms):
+    rows = np.empty((len(detections), 6), dtype='<f4')
+    rows[:, :4] = detections.xyxy
+    rows[:, 4] = detections.conf
+    rows[:, 5] = detections.cls_id
+    return BINARY_HEADER.pack(seq, len(detections), latency_ms) + rows.tobytes()
+
+
+def decode_binary(message):
+    """(seq, (N, 6) float32 rows, latency_ms) from a binary reply, for Python clients."""
+    seq, count, latency_ms = BINARY_HEADER.unpack_from(message)
+    rows = np.frombuffer(message, dtype='<f4', count=count * 6, offset=BINARY_HEADER.size)
+    return seq, rows.reshape(count, 6), latency_ms
+
+
+class ConnectionStats:
+    """Frame counts and receive-to-reply latency for one streaming connection."""
+
+    def __init__(self, kind, client, window=1024):
+        self.kind = kind
+        self.client = client
+        self.started = time.monotonic()
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=window)
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started
+        out = {
+            "kind": self.kind,
+            "client": self.client,
+            "seconds": round(elapsed, 1),
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "fps": self.processed / elapsed if elapsed > 0 else 0.0,
+        }
+        if self.latencies:
+            lat_ms = np.asarray(self.latencies) * 1000.0
+            out["latency_p50_ms"] = float(np.percentile(lat_ms, 50))
+            out["latency_p99_ms"] = float(np.percentile(lat_ms, 99))
+        return out
+
+
+class StreamLimiter:
+    """Caps the number of concurrent streams and keeps the stats of the active ones."""
+
+    def __init__(self, max_streams=4, history=20):
+        self.max_streams = max_streams
+        self.active = {}
+        self.finished = deque(maxlen=history)
+        self.rejected = 0
+        self._next_id = 0
+
+    def open(self, kind, client):
+        """Register a stream; returns (stream_id, stats) or None when the cap is reached."""
+        if len(self.active) >= self.max_streams:
+            self.rejected += 1
+            return None
+        self._next_id += 1
+        stats = ConnectionStats(kind, client)
+        self.active[self._next_id] = stats
+        return self._next_id, stats
+
+    def close(self, stream_id):
+        stats = self.active.pop(stream_id, None)
+        if stats is not None:
+            self.finished.append(stats.summary())
+
+    def summary(self):
+        return {
+            "max_streams": self.max_streams,
+            "active": {str(k): s.summary() for k, s in self.active.items()},
+            "rejected": self.rejected,
+            "recent": list(self.finished),
+        }
+
+
+class LatestSlot:
+    """One-item mailbox: put replaces an unconsumed item (counted as dropped)."""
+
+    def __init__(self):
+        self._item = None
+        self._event = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        if self._item is not None:
+            self.dropped += 1
+        self._item = item
+        self._event.set()
+
+    def close(self):
+        self.closed = True
+        self._event.set()
+
+    async def get(self):
+        """Newest item, or None once closed and empty."""
+        while self._item is None and not self.closed:
+            self._event.clear()
+            await self._event.wait()
+        item, self._item = self._item, None
+        return item
+
+
+class FrameSource:
+    """
+    Reads a video file or camera on a thread and keeps only the newest frame.
+
+    Files are paced at their own frame rate; cameras are read as fast as they deliver.
+    """
+
+    def __init__(self, source):
+        self.source = int(source) if str(source).isdigit() else source
+        self.cap = cv2.VideoCapture(self.source)
+        self.is_file = not isinstance(self.source, int)
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.period = 1.0 / fps if self.is_file and 1 <= fps <= 120 else 0.0
+        self._frame = None
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def opened(self):
+        return self.cap.isOpened()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name='mjpeg-source')
+        self._thread.start()
+
+    def _run(self):
+        next_time = time.monotonic()
+        while not self._stop.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            with self._cond:
+                self._frame = frame
+                self._seq += 1
+                self._cond.notify_all()
+            if self.period:
+                next_time += self.period
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+        with self._cond:
+            self._stop.set()
+            self._cond.notify_all()
+
+    def read(self, after_seq, timeout=1.0):
+        """
+        (seq, frame) for the newest frame after after_seq, waiting up to timeout.
+        Returns (after_seq, None) on timeout and (None, None) once the source has ended.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq or self._stop.is_set(), timeout)
+            if self._seq > after_seq:
+                frame, self._frame = self._frame, None
+                return self._seq, frame
+            return (None, None) if self._stop.is_set() else (after_seq, None)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self.cap.release()
+
+
+def mjpeg_part(jpeg):
+    return (f"--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n"
+            .encode() + jpeg + b"\r\n")
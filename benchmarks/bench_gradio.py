@@ -0,0 +1,106 @@
+"""
+Load test for the Gradio interface with simulated concurrent users
+
+Starts N users for each --users level. Each user has its own gradio_client Client and sends
+--requests images one after another through the queue. The report gives requests/sec and
+p50/p99 latency per level, so you can see whether throughput grows with concurrent users (batching and
+GRADIO_CONCURRENCY at work) or flattens (the model is saturated).
+
+Start the app first (python apps/02_gradio_interface/app.py). Compare settings by restarting it
+with a different GRADIO_MAX_BATCH_SIZE / GRADIO_CONCURRENCY and the same command.
+
+Usage:
+    python benchmarks/bench_gradio.py --url http://localhost:7860 --image data/sample.jpg
+    python benchmarks/bench_gradio.py --image data/sample.jpg --users 1 4 16 32 --requests 20 --output gradio.json
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from gradio_client import Client
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Gradio interface load test')
+    parser.add_argument('--url', type=str, default='http://localhost:7860')
+    parser.add_argument('--image', type=str, required=True, help='Image sent by every request')
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--requests', type=int, default=10, help='Requests per user at each level')
+    parser.add_argument('--tiled', action='store_true')
+    parser.add_argument('--api-name', type=str, default='/predict')
+    parser.add_argument('--output', type=str, default=None, help='Also write the report as JSON')
+    return parser.parse_args()
+
+
+def run_level(args, users):
+    clients = [Client(args.url, verbose=False) for _ in range(users)]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(users)
+
+    def user(client):
+        start_barrier.wait()
+        for _ in range(args.requests):
+            t0 = time.perf_counter()
+            try:
+                client.predict(args.image, args.tiled, api_name=args.api_name)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=user, args=(c,)) for c in clients]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    lat_ms = np.asarray(latencies) * 1000.0 if latencies else np.zeros(1)
+    return {
+        'users': users,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'seconds': elapsed,
+        'requests_per_sec': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'latency_p50_ms': float(np.percentile(lat_ms, 50)),
+        'latency_p99_ms': float(np.percentile(lat_ms, 99)),
+    }
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.image):
+        print(f"Error: no existe la imagen {args.image}")
+        return 1
+    # Calentamiento: la primera petición carga el modelo y compila
+    Client(args.url, verbose=False).predict(args.image, args.tiled, api_name=args.api_name)
+
+    reports = []
+    print(f"{'usuarios':>8} {'pet/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errores':>8}")
+    for users in args.users:
+        r = run_level(args, users)
+        reports.append(r)
+        print(f"{users:>8} {r['requests_per_sec']:>8.2f} {r['latency_p50_ms']:>8.0f} "
+              f"{r['latency_p99_ms']:>8.0f} {r['errors']:>8}")
+    base = reports[0]['requests_per_sec']
+    if base > 0:
+        scaling = ", ".join(f"{r['users']}: x{r['requests_per_sec'] / base:.2f}" for r in reports)
+        print(f"Escalado respecto a {reports[0]['users']} usuario(s): {scaling}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': reports}, f, indent=2)
+        print(f"Informe guardado en {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Motion-gated vs every-frame inference on a recorded clip
+
+Runs the model on every frame of --video (the reference) and through
+yolo_core.motion.GatedDetector, then reports the share of frames skipped, the wall-clock and
+CPU time saved, and the missed-detection rate: reference boxes with no gated box of the same
+class at IoU >= --iou on the same frame. Timestamps follow the clip's FPS, so max_stale behaves
+as it would live.
+
+Usage:
+    python benchmarks/bench_motion.py --video recordings/lobby.mp4 --model yolov8n.pt
+    python benchmarks/bench_motion.py --video clip.mp4 --threshold 0.005 --max-stale 1 --regions --output motion.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from yolo_core.detections import Detections
+from yolo_core.model_registry import get_model
+from yolo_core.motion import METHODS, GatedDetector, MotionGate
+from yolo_core.recorder import capture_fps
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Motion-gated inference benchmark')
+    parser.add_argument('--video', type=str, required=True, help='Recorded clip to replay')
+    parser.add_argument('--model', type=str, default='yolov8n.pt')
+    parser.add_argument('--backend', type=str, default=None)
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--threshold', type=float, default=0.002)
+    parser.add_argument('--max-stale', type=float, default=2.0)
+    parser.add_argument('--method', type=str, default='diff', choices=METHODS)
+    parser.add_argument('--regions', action='store_true')
+    parser.add_argument('--max-frames', type=int, default=0, help='0 = whole clip')
+    parser.add_argument('--iou', type=float, default=0.5, help='IoU to count a reference box as found')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--output', type=str, default=None, help='Also write the report as JSON')
+    return parser.parse_args()
+
+
+def load_frames(path, max_frames):
+    cap = cv2.VideoCapture(path)
+    fps = capture_fps(cap) or 30.0
+    frames = []
+    while not max_frames or len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames, fps
+
+
+def missed(reference, found, iou_threshold):
+    """Reference boxes without a same-class box in found at IoU >= iou_threshold."""
+    if len(reference) == 0:
+        return 0
+    if len(found) == 0:
+        return len(reference)
+    a, b = reference.xyxy.astype(np.float64), found.xyxy.astype(np.float64)
+    w = (np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])).clip(0)
+    h = (np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])).clip(0)
+    inter = w * h
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    ious = inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+    ious[reference.cls_id[:, None] != found.cls_id[None, :]] = 0
+    return int((ious.max(axis=1) < iou_threshold).sum())
+
+
+def timed(fn, frames):
+    wall, cpu = time.perf_counter(), time.process_time()
+    outputs = [fn(frame, i) for i, frame in enumerate(frames)]
+    return outputs, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def main():
+    args = parse_args()
+    frames, fps = load_frames(args.video, args.max_frames)
+    if not frames:
+        print(f"Error: no se pudieron leer frames de {args.video}")
+        return 1
+    model = get_model(args.model, args.backend)
+
+    def detect(image):
+        return Detections.from_result(model(image, conf=args.conf, verbose=False)[0])
+
+    for frame in frames[:args.warmup]:
+        detect(frame)
+
+    reference, ref_wall, ref_cpu = timed(lambda frame, i: detect(frame), frames)
+    gate = MotionGate(threshold=args.threshold, max_stale=args.max_stale, method=args.method, regions=args.regions)
+    gated = GatedDetector(detect, gate, camera='bench')
+    outputs, gated_wall, gated_cpu = timed(lambda frame, i: gated(frame, now=i / fps)[0], frames)
+
+    ref_boxes = sum(len(d) for d in reference)
+    misses = sum(missed(r, g, args.iou) for r, g in zip(reference, outputs))
+    stats = gated.stats()
+    report = {
+        'frames': len(frames),
+        'fps': fps,
+        'inferred': stats['inferred'],
+        'region_inferences': stats['region_inferences'],
+        'skipped': stats['skipped'],
+        'skip_ratio': stats['skip_ratio'],
+        'gate_ms_per_frame': stats['gate_ms'],
+        'reference_wall_s': ref_wall,
+        'gated_wall_s': gated_wall,
+        'wall_saved': 1 - gated_wall / ref_wall if ref_wall > 0 else 0.0,
+        'reference_cpu_s': ref_cpu,
+        'gated_cpu_s': gated_cpu,
+        'cpu_saved': 1 - gated_cpu / ref_cpu if ref_cpu > 0 else 0.0,
+        'reference_boxes': ref_boxes,
+        'missed_boxes': misses,
+        'missed_rate': misses / ref_boxes if ref_boxes else 0.0,
+    }
+
+    print(f"Frames: {report['frames']} a {fps:.1f} FPS")
+    print(f"Inferencias: {report['inferred']} completas, {report['region_inferences']} por región, "
+          f"{report['skipped']} saltadas ({report['skip_ratio']:.1%}); compuerta {report['gate_ms_per_frame']:.2f} ms/frame")
+    print(f"Tiempo real: {ref_wall:.2f} s -> {gated_wall:.2f} s ({report['wall_saved']:.1%} ahorrado)")
+    print(f"Tiempo CPU:  {ref_cpu:.2f} s -> {gated_cpu:.2f} s ({report['cpu_saved']:.1%} ahorrado)")
+    print(f"Detecciones perdidas: {misses} de {ref_boxes} ({report['missed_rate']:.2%}) con IoU >= {args.iou}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': report}, f, indent=2)
+        print(f"Informe guardado en {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Annotation micro-benchmark: ultralytics Results.plot() vs yolo_core.renderer
+
+Draws the same synthetic crowded scenes (N random boxes over 80 classes) at several frame sizes
+and reports the median time per frame for:
+
+- plot:        results[0].plot(), which copies the frame and draws with its own annotator
+- renderer:    AnnotationRenderer.draw(), in place on the captured frame
+- plot+rgb:    the previous Streamlit path, plot() and then two cvtColor calls (display + record)
+- render+rgb:  AnnotationRenderer.render(bgr=True, rgb=True), one conversion into a reused buffer
+
+No model is loaded. The plot() columns need ultralytics and torch; without them only the
+renderer is measured.
+
+Usage:
+    python benchmarks/bench_renderer.py
+    python benchmarks/bench_renderer.py --boxes 10 50 200 --sizes 1280x720 1920x1080 3840x2160 --repeats 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from yolo_core.detections import Detections
+from yolo_core.renderer import AnnotationRenderer
+
+NAMES = {i: f'class_{i}' for i in range(80)}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Annotation renderer benchmark')
+    parser.add_argument('--boxes', nargs='+', type=int, default=[10, 50, 200])
+    parser.add_argument('--sizes', nargs='+', type=str, default=['1280x720', '1920x1080', '3840x2160'])
+    parser.add_argument('--repeats', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+
+def make_scene(width, height, n, rng):
+    frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    x1 = rng.uniform(0, width * 0.9, n)
+    y1 = rng.uniform(0, height * 0.9, n)
+    w = rng.uniform(width * 0.02, width * 0.2, n)
+    h = rng.uniform(height * 0.04, height * 0.3, n)
+    xyxy = np.stack([x1, y1, np.minimum(x1 + w, width - 1), np.minimum(y1 + h, height - 1)], axis=1)
+    conf = rng.uniform(0.25, 1.0, n)
+    cls_id = rng.integers(0, len(NAMES), n).astype(np.int32)
+    detections = Detections(xyxy.astype(np.float32), conf.astype(np.float32), cls_id,
+                            np.zeros(n, dtype=np.float64), NAMES)
+    return frame, detections
+
+
+def make_result(frame, detections):
+    """An ultralytics Results with the same boxes, or None if ultralytics/torch are missing."""
+    try:
+        import torch
+        from ultralytics.engine.results import Results
+    except ImportError:
+        return None
+    data = np.concatenate([detections.xyxy, detections.conf[:, None], detections.cls_id[:, None]], axis=1)
+    return Results(frame, path='', names=NAMES, boxes=torch.from_numpy(data.astype(np.float32)))
+
+
+def median_ms(fn, frame, repeats, warmup):
+    times = []
+    for i in range(warmup + repeats):
+        # Cada medición parte de una copia limpia: el renderizador dibuja in situ
+        work = frame.copy()
+        t0 = time.perf_counter()
+        fn(work)
+        if i >= warmup:
+            times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def main():
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    def plot_rgb(result):
+        def run(work):
+            annotated = result.plot()
+            shown = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
+            cv2.cvtColor(shown, cv2.COLOR_RGB2BGR)
+        return run
+
+    header = f"{'tamaño':>10} {'cajas':>6} {'plot':>9} {'renderer':>9} {'plot+rgb':>9} {'render+rgb':>10} {'mejora':>7}"
+    print(header)
+    print('-' * len(header))
+    for size in args.sizes:
+        width, height = (int(v) for v in size.lower().split('x'))
+        for n in args.boxes:
+            frame, detections = make_scene(width, height, n, rng)
+            renderer = AnnotationRenderer(NAMES)
+            t_draw = median_ms(lambda work: renderer.draw(work, detections), frame, args.repeats, args.warmup)
+            t_render = median_ms(lambda work: renderer.render(work, detections, bgr=True, rgb=True),
+                                 frame, args.repeats, args.warmup)
+            result = make_result(frame, detections)
+            if result is None:
+                print(f"{size:>10} {n:>6} {'-':>9} {t_draw:>7.2f}ms {'-':>9} {t_render:>8.2f}ms {'-':>7}")
+                continue
+            # plot() dibuja sobre su propia copia de orig_img, así que el frame no cambia entre repeticiones
+            t_plot = median_ms(lambda work: result.plot(), frame, args.repeats, args.warmup)
+            t_plot_rgb = median_ms(plot_rgb(result), frame, args.repeats, args.warmup)
+            print(f"{size:>10} {n:>6} {t_plot:>7.2f}ms {t_draw:>7.2f}ms {t_plot_rgb:>7.2f}ms "
+                  f"{t_render:>8.2f}ms {t_plot_rgb / t_render:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Tiled vs whole-frame inference on a local high-resolution test set
+
+For every image in --images (4K or larger), runs the model on the whole frame and with
+yolo_core.tiling.TiledDetector, and reports throughput plus recall and precision at IoU 0.5
+against YOLO-format labels. Recall is also broken down by object size (small < 32x32 px,
+medium < 96x96 px, large) in original-image pixels, which is where tiling should help.
+
+Labels are looked up as labels/<name>.txt next to an images/ directory (the YOLO layout) or as
+<name>.txt beside the image. Label class ids must match the model's. Use --class-agnostic to
+score boxes regardless of class. Without labels, only throughput and box counts are reported.
+
+Usage:
+    python benchmarks/bench_tiling.py --images data/test4k/images --model yolov8n.pt
+    python benchmarks/bench_tiling.py --images data/test4k/images --tile 640 --overlap 0.25 --output tiling.json
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from yolo_core.detections import Detections
+from yolo_core.model_registry import get_model
+from yolo_core.tiling import TiledDetector
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+SIZE_BUCKETS = (('small', 32 ** 2), ('medium', 96 ** 2), ('large', float('inf')))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Tiled vs whole-frame inference benchmark')
+    parser.add_argument('--images', type=str, required=True, help='Directory with test images')
+    parser.add_argument('--model', type=str, default='yolov8n.pt')
+    parser.add_argument('--backend', type=str, default=None)
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--tile', type=int, default=640)
+    parser.add_argument('--overlap', type=float, default=0.2)
+    parser.add_argument('--no-full-frame', action='store_true', help='Tiles only, no downscaled full-frame pass')
+    parser.add_argument('--iou', type=float, default=0.5, help='IoU to count a detection as a match')
+    parser.add_argument('--class-agnostic', action='store_true')
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--output', type=str, default=None, help='Also write the report as JSON')
+    return parser.parse_args()
+
+
+def label_path(image_path):
+    directory, name = os.path.split(image_path)
+    stem = os.path.splitext(name)[0] + '.txt'
+    parent, leaf = os.path.split(directory)
+    if leaf == 'images':
+        candidate = os.path.join(parent, 'labels', stem)
+        if os.path.exists(candidate):
+            return candidate
+    candidate = os.path.join(directory, stem)
+    return candidate if os.path.exists(candidate) else None
+
+
+def load_labels(path, width, height):
+    """(N, 4) xyxy pixels and (N,) class ids from a YOLO label file."""
+    rows = np.loadtxt(path, ndmin=2) if os.path.getsize(path) else np.zeros((0, 5))
+    cls_id = rows[:, 0].astype(np.int32)
+    cx, cy, w, h = rows[:, 1] * width, rows[:, 2] * height, rows[:, 3] * width, rows[:, 4] * height
+    return np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1), cls_id
+
+
+def iou_matrix(a, b):
+    w = (np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])).clip(0)
+    h = (np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])).clip(0)
+    inter = w * h
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match(detections, gt_boxes, gt_cls, iou_threshold, class_agnostic):
+    """Greedy matching by confidence. Returns (matched ground-truth mask, true positives)."""
+    matched = np.zeros(len(gt_boxes), dtype=bool)
+    if len(detections) == 0 or len(gt_boxes) == 0:
+        return matched, 0
+    ious = iou_matrix(detections.xyxy.astype(np.float64), gt_boxes)
+    if not class_agnostic:
+        ious[detections.cls_id[:, None] != gt_cls[None, :]] = 0
+    tp = 0
+    for i in np.argsort(-detections.conf):
+        candidates = np.where(matched, 0, ious[i])
+        j = int(candidates.argmax())
+        if candidates[j] >= iou_threshold:
+            matched[j] = True
+            tp += 1
+    return matched, tp
+
+
+def evaluate(name, detect, images, args):
+    for path in images[:args.warmup]:
+        detect(cv2.imread(path))
+    elapsed = 0.0
+    boxes = tp = 0
+    gt_total = {bucket: 0 for bucket, _ in SIZE_BUCKETS}
+    gt_found = {bucket: 0 for bucket, _ in SIZE_BUCKETS}
+    labeled = 0
+    for path in images:
+        image = cv2.imread(path)
+        t0 = time.perf_counter()
+        detections = detect(image)
+        elapsed += time.perf_counter() - t0
+        boxes += len(detections)
+        labels = label_path(path)
+        if labels is None:
+            continue
+        labeled += 1
+        gt_boxes, gt_cls = load_labels(labels, image.shape[1], image.shape[0])
+        matched, hits = match(detections, gt_boxes, gt_cls, args.iou, args.class_agnostic)
+        tp += hits
+        areas = (gt_boxes[:, 2] - gt_boxes[:, 0]) * (gt_boxes[:, 3] - gt_boxes[:, 1])
+        lower = 0
+        for bucket, upper in SIZE_BUCKETS:
+            in_bucket = (areas >= lower) & (areas < upper)
+            gt_total[bucket] += int(in_bucket.sum())
+            gt_found[bucket] += int(matched[in_bucket].sum())
+            lower = upper
+    gt = sum(gt_total.values())
+    report = {
+        'mode': name,
+        'images': len(images),
+        'images_per_sec': len(images) / elapsed if elapsed > 0 else 0.0,
+        'ms_per_image': elapsed / len(images) * 1000,
+        'boxes': boxes,
+    }
+    if labeled:
+        report['recall'] = tp / gt if gt else 0.0
+        report['precision'] = tp / boxes if boxes else 0.0
+        for bucket, _ in SIZE_BUCKETS:
+            report[f'recall_{bucket}'] = gt_found[bucket] / gt_total[bucket] if gt_total[bucket] else None
+            report[f'objects_{bucket}'] = gt_total[bucket]
+    return report
+
+
+def main():
+    args = parse_args()
+    images = sorted(p for p in glob.glob(os.path.join(args.images, '*')) if p.lower().endswith(IMAGE_EXTENSIONS))
+    if not images:
+        print(f"Error: no hay imágenes en {args.images}")
+        return 1
+    model = get_model(args.model, args.backend)
+    tiler = TiledDetector(model, tile=args.tile, overlap=args.overlap, full_frame=not args.no_full_frame)
+
+    def whole(image):
+        return Detections.from_result(model(image, conf=args.conf, verbose=False)[0])
+
+    def tiled(image):
+        return tiler(image, conf=args.conf)
+
+    reports = [evaluate('whole', whole, images, args), evaluate('tiled', tiled, images, args)]
+
+    def fmt(value):
+        return '-' if value is None else f"{value:.3f}"
+
+    print(f"{'modo':>6} {'img/s':>7} {'ms/img':>8} {'cajas':>6} {'recall':>7} {'prec':>6} "
+          f"{'r_small':>8} {'r_medium':>9} {'r_large':>8}")
+    for r in reports:
+        print(f"{r['mode']:>6} {r['images_per_sec']:>7.2f} {r['ms_per_image']:>8.1f} {r['boxes']:>6} "
+              f"{fmt(r.get('recall')):>7} {fmt(r.get('precision')):>6} {fmt(r.get('recall_small')):>8} "
+              f"{fmt(r.get('recall_medium')):>9} {fmt(r.get('recall_large')):>8}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': reports}, f, indent=2)
+        print(f"Informe guardado en {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
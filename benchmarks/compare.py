@@ -0,0 +1,102 @@
+"""
+Compare benchmark results against a stored baseline
+
+Matches runs by (model, backend, threads, imgsz, batch) and flags a regression when throughput
+drops or median per-image inference time grows by more than the tolerance. Exits with status 1
+if any regression is found, and with status 2 without comparing when the two files were
+measured on corpora with different hashes.
+
+Usage:
+    python benchmarks/compare.py benchmarks/results/latest.json benchmarks/baseline.json
+    python benchmarks/compare.py current.json baseline.json --tolerance 0.05
+"""
+import argparse
+import json
+import sys
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compare benchmark results with a baseline')
+    parser.add_argument('results', help='Results JSON from run_benchmarks.py')
+    parser.add_argument('baseline', help='Baseline JSON from run_benchmarks.py')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed relative slowdown (0.10 = 10%%)')
+    return parser.parse_args()
+
+
+def corpus_mismatch(results, baseline):
+    """Error message when results and baseline were measured on different corpora, else None."""
+    current = (results.get('corpus') or {}).get('sha256')
+    base = (baseline.get('corpus') or {}).get('sha256')
+    if current is None or base is None:
+        return "Falta el hash del corpus en los resultados o en el baseline; vuelva a generar el baseline"
+    if current != base:
+        return (f"El corpus ({current}) no es el del baseline ({base}); "
+                f"las cifras no son comparables")
+    return None
+
+
+def run_key(run):
+    return (run['model'], run['backend'], run['threads'], run['imgsz'], run['batch'])
+
+
+def compare(results, baseline, tolerance=0.10):
+    """Return (rows, regressions) comparing the successful runs present in both files."""
+    base_runs = {run_key(r): r for r in baseline['runs'] if 'error' not in r}
+    rows = []
+    regressions = 0
+    for run in results['runs']:
+        if 'error' in run:
+            continue
+        base = base_runs.get(run_key(run))
+        if base is None:
+            rows.append((run_key(run), None, run, None, None, 'nuevo'))
+            continue
+        if not base['throughput_ips']:
+            # Un baseline vacío o fallido (0 img/s) no sirve de referencia
+            rows.append((run_key(run), base, run, None, None, 'sin base'))
+            continue
+        throughput_delta = run['throughput_ips'] / base['throughput_ips'] - 1.0
+        inference_delta = run['inference_ms'] / base['inference_ms'] - 1.0 if base['inference_ms'] else 0.0
+        regressed = throughput_delta < -tolerance or inference_delta > tolerance
+        regressions += regressed
+        rows.append((run_key(run), base, run, throughput_delta, inference_delta,
+                     'REGRESIÓN' if regressed else 'ok'))
+    return rows, regressions
+
+
+def print_comparison(results, baseline, tolerance=0.10):
+    """Print the comparison table and return the number of regressions."""
+    if results.get('machine') != baseline.get('machine'):
+        print("Aviso: 'machine' difiere del baseline; las cifras pueden no ser comparables")
+    rows, regressions = compare(results, baseline, tolerance)
+    print(f"{'modelo':<12} {'backend':<9} {'hilos':>5} {'imgsz':>5} {'lote':>4} "
+          f"{'img/s base':>10} {'img/s':>8} {'Δ':>7} {'infer base':>10} {'infer':>7} {'Δ':>7}  estado")
+    for (model, backend, threads, imgsz, batch), base, run, d_tp, d_inf, status in rows:
+        if d_tp is None:
+            base_ips = f"{base['throughput_ips']:>10.1f}" if base else f"{'-':>10}"
+            print(f"{model:<12} {backend:<9} {threads:>5} {imgsz:>5} {batch:>4} {base_ips} "
+                  f"{run['throughput_ips']:>8.1f} {'-':>7} {'-':>10} {run['inference_ms']:>7.1f} {'-':>7}  {status}")
+            continue
+        print(f"{model:<12} {backend:<9} {threads:>5} {imgsz:>5} {batch:>4} {base['throughput_ips']:>10.1f} "
+              f"{run['throughput_ips']:>8.1f} {d_tp:>+7.1%} {base['inference_ms']:>10.1f} "
+              f"{run['inference_ms']:>7.1f} {d_inf:>+7.1%}  {status}")
+    print(f"{regressions} regresiones (tolerancia {tolerance:.0%})")
+    return regressions
+
+
+def main():
+    args = parse_args()
+    with open(args.results) as f:
+        results = json.load(f)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    mismatch = corpus_mismatch(results, baseline)
+    if mismatch:
+        print(f"Error: {mismatch}")
+        sys.exit(2)
+    if print_comparison(results, baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+Reproducible inference benchmark suite
+
+Runs every model from scripts/download_models.py over a fixed corpus and sweeps image size, batch size, thread count and backend. Each run reports median
+per-image preprocess, inference, postprocess and plot times plus throughput over several
+repeats after a warm-up. Every (model, backend, threads) combination runs in its own process,
+pinned to that many cores, so runs do not affect each other.
+
+The default corpus ("synthetic") is generated from a fixed seed: scenes of filled shapes over
+a noisy gradient, identical on every machine without shipping or downloading images. A
+directory of images and/or videos can be used instead (--corpus benchmarks/corpus); videos are
+sampled at evenly spaced frames.
+
+Results are written as JSON together with the machine, package versions and a SHA-256 of the
+decoded corpus frames. Pass --baseline to compare with stored results; the exit status is 1 on
+regression and 2 when the baseline was measured on a different corpus.
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --models yolov8n.pt --backends torch onnx --threads 4
+    python benchmarks/run_benchmarks.py --save-baseline
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.append(REPO_DIR)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+RESULT_MARKER = 'BENCHMARK_RESULT '
+PACKAGES = ('ultralytics', 'torch', 'onnxruntime', 'openvino', 'opencv-python', 'opencv-python-headless', 'numpy')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='YOLO inference benchmark suite')
+    parser.add_argument('--config', type=str, default=os.path.join(BENCH_DIR, 'config.json'))
+    parser.add_argument('--corpus', type=str, default=None,
+                        help='"synthetic" (generated from the config seed) or a directory with images and/or videos')
+    parser.add_argument('--models', nargs='+', default=None)
+    parser.add_argument('--backends', nargs='+', default=None)
+    parser.add_argument('--imgsz', nargs='+', type=int, default=None)
+    parser.add_argument('--batch', nargs='+', type=int, default=None)
+    parser.add_argument('--threads', nargs='+', type=int, default=None)
+    parser.add_argument('--warmup', type=int, default=None)
+    parser.add_argument('--repeats', type=int, default=None)
+    parser.add_argument('--output', type=str, default=None, help='Results JSON (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--baseline', type=str, default=None, help='Compare with this baseline after running')
+    parser.add_argument('--save-baseline', action='store_true', help='Also store the results as benchmarks/baseline.json')
+    parser.add_argument('--tolerance', type=float, default=None, help='Allowed relative slowdown for --baseline')
+    parser.add_argument('--worker', type=str, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def load_config(args):
+    with open(args.config) as f:
+        config = json.load(f)
+    for key in ('corpus', 'models', 'backends', 'imgsz', 'batch', 'threads', 'warmup', 'repeats', 'tolerance'):
+        value = getattr(args, key)
+        if value is not None:
+            config[key] = value
+    if not config.get('models'):
+        sys.path.append(os.path.join(REPO_DIR, 'scripts'))
+        from download_models import MODELS
+        config['models'] = list(MODELS)
+    cpus = available_cpus()
+    config['threads'] = [min(t, len(cpus)) if t else len(cpus) for t in config['threads']]
+    config['threads'] = sorted(set(config['threads']))
+    return config
+
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+SYNTHETIC = 'synthetic'
+
+
+def synthetic_frames(seed, count, width, height):
+    """count BGR frames drawn from seed: the same pixels on every machine."""
+    import cv2
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0.4, 1.0, height, dtype=np.float32)[:, None, None]
+    frames = []
+    for _ in range(count):
+        base = rng.integers(0, 256, 3).astype(np.float32)
+        frame = np.broadcast_to(base * ramp, (height, width, 3)).astype(np.uint8)
+        frame = cv2.add(frame, rng.integers(0, 24, (height, width, 3), dtype=np.uint8))
+        # Objetos de tamaños variados para que NMS y dibujo tengan trabajo parecido al real
+        for _ in range(int(rng.integers(4, 16))):
+            color = tuple(int(c) for c in rng.integers(0, 256, 3))
+            w, h = (int(v) for v in rng.integers(16, max(17, min(width, height) // 2), 2))
+            x, y = int(rng.integers(0, width - w)), int(rng.integers(0, height - h))
+            if rng.random() < 0.5:
+                cv2.rectangle(frame, (x, y), (x + w, y + h), color, -1)
+            else:
+                cv2.ellipse(frame, (x + w // 2, y + h // 2), (w // 2, h // 2), 0, 0, 360, color, -1)
+        frames.append(frame)
+    return frames
+
+
+def corpus_files(corpus):
+    corpus = os.path.join(REPO_DIR, corpus) if not os.path.isabs(corpus) else corpus
+    files = []
+    for root, _, names in os.walk(corpus):
+        files.extend(os.path.join(root, n) for n in names
+                     if n.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS))
+    return corpus, sorted(files)
+
+
+def corpus_fingerprint(config, frames):
+    """SHA-256 of the decoded frames the models will see (shapes and pixels)."""
+    h = hashlib.sha256()
+    for frame in frames:
+        h.update(repr(frame.shape).encode())
+        h.update(frame.tobytes())
+    out = {'path': config['corpus'], 'frames': len(frames), 'sha256': h.hexdigest()[:16],
+           'max_images': config['max_images']}
+    if config['corpus'] == SYNTHETIC:
+        out.update(seed=config['seed'], size=config['synthetic_size'])
+    else:
+        out['video_frames'] = config['video_frames']
+    return out
+
+
+def load_corpus(config):
+    """
+    Deterministic list of BGR frames: the synthetic set, or every image and then evenly spaced
+    frames of each video of a corpus directory.
+    """
+    import cv2
+    if config['corpus'] == SYNTHETIC:
+        width, height = config['synthetic_size']
+        return synthetic_frames(config['seed'], config['max_images'], width, height)
+    _, files = corpus_files(config['corpus'])
+    frames = []
+    for path in files:
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            img = cv2.imread(path)
+            if img is not None:
+                frames.append(img)
+            continue
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or config['video_frames']
+        step = max(1, total // config['video_frames'])
+        index = taken = 0
+        while taken < config['video_frames'] and cap.grab():
+            if index % step == 0:
+                ok, frame = cap.retrieve()
+                if not ok:
+                    break
+                frames.append(frame)
+                taken += 1
+            index += 1
+        cap.release()
+    return frames[:config['max_images']]
+
+
+def machine_info():
+    from importlib import metadata
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            pass
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': len(available_cpus()),
+        'python': platform.python_version(),
+        'packages': versions,
+    }
+
+
+def _median(values):
+    return float(statistics.median(values)) if values else 0.0
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return float(ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))])
+
+
+def measure(model, frames, imgsz, batch, conf, warmup, repeats):
+    """Time one (imgsz, batch) setting; only full batches are used."""
+    usable = len(frames) // batch * batch
+    if usable == 0:
+        frames = list(itertools.islice(itertools.cycle(frames), batch))
+        usable = batch
+    batches = [frames[i:i + batch] for i in range(0, usable, batch)]
+
+    for b in itertools.islice(itertools.cycle(batches), warmup):
+        model(b, imgsz=imgsz, conf=conf, verbose=False)
+
+    pre, inf, post, plot, batch_ms, throughputs = [], [], [], [], [], []
+    for _ in range(repeats):
+        wall = 0.0
+        for b in batches:
+            t0 = time.perf_counter()
+            results = model(b, imgsz=imgsz, conf=conf, verbose=False)
+            elapsed = time.perf_counter() - t0
+            wall += elapsed
+            batch_ms.append(elapsed * 1000)
+            for r in results:
+                # ultralytics ya mide cada etapa por imagen (ms)
+                pre.append(r.speed['preprocess'])
+                inf.append(r.speed['inference'])
+                post.append(r.speed['postprocess'])
+                t1 = time.perf_counter()
+                r.plot()
+                plot.append((time.perf_counter() - t1) * 1000)
+        throughputs.append(usable / wall)
+
+    return {
+        'images': usable,
+        'repeats': repeats,
+        'throughput_ips': _median(throughputs),
+        'throughput_stdev': float(statistics.stdev(throughputs)) if len(throughputs) > 1 else 0.0,
+        'preprocess_ms': _median(pre),
+        'inference_ms': _median(inf),
+        'inference_p90_ms': _percentile(inf, 90),
+        'postprocess_ms': _median(post),
+        'plot_ms': _median(plot),
+        'batch_ms': _median(batch_ms),
+    }
+
+
+def run_worker(spec):
+    """Child process: one model/backend/thread count, all image and batch sizes."""
+    threads = spec['threads']
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, available_cpus()[:threads])
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from yolo_core.backends import load_model
+
+    config = spec['config']
+    frames = load_corpus(config)
+    runs = []
+    for imgsz in config['imgsz']:
+        base = {'model': spec['model'], 'backend': spec['backend'], 'threads': threads, 'imgsz': imgsz}
+        try:
+            model = load_model(spec['weights'], spec['backend'], imgsz=imgsz)
+        except Exception as e:
+            runs.extend(dict(base, batch=b, error=str(e)) for b in config['batch'])
+            continue
+        for batch in config['batch']:
+            try:
+                runs.append(dict(base, batch=batch, **measure(model, frames, imgsz, batch, config['conf'],
+                                                              config['warmup'], config['repeats'])))
+            except Exception as e:
+                runs.append(dict(base, batch=batch, error=str(e)))
+    print(RESULT_MARKER + json.dumps(runs), flush=True)
+
+
+def spawn_worker(model, weights, backend, threads, config):
+    spec = {'model': model, 'weights': weights, 'backend': backend, 'threads': threads, 'config': config}
+    env = dict(os.environ)
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        env[var] = str(threads)
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', json.dumps(spec)],
+                          env=env, cwd=REPO_DIR, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    error = (proc.stderr.strip().splitlines() or ['worker exited with status %d' % proc.returncode])[-1]
+    return [{'model': model, 'backend': backend, 'threads': threads, 'imgsz': imgsz, 'batch': batch, 'error': error}
+            for imgsz in config['imgsz'] for batch in config['batch']]
+
+
+def print_runs(runs):
+    print(f"{'modelo':<12} {'backend':<9} {'hilos':>5} {'imgsz':>5} {'lote':>4} {'img/s':>8} "
+          f"{'pre ms':>7} {'infer ms':>8} {'p90 ms':>7} {'post ms':>7} {'plot ms':>7}")
+    for r in runs:
+        prefix = f"{r['model']:<12} {r['backend']:<9} {r['threads']:>5} {r['imgsz']:>5} {r['batch']:>4}"
+        if 'error' in r:
+            print(f"{prefix} error: {r['error']}")
+            continue
+        print(f"{prefix} {r['throughput_ips']:>8.1f} {r['preprocess_ms']:>7.2f} {r['inference_ms']:>8.2f} "
+              f"{r['inference_p90_ms']:>7.2f} {r['postprocess_ms']:>7.2f} {r['plot_ms']:>7.2f}")
+
+
+def main():
+    args = parse_args()
+    if args.worker:
+        run_worker(json.loads(args.worker))
+        return
+
+    config = load_config(args)
+    corpus = corpus_fingerprint(config, load_corpus(config))
+    if not corpus['frames']:
+        print(f"Error: El corpus {config['corpus']} no tiene imágenes ni videos")
+        sys.exit(2)
+    baseline = None
+    if args.baseline:
+        from compare import corpus_mismatch
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # Se comprueba antes de medir: con otro corpus la comparación no tendría sentido
+        mismatch = corpus_mismatch({'corpus': corpus}, baseline)
+        if mismatch:
+            print(f"Error: {mismatch}")
+            sys.exit(2)
+
+    runs = []
+    combos = list(itertools.product(config['models'], config['backends'], config['threads']))
+    for i, (model, backend, threads) in enumerate(combos, 1):
+        local = os.path.join(REPO_DIR, config.get('models_dir') or '', model)
+        weights = local if os.path.isfile(local) else model
+        print(f"[{i}/{len(combos)}] {model} {backend} {threads} hilos...", flush=True)
+        runs.extend(spawn_worker(model, weights, backend, threads, config))
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': machine_info(),
+        'corpus': corpus,
+        'settings': {k: config[k] for k in ('imgsz', 'batch', 'threads', 'backends', 'conf', 'warmup', 'repeats')},
+        'runs': runs,
+    }
+    print_runs(runs)
+
+    output = args.output or os.path.join(BENCH_DIR, 'results', time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Resultados guardados en {output}")
+
+    if args.save_baseline:
+        baseline_path = os.path.join(BENCH_DIR, 'baseline.json')
+        with open(baseline_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline guardado en {baseline_path}")
+
+    if baseline is not None:
+        from compare import print_comparison
+        if print_comparison(results, baseline, config.get('tolerance', 0.10)):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
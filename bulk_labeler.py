@@ -2,18 +2,43 @@
 YOLO Bulk Labeler - PyQt6 Desktop App
 
 This tool allows you to select a ZIP file of images, specify a class label, and a split (train/val/test).
-It extracts the images, generates YOLO annotation files (bounding box covering the whole image), and saves them in the correct structure for YOLO training.
+It streams the images out of the archive (see bulk_labeler_engine.py), generates YOLO annotation files (bounding box covering the whole image), and saves them in the correct structure for YOLO training.
+Images are deduplicated by content hash and tracked in data/manifest.sqlite, so importing the same ZIP again only adds what is new.
 """
 import sys
 import os
-import zipfile
-import shutil
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QLabel, QPushButton,
-    QFileDialog, QLineEdit, QComboBox, QMessageBox
+    QFileDialog, QLineEdit, QComboBox, QMessageBox, QProgressBar
 )
-from PyQt6.QtCore import Qt
-from PIL import Image
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
+
+import bulk_labeler_engine
+
+
+class LabelWorker(QThread):
+    """
+    Runs the labeling engine off the GUI thread.
+    """
+    progress = pyqtSignal(int, int)
+    finished_ok = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, zip_file, class_name, split):
+        super().__init__()
+        self.zip_file = zip_file
+        self.class_name = class_name
+        self.split = split
+
+    def run(self):
+        try:
+            summary = bulk_labeler_engine.process_zip(
+                self.zip_file, self.class_name, self.split, progress=self.progress.emit)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished_ok.emit(summary)
+
 
 class BulkLabeler(QMainWindow):
     """
@@ -56,6 +81,9 @@ class BulkLabeler(QMainWindow):
         self.start_button.clicked.connect(self.process_zip)
         layout.addWidget(self.start_button)
 
+        self.progress_bar = QProgressBar()
+        layout.addWidget(self.progress_bar)
+
     def select_zip(self):
         """Open a file dialog to select a ZIP file."""
         file, _ = QFileDialog.getOpenFileName(self, "Select ZIP", "", "ZIP Files (*.zip)")
@@ -63,7 +91,7 @@ class BulkLabeler(QMainWindow):
             self.zip_path.setText(file)
 
     def process_zip(self):
-        """Extract images, generate YOLO labels, and save in the correct structure."""
+        """Validate the inputs and label the ZIP on a worker thread."""
         zip_file = self.zip_path.text()
         class_name = self.class_input.text().strip()
         split = self.split_combo.currentText()
@@ -74,67 +102,31 @@ class BulkLabeler(QMainWindow):
             QMessageBox.warning(self, "Error", "Please enter a class label.")
             return
 
-        # Create destination folders
-        img_dir = os.path.join("data", "images", split)
-        label_dir = os.path.join("data", "labels", split)
-        os.makedirs(img_dir, exist_ok=True)
-        os.makedirs(label_dir, exist_ok=True)
-
-        # Extract zip to a temporary folder
-        temp_dir = "_bulk_labeler_temp"
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
-        os.makedirs(temp_dir, exist_ok=True)
-        with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-
-        # Find image files
-        image_files = []
-        for root, _, files in os.walk(temp_dir):
-            for f in files:
-                if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')):
-                    image_files.append(os.path.join(root, f))
-
-        # Assign class id (if data.yaml exists, use the correct index)
-        class_id = 0
-        yaml_path = os.path.join("data", "data.yaml")
-        if os.path.exists(yaml_path):
-            import yaml
-            with open(yaml_path, 'r') as f:
-                data = yaml.safe_load(f)
-            if 'names' in data and class_name in data['names']:
-                class_id = data['names'].index(class_name)
-            else:
-                # Add the class to yaml
-                data['names'].append(class_name)
-                data['nc'] = len(data['names'])
-                with open(yaml_path, 'w') as f:
-                    yaml.dump(data, f)
-                class_id = len(data['names']) - 1
-        else:
-            # Create a new data.yaml
-            with open(yaml_path, 'w') as f:
-                f.write(f"train: ./images/train\nval: ./images/val\nnc: 1\nnames: ['{class_name}']\n")
-            class_id = 0
-
-        # Process images and create YOLO labels
-        for img_path in image_files:
-            img_name = os.path.basename(img_path)
-            dest_img = os.path.join(img_dir, img_name)
-            shutil.copy(img_path, dest_img)
-            # Get image size
-            with Image.open(img_path) as im:
-                w, h = im.size
-            # Box covering the whole image
-            x_center, y_center, width, height = 0.5, 0.5, 1.0, 1.0
-            label_txt = f"{class_id} {x_center} {y_center} {width} {height}\n"
-            label_name = os.path.splitext(img_name)[0] + ".txt"
-            dest_label = os.path.join(label_dir, label_name)
-            with open(dest_label, 'w') as f:
-                f.write(label_txt)
-
-        shutil.rmtree(temp_dir)
-        QMessageBox.information(self, "Done!", f"{len(image_files)} images processed and labeled in {img_dir} and {label_dir}.")
+        self.start_button.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.worker = LabelWorker(zip_file, class_name, split)
+        self.worker.progress.connect(self.update_progress)
+        self.worker.finished_ok.connect(self.on_finished)
+        self.worker.failed.connect(self.on_failed)
+        self.worker.start()
+
+    def update_progress(self, done, total):
+        self.progress_bar.setMaximum(max(total, 1))
+        self.progress_bar.setValue(done)
+
+    def on_finished(self, summary):
+        self.start_button.setEnabled(True)
+        QMessageBox.information(
+            self, "Done!",
+            f"{summary['images']} images processed into {summary['img_dir']} and "
+            f"{summary['label_dir']} ({summary['images_per_sec']:.0f} images/s): "
+            f"{summary['new']} new, {summary['duplicates']} duplicates "
+            f"({summary['conflicts']} already labeled with another class), "
+            f"{summary['skipped']} already imported.")
+
+    def on_failed(self, message):
+        self.start_button.setEnabled(True)
+        QMessageBox.warning(self, "Error", message)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -0,0 +1,300 @@
+"""
+YOLO Bulk Labeler - headless engine and CLI
+
+Streams every image in a ZIP archive straight to data/images/SPLIT and writes a YOLO label
+(bounding box covering the whole image) to data/labels/SPLIT, without extracting the archive
+to a temporary folder. Work is spread over a process pool.
+
+Images are stored under content-hash names and tracked in data/manifest.sqlite (see
+dataset_manifest.py): files with the same name from different archives no longer overwrite
+each other, duplicates are detected by hash and not copied again, and re-importing an archive
+only processes members that were not imported before.
+
+Usage:
+    python bulk_labeler_engine.py images.zip --class-name cat --split train --workers 8
+    python bulk_labeler_engine.py --rebalance train=0.8 val=0.2
+    python bulk_labeler_engine.py --index-existing --stats
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dataset_manifest import SPLITS, DatasetManifest, content_hasher, content_name
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+CHUNK_SIZE = 256
+
+# ZipFile abierto una sola vez por proceso del pool, con los hashes ya presentes en el dataset
+_worker_zip = None
+_worker_known = frozenset()
+
+
+def list_images(zip_path):
+    """Return the ZipInfo of every image member of a ZIP archive."""
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        return [info for info in zf.infolist()
+                if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+def read_class_names(data_dir="data"):
+    """Class names from data.yaml, or [] if it does not exist yet."""
+    import yaml
+    yaml_path = os.path.join(data_dir, "data.yaml")
+    if not os.path.exists(yaml_path):
+        return []
+    with open(yaml_path, 'r') as f:
+        return (yaml.safe_load(f) or {}).get('names', [])
+
+
+def resolve_class_id(class_name, data_dir="data"):
+    """Return the class id for class_name, adding it to data.yaml if needed."""
+    import yaml
+    yaml_path = os.path.join(data_dir, "data.yaml")
+    os.makedirs(data_dir, exist_ok=True)
+    if os.path.exists(yaml_path):
+        with open(yaml_path, 'r') as f:
+            data = yaml.safe_load(f)
+        if 'names' in data and class_name in data['names']:
+            return data['names'].index(class_name)
+        # Add the class to yaml
+        data.setdefault('names', []).append(class_name)
+        data['nc'] = len(data['names'])
+        with open(yaml_path, 'w') as f:
+            yaml.dump(data, f)
+        return len(data['names']) - 1
+    # Create a new data.yaml
+    with open(yaml_path, 'w') as f:
+        f.write(f"train: ./images/train\nval: ./images/val\nnc: 1\nnames: ['{class_name}']\n")
+    return 0
+
+
+class _HashingReader:
+    """File wrapper that hashes what is read through it, so copying and hashing take one pass."""
+
+    def __init__(self, src):
+        self.src = src
+        self.hasher = content_hasher()
+
+    def read(self, n=-1):
+        data = self.src.read(n)
+        self.hasher.update(data)
+        return data
+
+
+def _existing_name(img_dir, digest):
+    """Name of an image already stored under this content hash with any image extension."""
+    for ext in IMAGE_EXTENSIONS:
+        name = content_name(digest, ext)
+        if os.path.exists(os.path.join(img_dir, name)):
+            return name
+    return None
+
+
+def _init_worker(zip_path, known):
+    global _worker_zip, _worker_known
+    _worker_zip = zipfile.ZipFile(zip_path, 'r')
+    _worker_known = known
+
+
+def label_members(zf, members, img_dir, label_dir, class_id, known=frozenset()):
+    """
+    Copy members from an open ZipFile under content-hash names and write their labels.
+
+    Each member is streamed to a temporary file and hashed on the way, without holding it in
+    memory. Members whose hash is in known are discarded after hashing. Returns (records, bytes)
+    with one (member, crc, size, hash, image_name) record per member; image_name is None when
+    skipped.
+    """
+    label_txt = f"{class_id} 0.5 0.5 1.0 1.0\n"
+    records = []
+    written = 0
+    # El nombre definitivo depende del hash, que sólo se conoce al terminar de copiar
+    tmp_path = os.path.join(img_dir, f".import.{os.getpid()}.tmp")
+    for name in members:
+        info = zf.getinfo(name)
+        with zf.open(info) as src, open(tmp_path, 'wb') as dst:
+            reader = _HashingReader(src)
+            shutil.copyfileobj(reader, dst, 1024 * 1024)
+        digest = reader.hasher.hexdigest()
+        if digest in known:
+            os.remove(tmp_path)
+            records.append((name, info.CRC, info.file_size, digest, None))
+            continue
+        # Miembros iguales (a.jpg, b.jpeg, o el mismo en otro proceso) comparten el fichero del primero
+        img_name = _existing_name(img_dir, digest) or content_name(digest, name)
+        img_path = os.path.join(img_dir, img_name)
+        if os.path.exists(img_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, img_path)
+            written += info.file_size
+        label_name = os.path.splitext(img_name)[0] + ".txt"
+        with open(os.path.join(label_dir, label_name), 'w') as f:
+            f.write(label_txt)
+        records.append((name, info.CRC, info.file_size, digest, img_name))
+    return records, written
+
+
+def _label_chunk(members, img_dir, label_dir, class_id):
+    return label_members(_worker_zip, members, img_dir, label_dir, class_id, _worker_known)
+
+
+def process_zip(zip_path, class_name, split, data_dir="data", workers=None, progress=None):
+    """
+    Label every image in zip_path with class_name into the given split.
+
+    Members already imported from this archive with the same class and split (same name, CRC32
+    and size in the manifest) are skipped without reading them; the rest are hashed and only new content is copied, so the cost grows with
+    what is new rather than with the archive size.
+
+    progress, if given, is called as progress(done, total) after each chunk.
+    Returns a dict with the image counts, elapsed seconds and throughput.
+    """
+    start = time.perf_counter()
+    img_dir = os.path.join(data_dir, "images", split)
+    label_dir = os.path.join(data_dir, "labels", split)
+    os.makedirs(img_dir, exist_ok=True)
+    os.makedirs(label_dir, exist_ok=True)
+
+    with DatasetManifest(data_dir) as manifest:
+        # data.yaml sólo se toca cuando aparece una clase nueva
+        class_id = manifest.class_ids().get(class_name)
+        if class_id is None:
+            class_id = resolve_class_id(class_name, data_dir)
+            manifest.set_class(class_name, class_id)
+
+        archive = os.path.basename(zip_path)
+        infos = list_images(zip_path)
+        total = len(infos)
+        imported = manifest.source_keys(archive, class_name, split)
+        members = [info.filename for info in infos
+                   if (info.filename, info.CRC, info.file_size) not in imported]
+        skipped = total - len(members)
+        known = frozenset(manifest.hashes())
+        workers = workers or os.cpu_count() or 1
+        chunks = [members[i:i + CHUNK_SIZE] for i in range(0, len(members), CHUNK_SIZE)]
+
+        done = skipped
+        nbytes = 0
+        new = duplicates = conflicts = 0
+
+        def record(records, written):
+            nonlocal done, nbytes, new, duplicates, conflicts
+            n, d, c = manifest.record_import(records, split, class_name, class_id, archive)
+            new += n
+            duplicates += d
+            conflicts += c
+            done += len(records)
+            nbytes += written
+            if progress:
+                progress(done, total)
+
+        if progress and skipped:
+            progress(done, total)
+        if workers <= 1 or len(chunks) <= 1:
+            with zipfile.ZipFile(zip_path, 'r') as zf:
+                for chunk in chunks:
+                    record(*label_members(zf, chunk, img_dir, label_dir, class_id, known))
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks)),
+                                     initializer=_init_worker, initargs=(zip_path, known)) as pool:
+                futures = [pool.submit(_label_chunk, chunk, img_dir, label_dir, class_id)
+                           for chunk in chunks]
+                for future in as_completed(futures):
+                    record(*future.result())
+
+    elapsed = time.perf_counter() - start
+    return {
+        'images': done,
+        'new': new,
+        'duplicates': duplicates,
+        'conflicts': conflicts,
+        'skipped': skipped,
+        'bytes': nbytes,
+        'class_id': class_id,
+        'img_dir': img_dir,
+        'label_dir': label_dir,
+        'elapsed': elapsed,
+        'images_per_sec': done / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='YOLO Bulk Labeler (headless)')
+    parser.add_argument('zip', nargs='?', default=None, help='ZIP file with images')
+    parser.add_argument('--class-name', default=None, help='Class label for all images')
+    parser.add_argument('--split', default='train', choices=['train', 'val', 'test'], help='Destination split')
+    parser.add_argument('--data-dir', default='data', help='Dataset root folder')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--rebalance', nargs='+', default=None, metavar='SPLIT=FRACTION',
+                        help='Move images between splits to match these ratios, per class')
+    parser.add_argument('--index-existing', action='store_true',
+                        help='Add images imported before the manifest existed to it')
+    parser.add_argument('--stats', action='store_true', help='Print images per class and split')
+    return parser.parse_args()
+
+
+def parse_ratios(items):
+    ratios = {}
+    for item in items:
+        split, _, fraction = item.partition('=')
+        if split not in SPLITS or not fraction:
+            raise ValueError(f"Invalid ratio '{item}', expected e.g. train=0.8")
+        ratios[split] = float(fraction)
+    return ratios
+
+
+def print_stats(manifest):
+    for class_name, splits in sorted(manifest.counts().items()):
+        parts = ', '.join(f"{split} {splits.get(split, 0)}" for split in SPLITS)
+        print(f"{class_name}: {parts}")
+
+
+def main():
+    args = parse_args()
+    if args.zip is None and not (args.rebalance or args.index_existing or args.stats):
+        print("Error: give a ZIP file, --rebalance, --index-existing or --stats")
+        return 1
+
+    if args.zip is not None:
+        if not os.path.isfile(args.zip):
+            print(f"Error: {args.zip} is not a valid ZIP file")
+            return 1
+        if not args.class_name:
+            print("Error: --class-name is required to import a ZIP file")
+            return 1
+
+        def report(done, total):
+            print(f"\r{done}/{total} images", end='', file=sys.stderr, flush=True)
+
+        summary = process_zip(args.zip, args.class_name, args.split, args.data_dir,
+                              workers=args.workers, progress=report)
+        print(file=sys.stderr)
+        print(f"{summary['images']} images in {summary['elapsed']:.1f} s "
+              f"({summary['images_per_sec']:.0f} images/s, "
+              f"{summary['bytes'] / max(summary['elapsed'], 1e-9) / 1e6:.1f} MB/s): "
+              f"{summary['new']} new, {summary['duplicates']} duplicates "
+              f"({summary['conflicts']} with another class), {summary['skipped']} already imported")
+
+    with DatasetManifest(args.data_dir) as manifest:
+        if args.index_existing:
+            added, duplicates = manifest.index_existing(read_class_names(args.data_dir))
+            print(f"Indexed {added} existing images ({duplicates} duplicates left untracked)")
+        if args.rebalance:
+            try:
+                ratios = parse_ratios(args.rebalance)
+            except ValueError as e:
+                print(f"Error: {e}")
+                return 1
+            print(f"Moved {manifest.rebalance(ratios)} images")
+        if args.stats or args.rebalance:
+            print_stats(manifest)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
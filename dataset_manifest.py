@@ -0,0 +1,280 @@
+"""
+Content-addressed manifest for the bulk labeler's dataset tree.
+
+Every image is stored once under a name derived from its content hash
+(data/images/SPLIT/<hash>.jpg, label in data/labels/SPLIT/<hash>.txt), and an SQLite manifest
+(data/manifest.sqlite) records hash -> path, class and split. A second table remembers which
+archive members (archive, name, CRC32, size) were already imported with which class and split,
+so importing the same archive again with the same settings skips them without decompressing
+anything. Importing it under another class or split processes the members again, and content
+already labeled with another class is reported as a conflict. Splits are rebalanced by moving entries and their
+files, never by re-extracting archives.
+"""
+import glob
+import hashlib
+import os
+import sqlite3
+import time
+
+HASH_NAME_LEN = 16
+SPLITS = ('train', 'val', 'test')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    hash TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    class_name TEXT NOT NULL,
+    class_id INTEGER NOT NULL,
+    split TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    source TEXT,
+    added REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_class_split ON images (class_name, split);
+CREATE TABLE IF NOT EXISTS sources (
+    archive TEXT NOT NULL,
+    member TEXT NOT NULL,
+    crc INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    class_name TEXT NOT NULL,
+    split TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (archive, member, crc, size, class_name, split)
+);
+CREATE TABLE IF NOT EXISTS classes (
+    name TEXT PRIMARY KEY,
+    id INTEGER NOT NULL
+);
+"""
+
+
+def content_hasher():
+    return hashlib.blake2b(digest_size=16)
+
+
+def content_hash(data):
+    h = content_hasher()
+    h.update(data)
+    return h.hexdigest()
+
+
+# Variantes de la misma extensión: a.jpg y b.jpeg idénticos deben dar el mismo fichero
+CANONICAL_EXTENSIONS = {'.jpeg': '.jpg', '.tif': '.tiff'}
+
+
+def content_name(digest, filename):
+    """Content-addressed file name with the original extension in canonical form (.jpeg -> .jpg)."""
+    ext = os.path.splitext(filename)[1].lower()
+    return digest[:HASH_NAME_LEN] + CANONICAL_EXTENSIONS.get(ext, ext)
+
+
+def label_path_for(image_path):
+    """data/images/SPLIT/x.jpg -> data/labels/SPLIT/x.txt (paths relative to the data dir)."""
+    parts = image_path.replace('\\', '/').split('/')
+    parts[-3] = 'labels'
+    parts[-1] = os.path.splitext(parts[-1])[0] + '.txt'
+    return '/'.join(parts)
+
+
+class DatasetManifest:
+    """
+    SQLite manifest of a dataset directory. Use from one thread at a time.
+    """
+
+    def __init__(self, data_dir="data"):
+        self.data_dir = data_dir
+        os.makedirs(data_dir, exist_ok=True)
+        self.path = os.path.join(data_dir, "manifest.sqlite")
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._migrate_sources()
+        self.conn.executescript(SCHEMA)
+
+    def _migrate_sources(self):
+        """Manifests from before class/split were part of the sources key are converted in place."""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(sources)")}
+        if not columns or 'class_name' in columns:
+            return
+        with self.conn:
+            self.conn.execute("ALTER TABLE sources RENAME TO sources_old")
+            self.conn.executescript(SCHEMA)
+            # La clase y el split de entonces son los de la imagen a la que apuntaba el miembro
+            self.conn.execute(
+                "INSERT OR IGNORE INTO sources (archive, member, crc, size, class_name, split, hash) "
+                "SELECT COALESCE(s.archive, ''), s.member, s.crc, s.size, i.class_name, i.split, s.hash "
+                "FROM sources_old s JOIN images i ON i.hash = s.hash")
+            self.conn.execute("DROP TABLE sources_old")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def class_ids(self):
+        return dict(self.conn.execute("SELECT name, id FROM classes"))
+
+    def set_class(self, name, class_id):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO classes (name, id) VALUES (?, ?)", (name, class_id))
+
+    def source_keys(self, archive, class_name, split):
+        """(member, crc, size) of the members of archive already imported with this class and split."""
+        return set(self.conn.execute(
+            "SELECT member, crc, size FROM sources WHERE archive = ? AND class_name = ? AND split = ?",
+            (archive, class_name, split)))
+
+    def hashes(self):
+        return {row[0] for row in self.conn.execute("SELECT hash FROM images")}
+
+    def get(self, digest):
+        row = self.conn.execute(
+            "SELECT hash, path, class_name, class_id, split, size, source FROM images WHERE hash = ?",
+            (digest,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('hash', 'path', 'class_name', 'class_id', 'split', 'size', 'source'), row))
+
+    def record_import(self, records, split, class_name, class_id, archive=''):
+        """
+        Register one chunk of imported members in a single transaction.
+
+        records are (member, crc, size, hash, image_name) tuples from the labeling workers;
+        image_name is None when the content was already known. Returns (new, duplicates,
+        conflicts), where a conflict is a duplicate already labeled with another class.
+        """
+        new = duplicates = conflicts = 0
+        now = time.time()
+        with self.conn:
+            for member, crc, size, digest, image_name in records:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO sources (archive, member, crc, size, class_name, split, hash) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (archive or '', member, crc, size, class_name, split, digest))
+                existing = self.conn.execute(
+                    "SELECT class_name FROM images WHERE hash = ?", (digest,)).fetchone()
+                if existing is not None or image_name is None:
+                    duplicates += 1
+                    if existing is not None and existing[0] != class_name:
+                        conflicts += 1
+                    continue
+                path = f"images/{split}/{image_name}"
+                self.conn.execute(
+                    "INSERT INTO images (hash, path, class_name, class_id, split, size, source, added) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (digest, path, class_name, class_id, split, size, archive, now))
+                new += 1
+        return new, duplicates, conflicts
+
+    def counts(self):
+        """{class_name: {split: count}}."""
+        out = {}
+        for class_name, split, count in self.conn.execute(
+                "SELECT class_name, split, COUNT(*) FROM images GROUP BY class_name, split"):
+            out.setdefault(class_name, {})[split] = count
+        return out
+
+    def move(self, digest, split):
+        """Move one image and its label to another split."""
+        entry = self.get(digest)
+        if entry is None or entry['split'] == split:
+            return False
+        self._move_files(entry, split)
+        with self.conn:
+            self.conn.execute("UPDATE images SET split = ?, path = ? WHERE hash = ?",
+                              (split, self._split_path(entry['path'], split), digest))
+        return True
+
+    def rebalance(self, ratios, progress=None):
+        """
+        Move the fewest images needed so every class matches ratios ({split: fraction}).
+
+        Images already in an under-full split stay where they are; the surplus of each over-full
+        split (in hash order, so reruns are deterministic) moves to the under-full ones.
+        Returns the number of images moved.
+        """
+        total = float(sum(ratios.values()))
+        if total <= 0:
+            raise ValueError("Las proporciones deben sumar más que 0")
+        splits = list(ratios)
+        moved = 0
+        for class_name in [row[0] for row in self.conn.execute("SELECT DISTINCT class_name FROM images")]:
+            by_split = {}
+            for digest, split in self.conn.execute(
+                    "SELECT hash, split FROM images WHERE class_name = ? ORDER BY hash", (class_name,)):
+                by_split.setdefault(split, []).append(digest)
+            n = sum(len(v) for v in by_split.values())
+            targets = {split: int(n * ratios[split] / total) for split in splits}
+            # El resto del redondeo va al primer split (normalmente train)
+            targets[splits[0]] += n - sum(targets.values())
+
+            surplus = []
+            for split, hashes in by_split.items():
+                keep = targets.get(split, 0)
+                surplus.extend(hashes[keep:])
+            for split in splits:
+                missing = targets[split] - min(len(by_split.get(split, [])), targets[split])
+                for digest in surplus[:missing]:
+                    moved += self.move(digest, split)
+                    if progress:
+                        progress(moved)
+                surplus = surplus[missing:]
+        return moved
+
+    def index_existing(self, class_names):
+        """
+        Register images already in data/images/SPLIT that are not in the manifest yet (e.g. from
+        imports made before the manifest existed). Files keep their names; the class comes from
+        the first line of the label. Returns (added, duplicates).
+        """
+        known_paths = {row[0] for row in self.conn.execute("SELECT path FROM images")}
+        added = duplicates = 0
+        now = time.time()
+        with self.conn:
+            for split in SPLITS:
+                for full in sorted(glob.glob(os.path.join(self.data_dir, "images", split, "*"))):
+                    rel = f"images/{split}/{os.path.basename(full)}"
+                    if rel in known_paths or not os.path.isfile(full):
+                        continue
+                    with open(full, 'rb') as f:
+                        data = f.read()
+                    digest = content_hash(data)
+                    if self.conn.execute("SELECT 1 FROM images WHERE hash = ?", (digest,)).fetchone():
+                        duplicates += 1
+                        continue
+                    class_id = self._label_class(rel)
+                    if class_id is None:
+                        continue
+                    class_name = class_names[class_id] if class_id < len(class_names) else str(class_id)
+                    self.conn.execute(
+                        "INSERT INTO images (hash, path, class_name, class_id, split, size, source, added) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (digest, rel, class_name, class_id, split, len(data), None, now))
+                    added += 1
+        return added, duplicates
+
+    def _label_class(self, image_rel):
+        try:
+            with open(os.path.join(self.data_dir, label_path_for(image_rel))) as f:
+                line = f.readline().split()
+        except OSError:
+            return None
+        return int(line[0]) if line else None
+
+    @staticmethod
+    def _split_path(rel, split):
+        parts = rel.split('/')
+        parts[-2] = split
+        return '/'.join(parts)
+
+    def _move_files(self, entry, split):
+        for rel in (entry['path'], label_path_for(entry['path'])):
+            src = os.path.join(self.data_dir, rel)
+            dst = os.path.join(self.data_dir, self._split_path(rel, split))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            if os.path.exists(src):
+                os.replace(src, dst)
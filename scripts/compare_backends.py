@@ -0,0 +1,146 @@
+"""
+Compare inference backends against PyTorch
+
+Loads one model with each backend (exporting and caching onnx/openvino artifacts on first use),
+runs the same images through all of them and reports per-image latency and detection parity
+with the torch outputs: share of torch boxes matched (same class, IoU >= 0.5), mean IoU of the
+matches and the largest confidence difference.
+
+Usage:
+    python scripts/compare_backends.py --model yolov8n.pt --images data/images/val
+    python scripts/compare_backends.py --backends torch onnx --output backend_report.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import cv2
+import numpy as np
+
+from yolo_core.backends import BACKENDS, load_model
+from yolo_core.detections import Detections
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Latency and parity report across inference backends')
+    parser.add_argument('--model', type=str, default='yolov8n.pt', help='Model path')
+    parser.add_argument('--images', type=str, default='data/images/val', help='Directory of test images')
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--imgsz', type=int, default=640, help='Inference and export image size')
+    parser.add_argument('--conf', type=float, default=0.25, help='Confidence threshold')
+    parser.add_argument('--limit', type=int, default=50, help='Maximum number of images')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per image')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed runs before measuring')
+    parser.add_argument('--output', type=str, default=None, help='Write the report as JSON')
+    return parser.parse_args()
+
+
+def load_images(directory, limit):
+    paths = sorted(os.path.join(directory, f) for f in os.listdir(directory)
+                   if f.lower().endswith(IMAGE_EXTENSIONS))[:limit]
+    images = [cv2.imread(p) for p in paths]
+    return [img for img in images if img is not None]
+
+
+def pairwise_iou(a, b):
+    """IoU matrix between two (N, 4) and (M, 4) xyxy arrays."""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match(reference, candidate, iou_threshold=0.5):
+    """Greedy same-class matching; returns (matched, ious, conf_diffs)."""
+    if not len(reference) or not len(candidate):
+        return 0, [], []
+    iou = pairwise_iou(reference.xyxy, candidate.xyxy)
+    iou[reference.cls_id[:, None] != candidate.cls_id[None, :]] = 0.0
+    ious, diffs = [], []
+    used = np.zeros(len(candidate), dtype=bool)
+    for i in np.argsort(-reference.conf):
+        row = np.where(used, 0.0, iou[i])
+        j = int(np.argmax(row))
+        if row[j] >= iou_threshold:
+            used[j] = True
+            ious.append(float(row[j]))
+            diffs.append(abs(float(reference.conf[i]) - float(candidate.conf[j])))
+    return len(ious), ious, diffs
+
+
+def run_backend(model, images, args):
+    for img in images[:args.warmup]:
+        model(img, conf=args.conf, imgsz=args.imgsz, verbose=False)
+    latencies, outputs = [], []
+    for img in images:
+        for _ in range(args.repeats):
+            t0 = time.perf_counter()
+            results = model(img, conf=args.conf, imgsz=args.imgsz, verbose=False)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        outputs.append(Detections.from_results(results))
+    return np.asarray(latencies), outputs
+
+
+def main():
+    args = parse_args()
+    images = load_images(args.images, args.limit)
+    if not images:
+        print(f"Error: No hay imágenes en {args.images}")
+        return
+
+    backends = ['torch'] + [b for b in args.backends if b != 'torch']
+    report = {'model': args.model, 'imgsz': args.imgsz, 'images': len(images), 'backends': {}}
+    reference = None
+    for backend in backends:
+        t0 = time.perf_counter()
+        model = load_model(args.model, backend, imgsz=args.imgsz)
+        load_s = time.perf_counter() - t0
+        latencies, outputs = run_backend(model, images, args)
+        entry = {
+            'load_s': load_s,
+            'latency_mean_ms': float(latencies.mean()),
+            'latency_p50_ms': float(np.percentile(latencies, 50)),
+            'latency_p99_ms': float(np.percentile(latencies, 99)),
+            'detections': int(sum(len(d) for d in outputs)),
+        }
+        if reference is None:
+            reference = outputs
+        else:
+            total = matched = 0
+            ious, diffs = [], []
+            for ref, out in zip(reference, outputs):
+                m, i, d = match(ref, out)
+                total += len(ref)
+                matched += m
+                ious.extend(i)
+                diffs.extend(d)
+            entry['recall_vs_torch'] = matched / total if total else 1.0
+            entry['mean_iou_vs_torch'] = float(np.mean(ious)) if ious else 0.0
+            entry['max_conf_diff'] = float(np.max(diffs)) if diffs else 0.0
+        report['backends'][backend] = entry
+
+    torch_mean = report['backends']['torch']['latency_mean_ms']
+    print(f"{'backend':<10} {'carga s':>8} {'media ms':>9} {'p50 ms':>8} {'p99 ms':>8} {'speedup':>8} "
+          f"{'recall':>7} {'IoU':>6} {'Δconf':>6}")
+    for backend, e in report['backends'].items():
+        print(f"{backend:<10} {e['load_s']:>8.1f} {e['latency_mean_ms']:>9.1f} {e['latency_p50_ms']:>8.1f} "
+              f"{e['latency_p99_ms']:>8.1f} {torch_mean / e['latency_mean_ms']:>7.2f}x "
+              f"{e.get('recall_vs_torch', 1.0):>7.3f} {e.get('mean_iou_vs_torch', 1.0):>6.3f} "
+              f"{e.get('max_conf_diff', 0.0):>6.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Informe guardado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
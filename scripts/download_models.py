@@ -1,33 +1,51 @@
 import os
+import sys
 from pathlib import Path
 from ultralytics import YOLO
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from yolo_core.backends import ensure_exported
+
+# List of models to download (also the default model set of benchmarks/)
+MODELS = [
+    "yolov8n.pt",    # Nano model
+    "yolov8s.pt",    # Small model
+    "yolov8m.pt",    # Medium model
+    "yolov8l.pt",    # Large model
+    "yolov8x.pt",    # XLarge model
+]
+
 def download_models():
-    """Download required YOLO models."""
-    models_dir = Path("/app/models")
+    """Download required YOLO models and pre-export them for EXPORT_BACKENDS."""
+    models_dir = Path(os.getenv("MODELS_DIR", "/app/models"))
     models_dir.mkdir(parents=True, exist_ok=True)
 
-    # List of models to download
-    models = [
-        "yolov8n.pt",    # Nano model
-        "yolov8s.pt",    # Small model
-        "yolov8m.pt",    # Medium model
-        "yolov8l.pt",    # Large model
-        "yolov8x.pt",    # XLarge model
-    ]
+    # Backends a exportar por adelantado (p. ej. "onnx,openvino"); vacío = sólo PyTorch
+    export_backends = [b.strip() for b in os.getenv("EXPORT_BACKENDS", "").split(",") if b.strip()]
+    export_imgsz = int(os.getenv("MODEL_IMGSZ", "640"))
 
     print("Downloading YOLO models...")
-    for model_name in models:
+    for model_name in MODELS:
         model_path = models_dir / model_name
         if not model_path.exists():
             print(f"Downloading {model_name}...")
             try:
-                model = YOLO(model_name)
+                # Descargar directamente en models_dir para que las apps y la caché de exportación lo encuentren
+                model = YOLO(str(model_path))
                 print(f"Successfully downloaded {model_name}")
             except Exception as e:
                 print(f"Error downloading {model_name}: {e}")
+                continue
         else:
             print(f"{model_name} already exists")
 
+        for backend in export_backends:
+            try:
+                path = ensure_exported(str(model_path), backend, imgsz=export_imgsz)
+                print(f"{model_name} -> {backend}: {path}")
+            except Exception as e:
+                print(f"Error exporting {model_name} to {backend}: {e}")
+
 if __name__ == "__main__":
     download_models()
@@ -0,0 +1,251 @@
+"""
+INT8 post-training quantization with an accuracy gate
+
+Quantizes a YOLO model to INT8 with a calibration set, then validates the FP32 original, the FP32
+export and the INT8 model on the same split of a YOLO dataset (e.g. the data/ tree produced by
+bulk_labeler.py). mAP and CPU latency are reported for all three. The INT8 model is only copied
+to the publish directory if its mAP drop against the FP32 original stays within --max-drop;
+otherwise the script exits with status 1.
+
+Backends:
+    openvino  ultralytics export with NNCF calibration (int8=True)
+    onnx      onnxruntime static QDQ quantization of the cached FP32 ONNX export
+
+Usage:
+    python scripts/quantize_int8.py --model models/yolov8n.pt --data data/data.yaml
+    python scripts/quantize_int8.py --model best.pt --backend onnx --max-drop 0.02 --publish-dir models
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import cv2
+import numpy as np
+
+from yolo_core.backends import ensure_exported, artifact_bytes
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+METRICS = ('map50-95', 'map50')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='INT8 post-training quantization with an accuracy gate')
+    parser.add_argument('--model', type=str, default='yolov8n.pt', help='FP32 weights (.pt)')
+    parser.add_argument('--data', type=str, default='data/data.yaml', help='Dataset yaml used for calibration and validation')
+    parser.add_argument('--split', type=str, default='val',
+                        help='Dataset split to calibrate and validate on (must be defined in --data)')
+    parser.add_argument('--backend', type=str, default='openvino', choices=('openvino', 'onnx'))
+    parser.add_argument('--imgsz', type=int, default=640, help='Export and validation image size')
+    parser.add_argument('--calib-images', type=int, default=300, help='Maximum calibration images')
+    parser.add_argument('--metric', type=str, default='map50-95', choices=METRICS)
+    parser.add_argument('--max-drop', type=float, default=0.01, help='Maximum absolute mAP drop allowed to publish')
+    parser.add_argument('--publish-dir', type=str, default=None, help='Where to publish the INT8 model (default: next to the weights)')
+    parser.add_argument('--report', type=str, default=None, help='JSON report path (default: next to the published model)')
+    return parser.parse_args()
+
+
+def load_dataset(data_yaml):
+    """(dataset dict, absolute root the split paths are relative to) from a YOLO dataset yaml."""
+    import yaml
+    with open(data_yaml) as f:
+        data = yaml.safe_load(f) or {}
+    return data, os.path.join(os.path.dirname(os.path.abspath(data_yaml)), data.get('path', '') or '')
+
+
+def split_images(data_yaml, split, limit):
+    """Image paths of a split from a YOLO dataset yaml (paths relative to the yaml)."""
+    data, root = load_dataset(data_yaml)
+    directory = os.path.normpath(os.path.join(root, data[split]))
+    paths = []
+    for dirpath, _, files in os.walk(directory):
+        paths.extend(os.path.join(dirpath, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(paths)[:limit]
+
+
+def letterbox_tensor(img, size):
+    """Same preprocessing as ultralytics: letterbox to size, RGB, CHW, float 0-1, batch of 1."""
+    h, w = img.shape[:2]
+    r = min(size / h, size / w)
+    nh, nw = round(h * r), round(w * r)
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    canvas[top:top + nh, left:left + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return np.ascontiguousarray(canvas[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+class ImageCalibrationReader:
+    """onnxruntime calibration reader over image files (get_next/rewind protocol)."""
+
+    def __init__(self, paths, input_name, imgsz):
+        self.paths = paths
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._index = 0
+
+    def get_next(self):
+        while self._index < len(self.paths):
+            img = cv2.imread(self.paths[self._index])
+            self._index += 1
+            if img is not None:
+                return {self.input_name: letterbox_tensor(img, self.imgsz)}
+        return None
+
+    def rewind(self):
+        self._index = 0
+
+
+def quantize_openvino(weights, data_yaml, split, imgsz, calib_images, staging):
+    import yaml
+    from ultralytics import YOLO
+    local = os.path.join(staging, os.path.basename(weights))
+    shutil.copyfile(weights, local)
+    # ultralytics calibra sobre una fracción del split 'val': se le pasa una copia del yaml
+    # cuyo 'val' apunta al split pedido
+    data, root = load_dataset(data_yaml)
+    data['path'] = root
+    data['val'] = data[split]
+    calib_yaml = os.path.join(staging, 'calibration.yaml')
+    with open(calib_yaml, 'w') as f:
+        yaml.safe_dump(data, f)
+    n_images = len(split_images(data_yaml, split, None))
+    fraction = min(1.0, calib_images / n_images) if n_images else 1.0
+    return YOLO(local).export(format='openvino', int8=True, data=calib_yaml, imgsz=imgsz, fraction=fraction)
+
+
+def quantize_onnx(weights, calib_paths, imgsz, staging):
+    import onnx
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    from ultralytics import YOLO
+
+    # Partir de la exportación FP32 cacheada (forma estática: mejor calibración y kernels)
+    fp32_path = ensure_exported(weights, 'onnx', imgsz=imgsz, dynamic=False)
+    prepared = os.path.join(staging, 'prepared.onnx')
+    try:
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        quant_pre_process(fp32_path, prepared)
+    except Exception:
+        shutil.copyfile(fp32_path, prepared)
+
+    fp32 = onnx.load(fp32_path)
+    # La cabeza Detect (concat de cajas y clases) pierde mucha precisión en INT8: se deja en FP32
+    head = len(YOLO(weights).model.model) - 1
+    exclude = [node.name for node in fp32.graph.node if node.name.startswith(f'/model.{head}/')]
+
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    output = os.path.join(staging, f'{stem}_int8.onnx')
+    reader = ImageCalibrationReader(calib_paths, fp32.graph.input[0].name, imgsz)
+    quantize_static(prepared, output, reader, quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    nodes_to_exclude=exclude)
+
+    # Conservar los metadatos de ultralytics (nombres, stride, imgsz) para poder cargarlo con YOLO()
+    quantized = onnx.load(output)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(fp32.metadata_props)
+    onnx.save(quantized, output)
+    return output
+
+
+def evaluate(path, data_yaml, split, imgsz):
+    """Validate on CPU with batch 1; returns mAP values and per-image times in ms."""
+    from ultralytics import YOLO
+    metrics = YOLO(path, task='detect').val(data=data_yaml, split=split, imgsz=imgsz, batch=1,
+                                            device='cpu', plots=False, verbose=False)
+    return {
+        'map50-95': float(metrics.box.map),
+        'map50': float(metrics.box.map50),
+        'preprocess_ms': float(metrics.speed['preprocess']),
+        'inference_ms': float(metrics.speed['inference']),
+        'postprocess_ms': float(metrics.speed['postprocess']),
+        'size_mb': artifact_bytes(path) / 1024 / 1024,
+    }
+
+
+def publish(artifact, publish_dir):
+    os.makedirs(publish_dir, exist_ok=True)
+    target = os.path.join(publish_dir, os.path.basename(artifact))
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    elif os.path.exists(target):
+        os.remove(target)
+    shutil.move(artifact, target)
+    return target
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.data):
+        print(f"Error: No existe el dataset {args.data}")
+        sys.exit(2)
+    data = load_dataset(args.data)[0]
+    if not data.get(args.split):
+        splits = [k for k in ('train', 'val', 'test') if data.get(k)]
+        print(f"Error: El split '{args.split}' no está definido en {args.data} (disponibles: {', '.join(splits) or 'ninguno'})")
+        sys.exit(2)
+    calib_paths = split_images(args.data, args.split, args.calib_images)
+    if not calib_paths:
+        print(f"Error: No hay imágenes de calibración en el split '{args.split}' de {args.data}")
+        sys.exit(2)
+    publish_dir = args.publish_dir or os.path.dirname(os.path.abspath(args.model))
+    stem = os.path.splitext(os.path.basename(args.model))[0]
+    report_path = args.report or os.path.join(publish_dir, f'{stem}_int8_{args.backend}.report.json')
+
+    staging = tempfile.mkdtemp(prefix='yolo_int8_')
+    try:
+        print(f"Cuantizando {args.model} a INT8 ({args.backend}) con {len(calib_paths)} imágenes de calibración...")
+        if args.backend == 'openvino':
+            int8_path = quantize_openvino(args.model, args.data, args.split, args.imgsz, args.calib_images, staging)
+        else:
+            int8_path = quantize_onnx(args.model, calib_paths, args.imgsz, staging)
+
+        print("Validando FP32 original, FP32 exportado e INT8...")
+        fp32_export = ensure_exported(args.model, args.backend, imgsz=args.imgsz, dynamic=False)
+        results = {
+            'fp32_torch': evaluate(args.model, args.data, args.split, args.imgsz),
+            f'fp32_{args.backend}': evaluate(fp32_export, args.data, args.split, args.imgsz),
+            f'int8_{args.backend}': evaluate(int8_path, args.data, args.split, args.imgsz),
+        }
+
+        reference = results['fp32_torch']
+        int8 = results[f'int8_{args.backend}']
+        drop = reference[args.metric] - int8[args.metric]
+        passed = drop <= args.max_drop
+
+        print(f"{'modelo':<16} {'mAP50-95':>9} {'mAP50':>7} {'infer ms':>9} {'total ms':>9} {'MB':>7}")
+        for name, r in results.items():
+            total = r['preprocess_ms'] + r['inference_ms'] + r['postprocess_ms']
+            print(f"{name:<16} {r['map50-95']:>9.4f} {r['map50']:>7.4f} {r['inference_ms']:>9.1f} "
+                  f"{total:>9.1f} {r['size_mb']:>7.1f}")
+        print(f"Caída de {args.metric}: {drop:.4f} (máximo permitido {args.max_drop:.4f}); "
+              f"aceleración de inferencia {reference['inference_ms'] / max(int8['inference_ms'], 1e-9):.2f}x")
+
+        report = {
+            'model': args.model, 'backend': args.backend, 'data': args.data, 'split': args.split,
+            'imgsz': args.imgsz, 'calibration_images': len(calib_paths), 'metric': args.metric,
+            'max_drop': args.max_drop, 'drop': drop, 'passed': passed, 'results': results,
+            'published': None,
+        }
+        if passed:
+            report['published'] = publish(int8_path, publish_dir)
+            print(f"Modelo INT8 publicado en {report['published']}")
+        else:
+            print("La caída de precisión supera el umbral: el modelo INT8 NO se publica")
+
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Informe guardado en {report_path}")
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+ActionDispatcher timing: cooldown, coalescing, queue bound and email digests.
+
+The dispatcher runs without its thread (start=False) on a fake clock, with a fake SMTP sender.
+"""
+import os
+import smtplib
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from yolo_core.actions import ActionDispatcher
+from yolo_core.rules import EventRule
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSMTP:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+        self.closed = False
+
+    def send(self, to, subject, body):
+        if self.fail:
+            raise smtplib.SMTPServerDisconnected("caído")
+        self.sent.append((to, subject, body))
+
+    def close(self):
+        self.closed = True
+
+
+def make_dispatcher(clock, **kwargs):
+    messages = []
+    dispatcher = ActionDispatcher(notify=messages.append, clock=clock, start=False, **kwargs)
+    return dispatcher, messages
+
+
+def event(rule, confidence=0.9, count=1):
+    return {'rule': rule, 'class': rule.trigger_class, 'confidence': confidence, 'count': count,
+            'timestamp': '2024-01-01 00:00:00'}
+
+
+def fire(dispatcher, clock, at, e):
+    clock.now = at
+    assert dispatcher.submit(e)
+    dispatcher.poll()
+
+
+def test_first_event_runs_immediately():
+    clock = FakeClock()
+    dispatcher, messages = make_dispatcher(clock)
+    fire(dispatcher, clock, 1000.0, event(EventRule('person', {'cooldown': 10}), count=2))
+    assert messages == ["Se detectó person x2 (0.90)"]
+    assert dispatcher.stats()['executed'] == 1
+
+
+def test_cooldown_coalesces_until_it_expires():
+    clock = FakeClock()
+    dispatcher, messages = make_dispatcher(clock)
+    rule = EventRule('person', {'cooldown': 10})
+    fire(dispatcher, clock, 1000.0, event(rule))
+    fire(dispatcher, clock, 1001.0, event(rule, confidence=0.6, count=2))
+    fire(dispatcher, clock, 1005.0, event(rule, confidence=0.8, count=3))
+    clock.now = 1009.9
+    dispatcher.poll()
+    assert len(messages) == 1
+    assert dispatcher.stats()['coalesced'] == 2
+    assert dispatcher.stats()['pending_rules'] == 1
+
+    clock.now = 1010.0
+    dispatcher.poll()
+    assert messages[1] == "person x5 en los últimos 9 s (2 eventos, confianza máx. 0.80)"
+    assert dispatcher.stats()['pending_rules'] == 0
+
+    # El envío agrupado reinicia el cooldown
+    fire(dispatcher, clock, 1015.0, event(rule))
+    assert len(messages) == 2
+    clock.now = 1020.0
+    dispatcher.poll()
+    assert messages[2] == "Se detectó person x1 (0.90)"
+
+
+def test_cooldown_is_per_rule():
+    clock = FakeClock()
+    dispatcher, messages = make_dispatcher(clock)
+    person, car = EventRule('person', {'cooldown': 10}), EventRule('car', {'cooldown': 10})
+    fire(dispatcher, clock, 1000.0, event(person))
+    fire(dispatcher, clock, 1001.0, event(car))
+    assert messages == ["Se detectó person x1 (0.90)", "Se detectó car x1 (0.90)"]
+
+
+def test_full_queue_drops_and_counts():
+    clock = FakeClock()
+    dispatcher, messages = make_dispatcher(clock, max_queue=2)
+    rule = EventRule('person', {'cooldown': 0})
+    assert dispatcher.submit(event(rule))
+    assert dispatcher.submit(event(rule))
+    assert not dispatcher.submit(event(rule))
+    stats = dispatcher.stats()
+    assert (stats['submitted'], stats['dropped'], stats['queue_depth']) == (2, 1, 2)
+    dispatcher.poll()
+    dispatcher.poll()
+    assert len(messages) == 2
+    assert dispatcher.submit(event(rule))
+
+
+def test_emails_are_sent_as_one_digest_per_interval():
+    clock = FakeClock()
+    smtp = FakeSMTP()
+    dispatcher, _ = make_dispatcher(clock, smtp=smtp, email_digest_interval=60)
+    rule = EventRule('person', {'cooldown': 0, 'action_type': 'email', 'email_to': 'ops@example.com',
+                                'email_subject': 'Alerta'})
+    fire(dispatcher, clock, 1000.0, event(rule))
+    fire(dispatcher, clock, 1030.0, event(rule))
+    clock.now = 1059.0
+    dispatcher.poll()
+    assert smtp.sent == []
+    assert dispatcher.stats()['pending_emails'] == 2
+
+    clock.now = 1060.0
+    dispatcher.poll()
+    assert len(smtp.sent) == 1
+    to, subject, body = smtp.sent[0]
+    assert to == 'ops@example.com'
+    assert subject == "Resumen de eventos YOLO (2)"
+    assert body.count("[Alerta]") == 2
+    assert dispatcher.stats()['pending_emails'] == 0
+
+
+def test_single_email_keeps_its_subject():
+    clock = FakeClock()
+    smtp = FakeSMTP()
+    dispatcher, _ = make_dispatcher(clock, smtp=smtp, email_digest_interval=60)
+    rule = EventRule('car', {'action_type': 'email', 'email_to': 'ops@example.com', 'email_subject': 'Coche',
+                             'email_body': '{class_name} {confidence:.1f}'})
+    fire(dispatcher, clock, 1000.0, event(rule))
+    clock.now = 1060.0
+    dispatcher.poll()
+    assert smtp.sent == [('ops@example.com', 'Coche', "Se detectó car x1 (0.90)\ncar 0.9")]
+
+
+def test_smtp_errors_are_counted_not_raised():
+    clock = FakeClock()
+    dispatcher, _ = make_dispatcher(clock, smtp=FakeSMTP(fail=True), email_digest_interval=0)
+    rule = EventRule('person', {'action_type': 'email', 'email_to': 'ops@example.com'})
+    fire(dispatcher, clock, 1000.0, event(rule))
+    assert dispatcher.stats()['errors'] == 1
+    assert dispatcher.stats()['executed'] == 1
+
+
+def test_stop_flushes_pending_events_and_emails():
+    clock = FakeClock()
+    smtp = FakeSMTP()
+    dispatcher, messages = make_dispatcher(clock, smtp=smtp, email_digest_interval=60)
+    notify_rule = EventRule('person', {'cooldown': 10})
+    email_rule = EventRule('car', {'action_type': 'email', 'email_to': 'ops@example.com'})
+    fire(dispatcher, clock, 1000.0, event(notify_rule))
+    fire(dispatcher, clock, 1001.0, event(notify_rule))
+    fire(dispatcher, clock, 1002.0, event(email_rule))
+    dispatcher.stop()
+    assert len(messages) == 2
+    assert len(smtp.sent) == 1
+    assert smtp.closed
@@ -0,0 +1,308 @@
+"""
+YOLO offline batch processing
+
+Runs recorded videos and image folders through a model without a display: frames are decoded on
+a background thread, grouped into batches for a single model([...]) call, and detections are
+streamed to JSONL or Parquet as they are produced. Progress is checkpointed so an interrupted
+run can be resumed.
+
+Usage:
+    python yolo_batch.py footage/*.mp4 --output detections.jsonl --batch 16 --stride 5
+    python yolo_batch.py data/images/val --output detections.parquet --resume
+"""
+import argparse
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from yolo_core.backends import BACKENDS
+from yolo_core.model_registry import get_model
+from yolo_core.detections import Detections
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.webm')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+_END = object()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='YOLO offline video/image batch processing')
+    parser.add_argument('inputs', nargs='+', help='Video files, directories or glob patterns')
+    parser.add_argument('--model', type=str, default='yolov8n.pt', help='Model path')
+    parser.add_argument('--backend', type=str, default=None, choices=BACKENDS,
+                        help='Inference backend (default: YOLO_BACKEND or torch)')
+    parser.add_argument('--conf', type=float, default=0.25, help='Confidence threshold')
+    parser.add_argument('--imgsz', type=int, default=640, help='Inference image size')
+    parser.add_argument('--batch', type=int, default=8, help='Frames per model call')
+    parser.add_argument('--stride', type=int, default=1, help='Process every Nth video frame')
+    parser.add_argument('--output', type=str, default='detections.jsonl', help='.jsonl or .parquet output')
+    parser.add_argument('--resume', action='store_true', help='Continue from the checkpoint of a previous run')
+    parser.add_argument('--queue-size', type=int, default=64, help='Decoded frames buffered ahead of inference')
+    return parser.parse_args()
+
+
+def expand_inputs(inputs):
+    """Expand files, directories and glob patterns into a sorted list of media files."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(os.path.join(root, f) for f in files)
+        elif os.path.isfile(item):
+            paths.append(item)
+        else:
+            paths.extend(glob.glob(item, recursive=True))
+    media = [p for p in paths if p.lower().endswith(VIDEO_EXTENSIONS + IMAGE_EXTENSIONS)]
+    return sorted(set(media))
+
+
+class Checkpoint:
+    """Last processed frame per source, persisted atomically next to the output."""
+
+    def __init__(self, path, resume):
+        self.path = path
+        self.done = {}
+        if resume and os.path.exists(path):
+            with open(path) as f:
+                self.done = json.load(f)
+
+    def next_frame(self, source):
+        return self.done.get(source, -1) + 1
+
+    def update(self, source, frame_idx):
+        self.done[source] = max(self.done.get(source, -1), frame_idx)
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.done, f)
+        os.replace(tmp, self.path)
+
+
+class FrameReader(threading.Thread):
+    """Decodes sources on a background thread into a bounded queue of (source, index, ts, frame)."""
+
+    def __init__(self, sources, checkpoint, stride=1, queue_size=64):
+        super().__init__(daemon=True)
+        self.sources = sources
+        self.checkpoint = checkpoint
+        self.stride = max(1, stride)
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.decode_time = 0.0
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            for source in self.sources:
+                if self.stopped.is_set():
+                    break
+                start = self.checkpoint.next_frame(source)
+                if source.lower().endswith(IMAGE_EXTENSIONS):
+                    if start == 0:
+                        self._read_image(source)
+                else:
+                    self._read_video(source, start)
+        finally:
+            self.frames.put(_END)
+
+    def _read_image(self, source):
+        t0 = time.perf_counter()
+        frame = cv2.imread(source)
+        self.decode_time += time.perf_counter() - t0
+        if frame is not None:
+            self.frames.put((source, 0, 0.0, frame))
+
+    def _read_video(self, source, start):
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            print(f"Error: No se pudo abrir {source}")
+            return
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        index = start
+        # Alinear el reanudado con el stride
+        if index % self.stride:
+            index += self.stride - index % self.stride
+        if index:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        while not self.stopped.is_set():
+            t0 = time.perf_counter()
+            if not cap.grab():
+                break
+            if index % self.stride == 0:
+                ok, frame = cap.retrieve()
+                self.decode_time += time.perf_counter() - t0
+                if not ok:
+                    break
+                self.frames.put((source, index, index / fps if fps > 0 else 0.0, frame))
+            else:
+                self.decode_time += time.perf_counter() - t0
+            index += 1
+        cap.release()
+
+
+class JsonlWriter:
+    """One line per processed frame with its detections."""
+
+    def __init__(self, path, resume):
+        self.f = open(path, 'a' if resume else 'w')
+
+    def write(self, source, frame_idx, ts, detections):
+        self.f.write(json.dumps({
+            'source': source, 'frame': frame_idx, 'ts': ts,
+            'detections': detections.to_records(),
+        }) + '\n')
+
+    def flush(self):
+        """Write everything buffered to disk; returns True (nothing stays pending)."""
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        return True
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetWriter:
+    """
+    One row per detection. Rows are buffered and written as row groups of about row_group_size
+    rows, so long runs do not produce thousands of tiny row groups.
+    """
+
+    def __init__(self, path, resume, row_group_size=65536):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        if resume and os.path.exists(path):
+            # Parquet no admite añadir: cada reanudación escribe otra parte
+            stem, ext = os.path.splitext(path)
+            part = 1
+            while os.path.exists(f"{stem}.part{part}{ext}"):
+                part += 1
+            path = f"{stem}.part{part}{ext}"
+        self.schema = pa.schema([
+            ('source', pa.string()), ('frame', pa.int64()), ('ts', pa.float64()),
+            ('x1', pa.float32()), ('y1', pa.float32()), ('x2', pa.float32()), ('y2', pa.float32()),
+            ('conf', pa.float32()), ('cls_id', pa.int32()), ('class', pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.row_group_size = row_group_size
+        self._columns = {name: [] for name in self.schema.names}
+        self._rows = 0
+
+    def write(self, source, frame_idx, ts, detections):
+        n = len(detections)
+        if not n:
+            return
+        cols = self._columns
+        cols['source'].extend([source] * n)
+        cols['frame'].extend([frame_idx] * n)
+        cols['ts'].extend([ts] * n)
+        for i, name in enumerate(('x1', 'y1', 'x2', 'y2')):
+            cols[name].append(detections.xyxy[:, i])
+        cols['conf'].append(detections.conf)
+        cols['cls_id'].append(detections.cls_id)
+        cols['class'].extend(detections.labels())
+        self._rows += n
+
+    def flush(self, force=False):
+        """
+        Write the buffered rows as one row group once there are row_group_size of them (or always
+        with force). Returns True when nothing is left pending, so the checkpoint can be saved.
+        """
+        if not self._rows:
+            return True
+        if not force and self._rows < self.row_group_size:
+            return False
+        cols = self._columns
+        arrays = {}
+        for name in self.schema.names:
+            values = cols[name]
+            if values and hasattr(values[0], 'dtype'):
+                values = np.concatenate(values)
+            arrays[name] = self.pa.array(values, type=self.schema.field(name).type)
+        self.writer.write_table(self.pa.table(arrays, schema=self.schema), row_group_size=self._rows)
+        self._columns = {name: [] for name in self.schema.names}
+        self._rows = 0
+        return True
+
+    def close(self):
+        self.flush(force=True)
+        self.writer.close()
+
+
+def open_writer(path, resume):
+    if path.lower().endswith('.parquet'):
+        return ParquetWriter(path, resume)
+    return JsonlWriter(path, resume)
+
+
+def main():
+    args = parse_args()
+    sources = expand_inputs(args.inputs)
+    if not sources:
+        print("Error: No se encontraron videos ni imágenes")
+        return
+
+    model = get_model(args.model, args.backend)
+    checkpoint = Checkpoint(args.output + '.ckpt.json', args.resume)
+    writer = open_writer(args.output, args.resume)
+    reader = FrameReader(sources, checkpoint, args.stride, args.queue_size)
+
+    start = time.perf_counter()
+    infer_time = 0.0
+    frames = 0
+    detections_total = 0
+    finished = False
+    reader.start()
+    try:
+        while not finished:
+            batch = []
+            while len(batch) < args.batch:
+                item = reader.frames.get()
+                if item is _END:
+                    finished = True
+                    break
+                batch.append(item)
+            if not batch:
+                break
+
+            t0 = time.perf_counter()
+            results = model([item[3] for item in batch], conf=args.conf, imgsz=args.imgsz, verbose=False)
+            infer_time += time.perf_counter() - t0
+
+            # Los frames se liberan en cuanto se escriben sus detecciones
+            for (source, frame_idx, ts, _), result in zip(batch, results):
+                detections = Detections.from_result(result, frame_ts=ts)
+                writer.write(source, frame_idx, ts, detections)
+                checkpoint.update(source, frame_idx)
+                detections_total += len(detections)
+            frames += len(batch)
+            # El checkpoint sólo avanza cuando las detecciones de esos frames ya están escritas
+            if writer.flush():
+                checkpoint.save()
+
+            elapsed = time.perf_counter() - start
+            print(f"\r{frames} frames, {detections_total} detecciones, {frames / elapsed:.1f} FPS",
+                  end='', flush=True)
+    except KeyboardInterrupt:
+        print("\nInterrumpido; se puede continuar con --resume")
+    finally:
+        reader.stopped.set()
+        writer.close()
+        checkpoint.save()
+
+    elapsed = time.perf_counter() - start
+    print()
+    print(f"Total: {frames} frames de {len(sources)} fuentes en {elapsed:.1f} s "
+          f"({frames / elapsed if elapsed > 0 else 0:.1f} FPS extremo a extremo; "
+          f"decodificación {reader.decode_time:.1f} s, inferencia {infer_time:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+"""
+Shared building blocks for the YOLO apps (desktop, Streamlit, Gradio, FastAPI and CLIs).
+"""
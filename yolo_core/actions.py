@@ -0,0 +1,293 @@
+"""
+Background dispatcher for rule actions (notify, command, email).
+
+Fired events are queued without blocking the caller. A dispatcher thread applies a per-rule
+cooldown and coalesces the events it holds back ("person x37 in the last 10 s"). Commands run
+on a bounded worker pool. Emails are batched into digests and sent over a reused SMTP connection.
+
+SMTP configuration (environment):
+    SMTP_HOST, SMTP_PORT (default 587), SMTP_USER, SMTP_PASSWORD,
+    SMTP_FROM (default yolo_detector@example.com), SMTP_STARTTLS (default 1)
+"""
+import logging
+import os
+import queue
+import smtplib
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPSender:
+    """
+    Keeps one SMTP connection open and reconnects when the server drops it.
+    """
+
+    def __init__(self, host, port=587, user=None, password=None, sender="yolo_detector@example.com",
+                 starttls=True, timeout=10):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.sender = sender
+        self.starttls = starttls
+        self.timeout = timeout
+        self._server = None
+
+    @classmethod
+    def from_env(cls):
+        host = os.getenv("SMTP_HOST")
+        if not host:
+            return None
+        return cls(host, int(os.getenv("SMTP_PORT", "587")), os.getenv("SMTP_USER"),
+                   os.getenv("SMTP_PASSWORD"), os.getenv("SMTP_FROM", "yolo_detector@example.com"),
+                   os.getenv("SMTP_STARTTLS", "1") != "0")
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.user:
+            server.login(self.user, self.password)
+        self._server = server
+
+    def send(self, to, subject, body):
+        msg = MIMEText(body, 'plain')
+        msg['From'] = self.sender
+        msg['To'] = to
+        msg['Subject'] = subject
+        for attempt in range(2):
+            if self._server is None:
+                self._connect()
+            try:
+                self._server.send_message(msg)
+                return
+            except smtplib.SMTPServerDisconnected:
+                # La conexión reutilizada caducó: reconectar una vez
+                self._server = None
+                if attempt:
+                    raise
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except smtplib.SMTPException:
+                pass
+            self._server = None
+
+
+def _format_body(template, event):
+    try:
+        return template.format(class_name=event['class'], confidence=event['confidence'],
+                               timestamp=event['timestamp'], count=event.get('count', 1))
+    except (KeyError, IndexError, ValueError):
+        return template
+
+
+class _Pending:
+    __slots__ = ('rule', 'events', 'count', 'max_conf', 'first', 'enqueued')
+
+    def __init__(self, rule, now, enqueued):
+        self.rule = rule
+        self.events = 0
+        self.count = 0
+        self.max_conf = 0.0
+        self.first = now
+        self.enqueued = enqueued
+
+    def add(self, event):
+        self.events += 1
+        self.count += event.get('count', 1)
+        self.max_conf = max(self.max_conf, event['confidence'])
+
+
+class ActionDispatcher:
+    """
+    Runs rule actions off the caller's thread with cooldown, coalescing and bounded resources.
+
+    notify is called with a message string from the dispatcher thread; GUI callers should pass
+    something thread-safe such as a Qt signal's ``emit``. smtp is anything with send(to,
+    subject, body) and close(). With start=False no thread is started and the caller drives
+    the dispatcher with poll(); together with a fake clock this makes it deterministic in tests.
+    """
+
+    def __init__(self, notify=None, smtp=None, max_queue=1000, command_workers=2,
+                 max_pending_commands=8, command_timeout=60, email_digest_interval=60, tick=0.25,
+                 clock=time.monotonic, start=True):
+        self.notify = notify
+        self.smtp = smtp
+        self.command_timeout = command_timeout
+        self.email_digest_interval = email_digest_interval
+        self.tick = tick
+        self._clock = clock
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._commands = ThreadPoolExecutor(max_workers=command_workers)
+        self._command_slots = threading.BoundedSemaphore(max_pending_commands)
+        self._last_action = {}
+        self._pending = {}
+        self._emails = {}
+        self._last_email_flush = clock()
+        self._latencies = deque(maxlen=1000)
+        self.submitted = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.executed = 0
+        self.commands_dropped = 0
+        self.errors = 0
+        self._running = True
+        self._thread = None
+        if start:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def submit(self, event):
+        """Queue a fired event; never blocks. Returns False if the queue was full."""
+        try:
+            self._queue.put_nowait((event, self._clock()))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def stop(self, timeout=5):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+        else:
+            self._shutdown()
+        self._commands.shutdown(wait=False)
+
+    def poll(self, timeout=0):
+        """Handle at most one queued event (waiting up to timeout) and flush what is due."""
+        try:
+            event, enqueued = self._queue.get(timeout=timeout)
+            self._handle(event, enqueued)
+        except queue.Empty:
+            pass
+        now = self._clock()
+        self._flush_pending(now)
+        if self._emails and now - self._last_email_flush >= self.email_digest_interval:
+            self._flush_emails()
+
+    def _run(self):
+        while self._running:
+            self.poll(self.tick)
+        self._shutdown()
+
+    def _shutdown(self):
+        # Vaciar lo pendiente al cerrar
+        self._flush_pending(float('inf'))
+        self._flush_emails()
+        if self.smtp is not None:
+            self.smtp.close()
+
+    def _handle(self, event, enqueued):
+        rule = event['rule']
+        key = id(rule)
+        now = self._clock()
+        cooldown = getattr(rule, 'cooldown', 0)
+        last = self._last_action.get(key)
+        pending = self._pending.get(key)
+        if pending is None and (last is None or now - last >= cooldown):
+            single = _Pending(rule, now, enqueued)
+            single.add(event)
+            self._execute(single, event, now)
+            return
+        if pending is None:
+            pending = self._pending[key] = _Pending(rule, now, enqueued)
+        pending.add(event)
+        self.coalesced += 1
+
+    def _flush_pending(self, now):
+        for key, pending in list(self._pending.items()):
+            cooldown = getattr(pending.rule, 'cooldown', 0)
+            if now - self._last_action.get(key, float('-inf')) >= cooldown:
+                del self._pending[key]
+                event = {'class': pending.rule.trigger_class, 'confidence': pending.max_conf,
+                         'count': pending.count, 'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')}
+                self._execute(pending, event, min(now, self._clock()))
+
+    def _message(self, pending, event):
+        if pending.events == 1:
+            return f"Se detectó {event['class']} x{event.get('count', 1)} ({event['confidence']:.2f})"
+        window = self._clock() - pending.first
+        return (f"{event['class']} x{pending.count} en los últimos {window:.0f} s "
+                f"({pending.events} eventos, confianza máx. {pending.max_conf:.2f})")
+
+    def _execute(self, pending, event, now):
+        rule = pending.rule
+        self._last_action[id(rule)] = now
+        message = self._message(pending, event)
+        try:
+            if rule.action_type == "notify":
+                if self.notify is not None:
+                    self.notify(message)
+            elif rule.action_type == "command" and rule.command:
+                self._run_command(rule.command)
+            elif rule.action_type == "email" and rule.email_to:
+                body = _format_body(rule.email_body or "", event)
+                self._emails.setdefault(rule.email_to, []).append(
+                    (rule.email_subject or "Evento YOLO", f"{message}\n{body}".strip()))
+        except Exception:
+            self.errors += 1
+            logger.exception("Error ejecutando la acción de la regla %s", rule.trigger_class)
+        self.executed += 1
+        self._latencies.append(self._clock() - pending.enqueued)
+
+    def _run_command(self, command):
+        # Limitar los comandos en vuelo en lugar de lanzar un proceso por evento
+        if not self._command_slots.acquire(blocking=False):
+            self.commands_dropped += 1
+            return
+        future = self._commands.submit(subprocess.run, command, shell=True, timeout=self.command_timeout)
+        future.add_done_callback(self._command_done)
+
+    def _command_done(self, future):
+        self._command_slots.release()
+        if future.exception() is not None:
+            self.errors += 1
+            logger.warning("Error al ejecutar comando: %s", future.exception())
+
+    def _flush_emails(self):
+        self._last_email_flush = self._clock()
+        emails, self._emails = self._emails, {}
+        for to, items in emails.items():
+            if len(items) == 1:
+                subject, body = items[0]
+            else:
+                subject = f"Resumen de eventos YOLO ({len(items)})"
+                body = "\n\n".join(f"[{s}]\n{b}" for s, b in items)
+            if self.smtp is None:
+                logger.info("SMTP no configurado; email para %s: %s", to, subject)
+                continue
+            try:
+                self.smtp.send(to, subject, body)
+            except (smtplib.SMTPException, OSError):
+                self.errors += 1
+                logger.exception("Error al enviar email a %s", to)
+
+    def stats(self):
+        """Queue depth, latency percentiles and counters."""
+        latencies = np.asarray(list(self._latencies)) * 1000.0
+        return {
+            'queue_depth': self._queue.qsize(),
+            'pending_rules': len(self._pending),
+            'pending_emails': sum(len(v) for v in list(self._emails.values())),
+            'submitted': self.submitted,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'executed': self.executed,
+            'commands_dropped': self.commands_dropped,
+            'errors': self.errors,
+            'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            'latency_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+        }
@@ -0,0 +1,98 @@
+"""
+Inference backend selection: PyTorch, ONNX Runtime or OpenVINO.
+
+Non-torch backends export each model once and cache the artifact next to the weights, keyed by
+the weights' content hash, the export image size and the dynamic-batch setting. Later loads go
+straight to the cached artifact through ultralytics' runtime wrappers.
+
+Configuration (environment):
+    YOLO_BACKEND  torch | onnx | openvino (default torch)
+"""
+import hashlib
+import os
+import shutil
+import threading
+
+BACKENDS = ('torch', 'onnx', 'openvino')
+CACHE_DIR = '.export_cache'
+
+_export_lock = threading.Lock()
+
+
+def resolve_backend(backend=None):
+    """Return backend, falling back to YOLO_BACKEND and then to torch."""
+    backend = (backend or os.getenv("YOLO_BACKEND") or "torch").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    return backend
+
+
+def weights_hash(weights, length=12):
+    h = hashlib.sha256()
+    with open(weights, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()[:length]
+
+
+def export_path(weights, backend, imgsz=640, dynamic=True):
+    """Cache location of the exported artifact for this weights/backend/settings combination."""
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    key = f"{stem}-{weights_hash(weights)}-{imgsz}-{'dyn' if dynamic else 'static'}"
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(weights)), CACHE_DIR)
+    if backend == 'onnx':
+        return os.path.join(cache_dir, key + '.onnx')
+    # OpenVINO exporta un directorio; ultralytics lo reconoce por el sufijo
+    return os.path.join(cache_dir, key + '_openvino_model')
+
+
+def _ensure_weights(weights):
+    """Make sure the .pt file is on disk (official weights are downloaded on first use)."""
+    if not os.path.isfile(weights):
+        from ultralytics import YOLO
+        model = YOLO(weights)
+        weights = getattr(model, 'ckpt_path', None) or weights
+    return weights
+
+
+def ensure_exported(weights, backend, imgsz=640, dynamic=True):
+    """Return the path of the exported artifact, exporting it first if it is not cached."""
+    backend = resolve_backend(backend)
+    if backend == 'torch':
+        return weights
+    weights = _ensure_weights(weights)
+    target = export_path(weights, backend, imgsz, dynamic)
+    with _export_lock:
+        if os.path.exists(target):
+            return target
+        from ultralytics import YOLO
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Exportar una copia dentro de la caché para no dejar artefactos junto a los pesos
+        stem = os.path.basename(target).replace('_openvino_model', '').replace('.onnx', '')
+        staging = os.path.join(os.path.dirname(target), stem + '.pt')
+        shutil.copyfile(weights, staging)
+        try:
+            exported = YOLO(staging).export(format=backend, imgsz=imgsz, dynamic=dynamic)
+            if os.path.abspath(exported) != os.path.abspath(target):
+                shutil.move(exported, target)
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+    return target
+
+
+def load_model(weights, backend=None, imgsz=640, dynamic=True):
+    """Load weights with the requested backend (exporting once for onnx/openvino)."""
+    from ultralytics import YOLO
+    backend = resolve_backend(backend)
+    if backend == 'torch':
+        return YOLO(weights)
+    return YOLO(ensure_exported(weights, backend, imgsz, dynamic), task='detect')
+
+
+def artifact_bytes(path):
+    """Size on disk of an exported file or directory."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, f))
+                   for root, _, files in os.walk(path) for f in files)
+    return os.path.getsize(path) if os.path.exists(path) else 0
@@ -0,0 +1,147 @@
+"""
+Fixed-capacity columnar ring buffer of detections with rolling aggregates.
+
+Per-class counts, per-class mean confidence and detections per second are kept for a set of
+time windows and updated incrementally as detections are added and expire, so dashboards can
+read them without rebuilding tables from the raw history.
+"""
+import time
+
+import numpy as np
+
+
+class DetectionStore:
+    """
+    Ring buffer of (timestamp, class id, confidence) with rolling per-window aggregates.
+
+    Timestamps must be non-decreasing (they come from the capture loop).
+    """
+
+    def __init__(self, capacity=10000, num_classes=80, windows=(10, 60)):
+        self.capacity = capacity
+        self.num_classes = num_classes
+        self.windows = tuple(sorted(windows))
+        self.ts = np.zeros(capacity, dtype=np.float64)
+        self.cls_id = np.zeros(capacity, dtype=np.int32)
+        self.conf = np.zeros(capacity, dtype=np.float32)
+        # Índice monótono del siguiente registro; la ranura es head % capacity
+        self.head = 0
+        self.total = 0
+        self.start_ts = None
+        self._tail = {w: 0 for w in self.windows}
+        self._counts = {w: np.zeros(num_classes, dtype=np.int64) for w in self.windows}
+        self._conf_sum = {w: np.zeros(num_classes, dtype=np.float64) for w in self.windows}
+
+    def _slots(self, start, end):
+        return np.arange(start, end) % self.capacity
+
+    def _grow(self, num_classes):
+        pad = num_classes - self.num_classes
+        for w in self.windows:
+            self._counts[w] = np.pad(self._counts[w], (0, pad))
+            self._conf_sum[w] = np.pad(self._conf_sum[w], (0, pad))
+        self.num_classes = num_classes
+
+    def _expire_to(self, w, index):
+        """Remove entries with monotonic index < index from window w."""
+        tail = self._tail[w]
+        if index <= tail:
+            return
+        slots = self._slots(tail, index)
+        cls_id = self.cls_id[slots]
+        self._counts[w] -= np.bincount(cls_id, minlength=self.num_classes)
+        self._conf_sum[w] -= np.bincount(cls_id, weights=self.conf[slots], minlength=self.num_classes)
+        self._tail[w] = index
+
+    def _count_before(self, tail, cutoff):
+        """Live entries from tail on with ts < cutoff, searched on views of the ring (no copies)."""
+        n = self.head - tail
+        start = tail % self.capacity
+        # Lo vivo ocupa como mucho dos tramos contiguos: hasta el final del array y desde el principio
+        first = min(n, self.capacity - start)
+        expired = int(np.searchsorted(self.ts[start:start + first], cutoff, side='left'))
+        if expired < first or first == n:
+            return expired
+        return first + int(np.searchsorted(self.ts[:n - first], cutoff, side='left'))
+
+    def _expire(self, now):
+        for w in self.windows:
+            tail = self._tail[w]
+            if tail >= self.head:
+                continue
+            # Los timestamps son crecientes: basta una búsqueda binaria
+            self._expire_to(w, tail + self._count_before(tail, now - w))
+
+    def add(self, detections, now=None):
+        """Append a Detections batch (or nothing) and advance the windows to now."""
+        now = time.time() if now is None else now
+        if self.start_ts is None:
+            self.start_ts = now
+        n = len(detections)
+        if n:
+            ts = detections.frame_ts
+            cls_id = detections.cls_id
+            conf = detections.conf
+            if n > self.capacity:
+                ts, cls_id, conf = ts[-self.capacity:], cls_id[-self.capacity:], conf[-self.capacity:]
+                n = self.capacity
+            if cls_id.max() >= self.num_classes:
+                self._grow(int(cls_id.max()) + 1)
+            # Las ranuras que se van a sobrescribir dejan de contar en todas las ventanas
+            overwritten = self.head + n - self.capacity
+            for w in self.windows:
+                self._expire_to(w, overwritten)
+            slots = self._slots(self.head, self.head + n)
+            self.ts[slots] = ts
+            self.cls_id[slots] = cls_id
+            self.conf[slots] = conf
+            self.head += n
+            self.total += n
+            counts = np.bincount(cls_id, minlength=self.num_classes)
+            conf_sum = np.bincount(cls_id, weights=conf, minlength=self.num_classes)
+            for w in self.windows:
+                self._counts[w] += counts
+                self._conf_sum[w] += conf_sum
+        self._expire(now)
+
+    def __len__(self):
+        return min(self.head, self.capacity)
+
+    def counts(self, window):
+        """Per-class detection counts over the window (array indexed by class id)."""
+        return self._counts[window].copy()
+
+    def mean_conf(self, window):
+        """Per-class mean confidence over the window (NaN where there are no detections)."""
+        counts = self._counts[window]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, self._conf_sum[window] / counts, np.nan)
+
+    def rate(self, window, now=None):
+        """Detections per second over the window."""
+        now = time.time() if now is None else now
+        if self.start_ts is None:
+            return 0.0
+        span = min(window, now - self.start_ts)
+        return float(self._counts[window].sum()) / span if span > 0 else 0.0
+
+    def summary(self, window, names=None, now=None):
+        """Columns for the classes seen in the window: class, count, mean_conf, per_sec."""
+        names = names or {}
+        counts = self._counts[window]
+        present = np.flatnonzero(counts)
+        total = counts.sum()
+        # rate() reparte el total de la ventana; cada clase aporta en proporción a su conteo
+        scale = self.rate(window, now) / total if total else 0.0
+        return {
+            'class': [names.get(int(i), str(i)) for i in present],
+            'count': counts[present].tolist(),
+            'mean_conf': self.mean_conf(window)[present].round(3).tolist(),
+            'per_sec': (counts[present] * scale).round(2).tolist(),
+        }
+
+    def recent(self, n):
+        """The last n entries as (ts, cls_id, conf) arrays, oldest first."""
+        n = min(n, len(self))
+        slots = self._slots(self.head - n, self.head)
+        return self.ts[slots], self.cls_id[slots], self.conf[slots]
@@ -0,0 +1,123 @@
+"""
+NumPy-backed detections container.
+
+Built from an ultralytics result with a single ``.cpu().numpy()`` transfer, so filtering and
+counting are vectorized instead of walking ``result.boxes`` one box at a time.
+"""
+import time
+
+import numpy as np
+
+
+class Detections:
+    """
+    Columnar detections: xyxy (N, 4), conf (N,), cls_id (N,) and frame_ts (N,).
+
+    track_id (N,) is set when the boxes come from a tracker and is None otherwise.
+    """
+
+    __slots__ = ('xyxy', 'conf', 'cls_id', 'frame_ts', 'names', 'track_id')
+
+    def __init__(self, xyxy, conf, cls_id, frame_ts, names=None, track_id=None):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls_id = cls_id
+        self.frame_ts = frame_ts
+        self.names = names or {}
+        self.track_id = track_id
+
+    @classmethod
+    def empty(cls, names=None):
+        return cls(np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32),
+                   np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64), names)
+
+    @classmethod
+    def from_result(cls, result, frame_ts=None):
+        """Build from one ultralytics Results object."""
+        if frame_ts is None:
+            frame_ts = time.time()
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return cls.empty(result.names)
+        # boxes.data: x1, y1, x2, y2, [track_id,] conf, cls
+        data = boxes.data.cpu().numpy()
+        return cls(
+            np.ascontiguousarray(data[:, :4], dtype=np.float32),
+            data[:, -2].astype(np.float32),
+            data[:, -1].astype(np.int32),
+            np.full(len(data), frame_ts, dtype=np.float64),
+            result.names,
+            data[:, 4].astype(np.int64) if data.shape[1] == 7 else None,
+        )
+
+    @classmethod
+    def from_results(cls, results, frame_ts=None):
+        """Build from the list returned by ``model(...)``; results are concatenated."""
+        return cls.concat([cls.from_result(r, frame_ts) for r in results])
+
+    @classmethod
+    def concat(cls, items):
+        items = list(items)
+        if not items:
+            return cls.empty()
+        return cls(
+            np.concatenate([d.xyxy for d in items]),
+            np.concatenate([d.conf for d in items]),
+            np.concatenate([d.cls_id for d in items]),
+            np.concatenate([d.frame_ts for d in items]),
+            items[0].names,
+            np.concatenate([d.track_id for d in items])
+            if all(d.track_id is not None for d in items) else None,
+        )
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __getitem__(self, index):
+        """Index with a boolean mask, an index array or a slice."""
+        return Detections(self.xyxy[index], self.conf[index], self.cls_id[index],
+                          self.frame_ts[index], self.names,
+                          self.track_id[index] if self.track_id is not None else None)
+
+    def class_ids(self, class_names):
+        """Map class names to ids using this container's names."""
+        lookup = {name: i for i, name in self.names.items()}
+        return [lookup[n] for n in class_names if n in lookup]
+
+    def mask(self, min_conf=None, classes=None):
+        """Boolean mask for detections with conf >= min_conf and cls_id in classes."""
+        keep = np.ones(len(self), dtype=bool)
+        if min_conf is not None:
+            keep &= self.conf >= min_conf
+        if classes is not None:
+            keep &= np.isin(self.cls_id, np.fromiter(classes, dtype=np.int32))
+        return keep
+
+    def filter(self, min_conf=None, classes=None):
+        """Return the detections above min_conf whose cls_id is in classes."""
+        return self[self.mask(min_conf, classes)]
+
+    def counts(self, num_classes=None):
+        """Per-class counts as an array indexed by class id."""
+        minlength = num_classes if num_classes is not None else len(self.names)
+        return np.bincount(self.cls_id, minlength=minlength)
+
+    def count_by_name(self):
+        """Return {class_name: count} for the classes present."""
+        ids, counts = np.unique(self.cls_id, return_counts=True)
+        return {self.names.get(int(i), str(i)): int(c) for i, c in zip(ids, counts)}
+
+    def labels(self):
+        """Class names for each detection."""
+        return [self.names.get(int(i), str(i)) for i in self.cls_id]
+
+    def to_records(self):
+        """List of dicts, for JSON responses and tables."""
+        records = [
+            {'class_id': int(c), 'class': name, 'confidence': float(p), 'box': box}
+            for c, name, p, box in zip(self.cls_id, self.labels(), self.conf, self.xyxy.tolist())
+        ]
+        if self.track_id is not None:
+            for record, track_id in zip(records, self.track_id.tolist()):
+                record['track_id'] = track_id
+        return records
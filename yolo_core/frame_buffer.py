@@ -0,0 +1,98 @@
+"""
+Latest-frame-only shared buffer between a producer thread and a view.
+
+The producer resizes and converts each frame to RGB straight into a preallocated slot, and the
+view picks up the newest frame when it repaints. Nothing queues: a frame the view never saw is
+overwritten and counted as dropped.
+"""
+import threading
+
+import cv2
+import numpy as np
+
+
+class LatestFrameBuffer:
+    """
+    Preallocated RGB slots: one being written, one holding the latest frame and one being read.
+
+    A third slot (instead of plain double buffering) lets the writer keep going while the
+    reader still holds the frame it is painting, without either side copying.
+    """
+
+    def __init__(self, width=640, height=480):
+        self._lock = threading.Lock()
+        self._target = (width, height)
+        self._slots = [np.zeros((height, width, 3), dtype=np.uint8) for _ in range(3)]
+        self._shapes = [(0, 0)] * 3
+        self._scratch = None
+        self._latest = None
+        self._reading = None
+        self._unread = False
+        self.written = 0
+        self.read = 0
+        self.dropped = 0
+
+    def set_target_size(self, width, height):
+        """Called by the view when it is resized; the producer scales frames to fit."""
+        with self._lock:
+            self._target = (max(1, int(width)), max(1, int(height)))
+
+    def _free_slot(self):
+        for i in range(3):
+            if i != self._latest and i != self._reading:
+                return i
+
+    def write(self, frame_bgr):
+        """
+        Scale frame_bgr to fit the target size, convert to RGB into a free slot and publish it.
+
+        Returns True when the view had already picked up the previous frame, i.e. when it needs
+        to be notified; otherwise a notification is still pending and the frame just replaces it.
+        """
+        with self._lock:
+            target_w, target_h = self._target
+            slot = self._free_slot()
+        h, w = frame_bgr.shape[:2]
+        scale = min(target_w / w, target_h / h)
+        out_w, out_h = max(1, int(w * scale)), max(1, int(h * scale))
+        if self._scratch is None or self._scratch.shape[:2] != (out_h, out_w):
+            self._scratch = np.empty((out_h, out_w, 3), dtype=np.uint8)
+        cv2.resize(frame_bgr, (out_w, out_h), dst=self._scratch, interpolation=cv2.INTER_AREA)
+        dst = self._slots[slot]
+        if dst.shape[:2] != (target_h, target_w):
+            # La vista cambió de tamaño: sólo se reasigna la ranura libre
+            dst = self._slots[slot] = np.zeros((target_h, target_w, 3), dtype=np.uint8)
+        cv2.cvtColor(self._scratch, cv2.COLOR_BGR2RGB, dst=dst[:out_h, :out_w])
+        with self._lock:
+            self._shapes[slot] = (out_w, out_h)
+            pending = self._unread
+            if pending:
+                self.dropped += 1
+            self._latest = slot
+            self._unread = True
+            self.written += 1
+        return not pending
+
+    def acquire(self):
+        """
+        Return (rgb_array, width, height) of the newest frame, or None.
+
+        The array stays valid until release(); its rows are padded to the target width.
+        """
+        with self._lock:
+            if self._latest is None:
+                return None
+            self._reading = self._latest
+            if self._unread:
+                self.read += 1
+            self._unread = False
+            out_w, out_h = self._shapes[self._reading]
+            return self._slots[self._reading], out_w, out_h
+
+    def release(self):
+        with self._lock:
+            self._reading = None
+
+    def has_new_frame(self):
+        with self._lock:
+            return self._unread
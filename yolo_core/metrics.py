@@ -0,0 +1,341 @@
+"""
+Low-overhead instrumentation shared by every entry point.
+
+Counters, gauges and fixed-bucket histograms live in a process-wide registry (`metrics`). Stage
+timings go to one histogram labelled by stage (capture, preprocess, inference, postprocess,
+plot, encode, display, ...). The registry renders in Prometheus text format for /metrics and
+as short summary lines for periodic log dumps. `profiler` is a sampling profiler that can be
+started and stopped at runtime (e.g. with SIGUSR1) and writes folded stacks for flame graphs.
+
+Configuration (environment):
+    METRICS_LOG_INTERVAL  seconds between metric log dumps in the desktop/CLI tools (0 = off)
+    PROFILE               set to 1 to start the sampling profiler at startup
+    PROFILE_OUTPUT        folded-stack output path (default profile.folded)
+"""
+import bisect
+import collections
+import os
+import signal
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Segundos: de 0,5 ms a 5 s cubre desde un dibujado hasta una carga de modelo
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, fn=None):
+        self._value = 0
+        self._fn = fn
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self._value += n
+
+    @property
+    def value(self):
+        return self._fn() if self._fn is not None else self._value
+
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, fn=None):
+        self._value = 0.0
+        self._fn = fn
+
+    def set(self, value):
+        self._value = value
+
+    @property
+    def value(self):
+        return self._fn() if self._fn is not None else self._value
+
+
+class Histogram:
+    """Fixed buckets for Prometheus plus a small reservoir of recent values for percentiles."""
+
+    kind = 'histogram'
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, recent=1024):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.recent = collections.deque(maxlen=recent)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+            self.recent.append(value)
+
+    def percentile(self, q):
+        values = list(self.recent)
+        return float(np.percentile(values, q)) if values else 0.0
+
+
+class _StageTimer:
+    __slots__ = ('histogram', 't0')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.t0)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Get-or-create registry of metrics keyed by name and labels.
+    """
+
+    def __init__(self, prefix='yolo_'):
+        self.prefix = prefix
+        self._metrics = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = cls(**kwargs)
+                    self._metrics[key] = metric
+                    if help:
+                        self._help.setdefault(name, help)
+        return metric
+
+    def counter(self, name, help='', fn=None, **labels):
+        """Monotonic counter; fn reads the value from an existing attribute (e.g. queue.dropped)."""
+        return self._get(Counter, name, help, labels, fn=fn)
+
+    def gauge(self, name, help='', fn=None, **labels):
+        return self._get(Gauge, name, help, labels, fn=fn)
+
+    def histogram(self, name, help='', buckets=DEFAULT_BUCKETS, **labels):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def stage(self, stage):
+        return self.histogram('stage_seconds', 'Processing time per pipeline stage', stage=stage)
+
+    def time(self, stage):
+        """Context manager that records the elapsed time of a stage."""
+        return _StageTimer(self.stage(stage))
+
+    def observe(self, stage, seconds):
+        self.stage(stage).observe(seconds)
+
+    def observe_speed(self, results):
+        """Record ultralytics' own per-image preprocess/inference/postprocess (NMS) times."""
+        for result in results:
+            speed = getattr(result, 'speed', None) or {}
+            for stage in ('preprocess', 'inference', 'postprocess'):
+                if speed.get(stage) is not None:
+                    self.stage(stage).observe(speed[stage] / 1000.0)
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        by_name = collections.OrderedDict()
+        for (name, labels), metric in sorted(list(self._metrics.items()), key=lambda item: item[0]):
+            by_name.setdefault(name, []).append((labels, metric))
+        lines = []
+        for name, entries in by_name.items():
+            full = self.prefix + name
+            if name in self._help:
+                lines.append(f'# HELP {full} {self._help[name]}')
+            lines.append(f'# TYPE {full} {entries[0][1].kind}')
+            for labels, metric in entries:
+                if metric.kind != 'histogram':
+                    lines.append(f'{full}{_label_text(labels)} {metric.value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), metric.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{full}_bucket{_label_text(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{full}_sum{_label_text(labels)} {metric.sum}')
+                lines.append(f'{full}_count{_label_text(labels)} {metric.count}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """Plain dict of current values; histograms as count/mean/p50/p99/max in ms."""
+        out = {}
+        for (name, labels), metric in list(self._metrics.items()):
+            key = name + _label_text(labels)
+            if metric.kind == 'histogram':
+                out[key] = {
+                    'count': metric.count,
+                    'mean_ms': metric.sum / metric.count * 1000 if metric.count else 0.0,
+                    'p50_ms': metric.percentile(50) * 1000,
+                    'p99_ms': metric.percentile(99) * 1000,
+                    'max_ms': metric.max * 1000,
+                }
+            else:
+                out[key] = metric.value
+        return out
+
+    def summary_lines(self):
+        lines = []
+        for key, value in sorted(self.snapshot().items()):
+            if isinstance(value, dict):
+                lines.append(f"{key}: n={value['count']} media {value['mean_ms']:.2f} ms, "
+                             f"p50 {value['p50_ms']:.2f} ms, p99 {value['p99_ms']:.2f} ms, "
+                             f"max {value['max_ms']:.2f} ms")
+            else:
+                lines.append(f"{key}: {value:g}" if isinstance(value, (int, float)) else f"{key}: {value}")
+        return lines
+
+
+class MetricsLogger(threading.Thread):
+    """Prints the registry summary every interval seconds."""
+
+    def __init__(self, registry, interval=60.0, log=print):
+        super().__init__(daemon=True)
+        self.registry = registry
+        self.interval = interval
+        self.log = log
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.log(f"[metrics] {time.strftime('%H:%M:%S')}")
+            for line in self.registry.summary_lines():
+                self.log(f"  {line}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_logger_from_env(registry=None, default_interval=0):
+    """Start a MetricsLogger if METRICS_LOG_INTERVAL (or the default) is > 0."""
+    interval = float(os.getenv("METRICS_LOG_INTERVAL", default_interval))
+    if interval <= 0:
+        return None
+    logger = MetricsLogger(registry or metrics, interval)
+    logger.start()
+    return logger
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads at a fixed interval and aggregates them as folded stacks.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, reset=True):
+        with self._lock:
+            if self.running:
+                return
+            if reset:
+                self.stacks.clear()
+                self.samples = 0
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name='sampling-profiler')
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            self._stop_event.set()
+            if self._thread is not None:
+                self._thread.join(timeout=1)
+            self._thread = None
+
+    def toggle(self):
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+        return self.running
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                parts = []
+                while frame is not None and len(parts) < self.max_depth:
+                    code = frame.f_code
+                    parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(parts))] += 1
+            self.samples += 1
+
+    def top(self, n=20):
+        """Functions with the most samples at the top of the stack: [(function, share)]."""
+        leaves = collections.Counter()
+        total = 0
+        for stack, count in list(self.stacks.items()):
+            leaves[stack.rsplit(';', 1)[-1]] += count
+            total += count
+        return [(name, count / total) for name, count in leaves.most_common(n)] if total else []
+
+    def write_folded(self, path):
+        """Write 'frame;frame;frame count' lines (flamegraph.pl / speedscope input)."""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+def install_profiler_signal(sampler=None, output=None):
+    """
+    Toggle the profiler with SIGUSR1 (where available); on stop the folded stacks are written.
+    Also starts it immediately when PROFILE=1.
+    """
+    sampler = sampler or profiler
+    output = output or os.getenv("PROFILE_OUTPUT", "profile.folded")
+
+    def toggle(*_):
+        if sampler.toggle():
+            print("[profiler] iniciado")
+        else:
+            print(f"[profiler] detenido, {sampler.samples} muestras en {sampler.write_folded(output)}")
+
+    if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, toggle)
+    if os.getenv("PROFILE") == "1":
+        sampler.start()
+    return toggle
+
+
+metrics = MetricsRegistry()
+profiler = SamplingProfiler()
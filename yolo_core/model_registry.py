@@ -0,0 +1,193 @@
+"""
+Process-wide YOLO model registry.
+
+Every entry point gets its models from here so each weight file is loaded once, kept in an
+LRU bounded by model count and/or memory, and warmed up with a dummy inference on load.
+
+Configuration (environment):
+    MODEL_CACHE_SIZE  maximum number of resident models (default 2)
+    MODEL_CACHE_MB    maximum resident parameter memory in MB (default unbounded)
+    MODEL_WARMUP      set to 0 to skip the warm-up inference
+    MODEL_IMGSZ       image size used for the warm-up and for exports (default 640)
+    YOLO_BACKEND      torch | onnx | openvino (default torch), see yolo_core.backends
+"""
+import gc
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from yolo_core.backends import artifact_bytes, load_model, resolve_backend
+
+COCO_NAMES = [
+    'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat',
+    'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat', 'dog',
+    'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe', 'backpack', 'umbrella',
+    'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard', 'sports ball', 'kite',
+    'baseball bat', 'baseball glove', 'skateboard', 'surfboard', 'tennis racket', 'bottle',
+    'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple', 'sandwich', 'orange',
+    'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake', 'chair', 'couch', 'potted plant',
+    'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse', 'remote', 'keyboard', 'cell phone',
+    'microwave', 'oven', 'toaster', 'sink', 'refrigerator', 'book', 'clock', 'vase', 'scissors',
+    'teddy bear', 'hair drier', 'toothbrush',
+]
+
+# Nombres exactos de los pesos oficiales entrenados en COCO: sus clases se conocen sin cargar el
+# modelo. Un fine-tune (yolov8n_custom.pt, yolov8s-helmets.pt) no coincide y se carga o usa su sidecar
+_COCO_WEIGHTS = re.compile(r'^yolo(v5[nsmlx]u|v8[nsmlx]|v9[tsmce]|v10[nsmblx]|11[nsmlx])\.pt$')
+
+
+def _names_sidecar(weights):
+    return os.path.splitext(weights)[0] + '.names.json'
+
+
+def _model_bytes(model):
+    try:
+        return sum(p.numel() * p.element_size() for p in model.model.parameters())
+    except Exception:
+        pass
+    # Modelos exportados: model.model es la ruta del artefacto
+    try:
+        return artifact_bytes(str(model.model))
+    except Exception:
+        return 0
+
+
+class ModelRegistry:
+    """
+    LRU cache of loaded YOLO models keyed by (weight path, backend).
+    """
+
+    def __init__(self, max_models=2, max_bytes=None, warmup=True, imgsz=640, backend='torch'):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.warmup = warmup
+        self.imgsz = imgsz
+        self.backend = resolve_backend(backend)
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._names = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, weights, backend=None):
+        """Return the model for weights, loading and warming it up on first use."""
+        key = (weights, resolve_backend(backend or self.backend))
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Carga fuera del lock global para no bloquear a otros modelos
+        with load_lock:
+            with self._lock:
+                model = self._models.get(key)
+                if model is not None:
+                    self._models.move_to_end(key)
+                    return model
+            model = self._load(*key)
+            with self._lock:
+                self._models[key] = model
+                self._sizes[key] = _model_bytes(model)
+                self._names[weights] = dict(model.names)
+                self._evict(keep=key)
+            return model
+
+    def _load(self, weights, backend):
+        model = load_model(weights, backend, imgsz=self.imgsz)
+        self.loads += 1
+        if self.warmup:
+            model(np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8), verbose=False)
+        self._write_names(weights, model.names)
+        return model
+
+    def _write_names(self, weights, names):
+        if not os.path.isfile(weights):
+            return
+        try:
+            with open(_names_sidecar(weights), 'w') as f:
+                json.dump({str(k): v for k, v in names.items()}, f)
+        except OSError:
+            pass
+
+    def _evict(self, keep):
+        evicted = False
+        while len(self._models) > 1:
+            over_count = self.max_models is not None and len(self._models) > self.max_models
+            over_bytes = self.max_bytes is not None and sum(self._sizes.values()) > self.max_bytes
+            if not (over_count or over_bytes):
+                break
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                break
+            del self._models[oldest]
+            self._sizes.pop(oldest, None)
+            self.evictions += 1
+            evicted = True
+        if evicted:
+            gc.collect()
+            try:
+                import torch
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            except ImportError:
+                pass
+
+    def class_names(self, weights):
+        """Return {id: name} for weights without loading the model when possible."""
+        with self._lock:
+            if weights in self._names:
+                return self._names[weights]
+        sidecar = _names_sidecar(weights)
+        if os.path.isfile(sidecar):
+            with open(sidecar) as f:
+                names = {int(k): v for k, v in json.load(f).items()}
+        elif _COCO_WEIGHTS.match(os.path.basename(weights)):
+            names = dict(enumerate(COCO_NAMES))
+        else:
+            names = dict(self.get(weights).names)
+        with self._lock:
+            self._names[weights] = names
+        return names
+
+    def loaded(self):
+        """Return the resident (weights, backend) keys and their memory, most recent last."""
+        with self._lock:
+            return [(key, self._sizes.get(key, 0)) for key in self._models]
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._sizes.clear()
+        gc.collect()
+
+
+def _env_registry():
+    max_mb = os.getenv("MODEL_CACHE_MB")
+    return ModelRegistry(
+        max_models=int(os.getenv("MODEL_CACHE_SIZE", "2")),
+        max_bytes=int(float(max_mb) * 1024 * 1024) if max_mb else None,
+        warmup=os.getenv("MODEL_WARMUP", "1") != "0",
+        imgsz=int(os.getenv("MODEL_IMGSZ", "640")),
+        backend=os.getenv("YOLO_BACKEND", "torch"),
+    )
+
+
+registry = _env_registry()
+
+
+def get_model(weights, backend=None):
+    """Return the shared model for weights from the process-wide registry."""
+    return registry.get(weights, backend)
+
+
+def get_class_names(weights):
+    """Return {id: name} for weights from the process-wide registry."""
+    return registry.class_names(weights)
@@ -0,0 +1,191 @@
+"""
+Motion/change gating: run the detector only when the scene changed.
+
+A cheap pre-stage compares a small blurred grayscale thumbnail of each frame with the one from the
+last inference (method 'diff'), or feeds it to a MOG2 background model (method 'mog2'). The
+detector runs when the changed fraction passes a threshold or when max_stale seconds have gone
+by since the last inference; otherwise the previous detections are reused. With regions=True a
+change confined to part of the frame only runs the detector on that part (grown to cover the
+previous boxes it touches) and the boxes elsewhere are kept.
+
+Settings can differ per camera through a JSON file (MOTION_CONFIG):
+    {"default": {"threshold": 0.002, "max_stale": 2.0},
+     "0": {"regions": true},
+     "rtsp://cam2/stream": {"method": "mog2", "threshold": 0.01}}
+"""
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from yolo_core.detections import Detections
+from yolo_core.metrics import metrics
+
+METHODS = ('diff', 'mog2')
+
+
+def load_motion_config(camera, path=None):
+    """MotionGate keyword arguments for camera: the file's "default" entry updated with its own."""
+    path = path or os.getenv("MOTION_CONFIG")
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        config = json.load(f)
+    settings = dict(config.get('default', {}))
+    settings.update(config.get(str(camera), {}))
+    return settings
+
+
+class MotionGate:
+    """
+    Decides per frame whether the scene changed enough to run the detector.
+
+    threshold is the fraction of thumbnail pixels that must change by more than pixel_threshold
+    (0-255) since the last inference.
+    """
+
+    def __init__(self, threshold=0.002, pixel_threshold=25, width=160, max_stale=2.0, method='diff',
+                 regions=False, max_region_fraction=0.5, region_pad=0.05):
+        if method not in METHODS:
+            raise ValueError(f"Método de detección de cambios desconocido: {method}")
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.width = width
+        self.max_stale = max_stale
+        self.method = method
+        self.regions = regions
+        self.max_region_fraction = max_region_fraction
+        self.region_pad = region_pad
+        self.last_change = 0.0
+        self.gate_time = 0.0
+        self._reference = None
+        self._last_inference = None
+        self._bg = cv2.createBackgroundSubtractorMOG2(history=300, detectShadows=False) if method == 'mog2' else None
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        h, w = gray.shape[:2]
+        height = max(int(h * self.width / w), 1)
+        small = cv2.resize(gray, (self.width, height), interpolation=cv2.INTER_AREA)
+        # El desenfoque quita el ruido del sensor antes de comparar
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def check(self, frame, now=None):
+        """
+        Return (run, region). region is x0, y0, x1, y1 in frame pixels when regions=True and the
+        change is confined to that box; None means the whole frame.
+        """
+        t0 = time.perf_counter()
+        now = time.monotonic() if now is None else now
+        small = self._thumbnail(frame)
+        if self._bg is not None:
+            mask = self._bg.apply(small) > 0
+        elif self._reference is not None and self._reference.shape == small.shape:
+            mask = cv2.absdiff(small, self._reference) > self.pixel_threshold
+        else:
+            mask = None
+
+        stale = self._last_inference is None or now - self._last_inference >= self.max_stale
+        self.last_change = float(mask.mean()) if mask is not None else 1.0
+        run = mask is None or stale or self.last_change >= self.threshold
+        region = None
+        if run and self.regions and mask is not None and not stale:
+            region = self._region(mask, frame.shape)
+        if run:
+            self._reference = small
+            self._last_inference = now
+        self.gate_time += time.perf_counter() - t0
+        return run, region
+
+    def _region(self, mask, shape):
+        ys, xs = np.nonzero(mask)
+        if len(xs) == 0:
+            return None
+        sh, sw = mask.shape
+        h, w = shape[:2]
+        x0, x1 = xs.min() / sw, (xs.max() + 1) / sw
+        y0, y1 = ys.min() / sh, (ys.max() + 1) / sh
+        if (x1 - x0) * (y1 - y0) > self.max_region_fraction:
+            return None
+        pad = self.region_pad
+        return (int(max(x0 - pad, 0) * w), int(max(y0 - pad, 0) * h),
+                int(min(x1 + pad, 1) * w), int(min(y1 + pad, 1) * h))
+
+
+def _touching(detections, region):
+    x0, y0, x1, y1 = region
+    b = detections.xyxy
+    return (b[:, 0] < x1) & (b[:, 2] > x0) & (b[:, 1] < y1) & (b[:, 3] > y0)
+
+
+class GatedDetector:
+    """
+    Wraps a detect(image) -> Detections callable with a MotionGate.
+
+    Returns (detections, inferred). Skipped frames get the previous detections re-stamped with
+    the current time, so rolling statistics keep counting them.
+    """
+
+    def __init__(self, detect, gate=None, camera='0'):
+        self.detect = detect
+        self.gate = gate or MotionGate()
+        self.last = None
+        self.frames = 0
+        self.inferred = 0
+        self.region_inferences = 0
+        self.skipped = 0
+        labels = {'camera': str(camera)}
+        self._counters = {
+            result: metrics.counter('gate_frames_total', 'Frames seen by the motion gate', result=result, **labels)
+            for result in ('inferred', 'region', 'skipped')
+        }
+
+    def __call__(self, frame, now=None):
+        self.frames += 1
+        with metrics.time('motion'):
+            run, region = self.gate.check(frame, now)
+        if not run and self.last is not None:
+            self.skipped += 1
+            self._counters['skipped'].inc()
+            last = self.last
+            return Detections(last.xyxy, last.conf, last.cls_id,
+                              np.full(len(last), time.time(), dtype=np.float64), last.names), False
+
+        if region is not None and self.last is not None:
+            # La región crece hasta cubrir las cajas anteriores que toca, para no cortar objetos
+            touched = _touching(self.last, region)
+            if touched.any():
+                boxes = self.last.xyxy[touched]
+                h, w = frame.shape[:2]
+                region = (int(max(min(region[0], boxes[:, 0].min()), 0)), int(max(min(region[1], boxes[:, 1].min()), 0)),
+                          int(min(max(region[2], boxes[:, 2].max()), w)), int(min(max(region[3], boxes[:, 3].max()), h)))
+            x0, y0, x1, y1 = region
+            found = self.detect(frame[y0:y1, x0:x1])
+            found = Detections(found.xyxy + np.array([x0, y0, x0, y0], dtype=np.float32),
+                               found.conf, found.cls_id, found.frame_ts, found.names or self.last.names)
+            kept = self.last[~_touching(self.last, region)]
+            self.last = Detections.concat([found, kept])
+            self.region_inferences += 1
+            self._counters['region'].inc()
+        else:
+            self.last = self.detect(frame)
+            self.inferred += 1
+            self._counters['inferred'].inc()
+        return self.last, True
+
+    def stats(self):
+        """Counters plus an estimate of the inference time saved (skipped frames x mean model time)."""
+        model = metrics.stage('model')
+        mean_model = model.sum / model.count if model.count else 0.0
+        return {
+            'frames': self.frames,
+            'inferred': self.inferred,
+            'region_inferences': self.region_inferences,
+            'skipped': self.skipped,
+            'skip_ratio': self.skipped / self.frames if self.frames else 0.0,
+            'last_change': self.gate.last_change,
+            'gate_ms': self.gate.gate_time / self.frames * 1000 if self.frames else 0.0,
+            'saved_s': max(self.skipped * mean_model - self.gate.gate_time, 0.0),
+        }
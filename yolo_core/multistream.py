@@ -0,0 +1,187 @@
+"""
+Multi-stream runner: N captures feeding one shared inference worker.
+
+Each source (camera index, video file or RTSP/HTTP URL) is read on its own thread into a
+latest-frame slot. A single worker takes at most one fresh frame per stream per batch, starting
+from a rotating offset so every stream gets a fair share, and runs them through one model call.
+Memory stays at one model no matter how many streams there are.
+"""
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from yolo_core.detections import Detections
+from yolo_core.queues import DropOldestQueue
+from yolo_core.scheduler import RateMeter
+
+
+def parse_source(source):
+    """Camera indices come in as strings from the CLI."""
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+class StreamReader(threading.Thread):
+    """Reads one source into a latest-frame slot; older unread frames are dropped."""
+
+    def __init__(self, stream_id, source, frame_available, realtime=True):
+        super().__init__(daemon=True)
+        self.stream_id = stream_id
+        self.source = parse_source(source)
+        self.frame_available = frame_available
+        self.realtime = realtime
+        self.frames = DropOldestQueue(1)
+        self.running = True
+        self.finished = False
+        self.captured = 0
+        self.capture_rate = RateMeter()
+
+    def run(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            print(f"Error: No se pudo abrir la fuente {self.source}")
+            self.finished = True
+            return
+        # Los archivos se leen a su velocidad nominal para simular una cámara
+        is_file = isinstance(self.source, str) and '://' not in self.source
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        period = 1.0 / fps if (self.realtime and is_file and fps > 0) else 0.0
+        deadline = time.monotonic()
+        while self.running:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            now = time.monotonic()
+            self.captured += 1
+            self.capture_rate.tick(now)
+            self.frames.put_latest((frame, now))
+            self.frame_available.set()
+            if period:
+                deadline += period
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    deadline = time.monotonic()
+        cap.release()
+        self.finished = True
+        self.frame_available.set()
+
+    @property
+    def dropped(self):
+        return self.frames.dropped
+
+
+class StreamStats:
+    def __init__(self, window=1000):
+        self.processed = 0
+        self.latencies = deque(maxlen=window)
+        self.infer_rate = RateMeter()
+
+    def record(self, latency, now):
+        self.processed += 1
+        self.latencies.append(latency)
+        self.infer_rate.tick(now)
+
+
+class MultiStreamRunner:
+    """
+    Round-robin batching of the newest frame from each stream through one model.
+
+    on_result(stream_id, frame, result, detections) is called on the worker thread for each
+    processed frame.
+    """
+
+    def __init__(self, model, sources, conf=0.5, imgsz=640, max_batch=None, on_result=None, realtime=True):
+        self.model = model
+        self.conf = conf
+        self.imgsz = imgsz
+        self.on_result = on_result
+        self.frame_available = threading.Event()
+        self.readers = [StreamReader(i, src, self.frame_available, realtime) for i, src in enumerate(sources)]
+        self.max_batch = max_batch or len(self.readers)
+        self.stats_by_stream = [StreamStats() for _ in self.readers]
+        self.batches = 0
+        self.batch_sizes = deque(maxlen=1000)
+        self.infer_time = 0.0
+        self.running = True
+        self._next = 0
+
+    def _collect(self):
+        """Take at most one frame per stream, starting after the last stream served."""
+        batch = []
+        n = len(self.readers)
+        last = None
+        for k in range(n):
+            i = (self._next + k) % n
+            try:
+                frame, ts = self.readers[i].frames.get_nowait()
+            except queue.Empty:
+                continue
+            batch.append((i, frame, ts))
+            last = i
+            if len(batch) >= self.max_batch:
+                break
+        if last is not None:
+            self._next = (last + 1) % n
+        return batch
+
+    def run(self, duration=None):
+        for reader in self.readers:
+            reader.start()
+        start = time.monotonic()
+        try:
+            while self.running:
+                if duration is not None and time.monotonic() - start >= duration:
+                    break
+                self.frame_available.clear()
+                batch = self._collect()
+                if not batch:
+                    if all(r.finished for r in self.readers):
+                        break
+                    self.frame_available.wait(timeout=0.05)
+                    continue
+                t0 = time.perf_counter()
+                results = self.model([item[1] for item in batch], conf=self.conf, imgsz=self.imgsz, verbose=False)
+                self.infer_time += time.perf_counter() - t0
+                self.batches += 1
+                self.batch_sizes.append(len(batch))
+                now = time.monotonic()
+                for (stream_id, frame, ts), result in zip(batch, results):
+                    self.stats_by_stream[stream_id].record(now - ts, now)
+                    if self.on_result is not None:
+                        self.on_result(stream_id, frame, result, Detections.from_result(result))
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.running = False
+        for reader in self.readers:
+            reader.running = False
+
+    def stats(self):
+        now = time.monotonic()
+        streams = []
+        for reader, stats in zip(self.readers, self.stats_by_stream):
+            latencies = np.asarray(list(stats.latencies)) * 1000.0
+            streams.append({
+                'source': reader.source,
+                'captured': reader.captured,
+                'dropped': reader.dropped,
+                'processed': stats.processed,
+                'capture_fps': reader.capture_rate.rate(now),
+                'inference_fps': stats.infer_rate.rate(now),
+                'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+                'latency_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+            })
+        return {
+            'batches': self.batches,
+            'mean_batch_size': float(np.mean(list(self.batch_sizes))) if self.batch_sizes else 0.0,
+            'inference_s': self.infer_time,
+            'streams': streams,
+        }
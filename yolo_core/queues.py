@@ -0,0 +1,31 @@
+"""
+Queue helpers shared by the capture/inference pipelines.
+"""
+import queue
+
+
+class DropOldestQueue(queue.Queue):
+    """Bounded queue that discards the oldest item instead of blocking the producer."""
+
+    def __init__(self, maxsize=1):
+        super().__init__(maxsize=maxsize)
+        self.dropped = 0
+
+    def put_latest(self, item):
+        while True:
+            try:
+                self.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def close(self, sentinel, timeout=0.5):
+        # Deja que el consumidor vacíe la cola antes de recurrir a descartar
+        try:
+            self.put(sentinel, timeout=timeout)
+        except queue.Full:
+            self.put_latest(sentinel)
@@ -0,0 +1,336 @@
+"""
+Background video recorder with segment rotation, a disk budget and event-triggered clips.
+
+Callers hand frames to ``write``, which never blocks: when the bounded queue is full the frame is
+dropped and counted. A writer thread encodes with cv2.VideoWriter; OpenCV releases the GIL while
+encoding, so a thread is enough to keep the encoder out of the capture/inference loop.
+
+- Segments rotate by duration and/or file size. After each segment the oldest files are deleted
+  until the directory fits the disk budget.
+- When the capture reports no usable FPS (0, or 90000 on many RTSP streams) the rate is measured
+  from the first frames. Gaps left by dropped or slow frames are filled by repeating the frame,
+  so playback keeps wall-clock speed.
+- In event mode nothing is encoded until ``trigger`` is called. The last pre_roll seconds wait in
+  a ring buffer and are written first; the clip ends post_roll seconds after the last trigger.
+  Pre-roll frames are kept JPEG-compressed (pre_roll_quality) and the ring is capped at
+  max_pre_roll_bytes, so a long pre-roll at 4K does not hold gigabytes of raw frames.
+
+Configuration (environment):
+    RECORD_FOURCC   codec FourCC (default mp4v; avc1 where the OpenCV build has H.264)
+"""
+import glob
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cv2
+
+from yolo_core.metrics import metrics
+
+MIN_FPS = 1.0
+MAX_FPS = 120.0
+RECORD_MODES = ('continuous', 'event')
+
+
+def capture_fps(cap):
+    """FPS reported by a capture, or None when it is missing or implausible (0, 90000, ...)."""
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if not fps or not MIN_FPS <= fps <= MAX_FPS:
+        return None
+    return float(fps)
+
+
+class VideoRecorder:
+    """
+    Encodes frames on a background thread into rotating segment files.
+
+    Frames passed to ``write`` are kept by reference until they are encoded, so the caller must
+    not draw on them afterwards (a fresh frame from cap.read() each time is fine).
+    """
+
+    def __init__(self, output_dir='recordings', prefix='recording', fps=None, fourcc=None,
+                 extension='.mp4', segment_seconds=300, segment_bytes=None, max_total_bytes=None,
+                 mode='continuous', pre_roll=5.0, post_roll=10.0, max_pre_roll_frames=300,
+                 max_pre_roll_bytes=256 * 1024 * 1024, pre_roll_quality=90,
+                 queue_size=64, fallback_fps=15.0, probe_frames=30):
+        if mode not in RECORD_MODES:
+            raise ValueError(f"Modo de grabación desconocido: {mode}")
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.fps = fps if fps and MIN_FPS <= fps <= MAX_FPS else None
+        self.fourcc = fourcc or os.getenv("RECORD_FOURCC", "mp4v")
+        self.extension = extension
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.max_total_bytes = max_total_bytes
+        self.mode = mode
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.max_pre_roll_frames = max_pre_roll_frames
+        self.max_pre_roll_bytes = max_pre_roll_bytes
+        self.pre_roll_quality = pre_roll_quality
+        self.fallback_fps = fallback_fps
+        self.probe_frames = probe_frames
+        self.error = None
+        self.current_path = None
+        self.recent_segments = deque(maxlen=50)
+
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.frames_repeated = 0
+        self.segments_closed = 0
+        self.segments_deleted = 0
+        self.bytes_deleted = 0
+        self.triggers = 0
+        self._dropped_counter = metrics.counter('recorder_frames_dropped_total',
+                                                'Frames dropped by a full recorder queue')
+        self._written_counter = metrics.counter('recorder_frames_written_total',
+                                                'Frames encoded by the video recorder')
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        # Ventanas [inicio, fin] pendientes: el escritor puede ir por detrás de los disparos
+        self._events = deque()
+        # Pre-roll: (frame o JPEG, ts, comprimido); el tamaño se limita por frames y por bytes
+        self._ring = deque()
+        self._ring_bytes = 0
+        self._probe = []
+        self._writer = None
+        self._size = None
+        self._segment_start = 0.0
+        self._segment_frames = 0
+        self._sequence = 0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='video-recorder')
+        self._thread.start()
+
+    def write(self, frame, timestamp=None):
+        """Queue a BGR frame for encoding; never blocks. Returns False if the frame was dropped."""
+        if self.error is None:
+            try:
+                self._queue.put_nowait((frame, time.monotonic() if timestamp is None else timestamp))
+                return True
+            except queue.Full:
+                pass
+        self.frames_dropped += 1
+        self._dropped_counter.inc()
+        return False
+
+    def trigger(self, now=None):
+        """Start or extend an event clip: from now - pre_roll until now + post_roll."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._events and now <= self._events[-1][1]:
+                self._events[-1][1] = now + self.post_roll
+            else:
+                self._events.append([now, now + self.post_roll])
+            self.triggers += 1
+
+    @property
+    def recording(self):
+        return self._writer is not None
+
+    def close(self, timeout=10):
+        """Encode what is still queued, close the current segment and stop the thread."""
+        self._stop_event.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'fps': self.fps,
+            'fourcc': self.fourcc,
+            'queue_depth': self._queue.qsize(),
+            'frames_written': self.frames_written,
+            'frames_dropped': self.frames_dropped,
+            'frames_repeated': self.frames_repeated,
+            'segments': self.segments_closed,
+            'segments_deleted': self.segments_deleted,
+            'bytes_deleted': self.bytes_deleted,
+            'triggers': self.triggers,
+            'pre_roll_frames': len(self._ring),
+            'pre_roll_bytes': self._ring_bytes,
+            'recording': self.recording,
+            'current_path': self.current_path,
+            'error': self.error,
+        }
+
+    def _run(self):
+        while True:
+            try:
+                frame, ts = self._queue.get(timeout=0.25)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    break
+                # Un clip de evento se cierra aunque dejen de llegar frames
+                if self.mode == 'event' and self._writer is not None and self._event_window(time.monotonic()) is None:
+                    self._close_segment()
+                continue
+            self._handle(frame, ts)
+        if self._probe:
+            self._resolve_fps()
+            self._drain_probe()
+        self._close_segment()
+
+    def _handle(self, frame, ts):
+        if self.fps is None:
+            # Se mide la cadencia real con el primer segundo (o probe_frames frames)
+            self._probe.append((frame, ts))
+            if ts - self._probe[0][1] < 1.0 and len(self._probe) < self.probe_frames:
+                return
+            self._resolve_fps()
+            self._drain_probe()
+            return
+        self._route(frame, ts)
+
+    def _resolve_fps(self):
+        n = len(self._probe)
+        span = self._probe[-1][1] - self._probe[0][1]
+        fps = (n - 1) / span if n > 1 and span > 0 else self.fallback_fps
+        self.fps = min(max(fps, MIN_FPS), MAX_FPS)
+
+    def _drain_probe(self):
+        probe, self._probe = self._probe, []
+        for frame, ts in probe:
+            self._route(frame, ts)
+
+    def _route(self, frame, ts):
+        if self.mode == 'continuous':
+            self._encode(frame, ts)
+            return
+        window = self._event_window(ts)
+        if window is not None and window[0] <= ts:
+            start = window[0]
+            if self._writer is None:
+                # Se abre el clip con los frames de pre-roll
+                for data, old_ts, compressed in self._ring:
+                    if old_ts >= start - self.pre_roll:
+                        self._encode(cv2.imdecode(data, cv2.IMREAD_COLOR) if compressed else data, old_ts)
+                self._ring.clear()
+                self._ring_bytes = 0
+            self._encode(frame, ts)
+            return
+        if self._writer is not None:
+            self._close_segment()
+        self._buffer_pre_roll(frame, ts)
+
+    def _buffer_pre_roll(self, frame, ts):
+        if self.pre_roll <= 0:
+            return
+        data, compressed = frame, False
+        if self.pre_roll_quality:
+            ok, buf = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(self.pre_roll_quality)])
+            if ok:
+                data, compressed = buf, True
+        self._ring.append((data, ts, compressed))
+        self._ring_bytes += data.nbytes
+        while self._ring and (ts - self._ring[0][1] > self.pre_roll
+                              or len(self._ring) > self.max_pre_roll_frames
+                              or self._ring_bytes > self.max_pre_roll_bytes):
+            self._ring_bytes -= self._ring.popleft()[0].nbytes
+
+    def _event_window(self, ts):
+        """First event window that has not ended by ts; finished ones are discarded."""
+        with self._lock:
+            while self._events and self._events[0][1] < ts:
+                self._events.popleft()
+            return tuple(self._events[0]) if self._events else None
+
+    def _encode(self, frame, ts):
+        h, w = frame.shape[:2]
+        if self._writer is not None and self._should_rotate((w, h), ts):
+            self._close_segment()
+        if self._writer is None and not self._open_segment((w, h), ts):
+            return
+
+        # Huecos por frames perdidos o lentos: se repite el frame para mantener la velocidad real
+        slot = int((ts - self._segment_start) * self.fps)
+        gap = slot - self._segment_frames
+        max_fill = int(self.fps)
+        if gap > max_fill:
+            # Pausa larga: se resincroniza en lugar de rellenar segundos de frames repetidos
+            self._segment_start += (gap - max_fill) / self.fps
+            gap = max_fill
+        copies = 1 + max(gap, 0)
+        with metrics.time('encode'):
+            for _ in range(copies):
+                self._writer.write(frame)
+        self._segment_frames += copies
+        self.frames_written += 1
+        self.frames_repeated += copies - 1
+        self._written_counter.inc()
+
+    def _should_rotate(self, size, ts):
+        if size != self._size:
+            return True
+        if self.segment_seconds and ts - self._segment_start >= self.segment_seconds:
+            return True
+        # El tamaño del fichero se consulta una vez por segundo de video, no por frame
+        if self.segment_bytes and self._segment_frames % max(int(self.fps), 1) == 0:
+            try:
+                return os.path.getsize(self.current_path) >= self.segment_bytes
+            except OSError:
+                return False
+        return False
+
+    def _open_segment(self, size, ts):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._enforce_budget()
+        self._sequence += 1
+        suffix = '_event' if self.mode == 'event' else ''
+        name = f"{self.prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self._sequence:04d}{suffix}{self.extension}"
+        path = os.path.join(self.output_dir, name)
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, size)
+        if not writer.isOpened() and self.fourcc != 'mp4v':
+            print(f"[recorder] FourCC {self.fourcc} no disponible en este OpenCV, usando mp4v")
+            self.fourcc = 'mp4v'
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, size)
+        if not writer.isOpened():
+            self.error = f"No se pudo abrir {path} para escritura"
+            print(f"[recorder] {self.error}")
+            return False
+        self._writer = writer
+        self._size = size
+        self._segment_start = ts
+        self._segment_frames = 0
+        self.current_path = path
+        return True
+
+    def _close_segment(self):
+        if self._writer is None:
+            return
+        self._writer.release()
+        self._writer = None
+        self.recent_segments.append(self.current_path)
+        self.current_path = None
+        self.segments_closed += 1
+        self._enforce_budget()
+
+    def _enforce_budget(self):
+        """Delete the oldest segments until the recordings fit in max_total_bytes."""
+        if not self.max_total_bytes:
+            return
+        files = []
+        for path in glob.glob(os.path.join(self.output_dir, f"{self.prefix}_*{self.extension}")):
+            if path == self.current_path:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_total_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.segments_deleted += 1
+            self.bytes_deleted += size
@@ -0,0 +1,145 @@
+"""
+Fast detection annotation for the hot path, replacing ``results[0].plot()``.
+
+Boxes are drawn in place on the caller's frame (or into a reusable buffer) instead of on a new
+copy. Label text is rasterized once per class name and once per confidence value (0.00-1.00)
+into small colored patches, so a label is two slice copies with no per-frame font rendering.
+RGB output is produced with a single conversion into a reusable buffer, and when
+nobody is viewing or recording, nothing is drawn at all.
+"""
+import cv2
+import numpy as np
+
+# Misma paleta que ultralytics para que las cajas no cambien de color
+PALETTE_HEX = ('042AFF', '0BDBEB', 'F3F3F3', '00DFB7', '111F68', 'FF6FDD', 'FF444F', 'CCED00',
+               '00F344', 'BD00FF', '00B4FF', 'DD00BA', '00FFFF', '26C000', '01FFB3', '7D24FF',
+               '7B0068', 'FF1B6C', 'FC6D2F', 'A2FF0B')
+# Los IDs de pista crecen sin límite: la caché se vacía al llegar aquí
+MAX_PATCHES = 4096
+
+
+def _palette_bgr():
+    return [(int(h[4:6], 16), int(h[2:4], 16), int(h[0:2], 16)) for h in PALETTE_HEX]
+
+
+class AnnotationRenderer:
+    """
+    Draws Detections onto BGR frames with cached label patches.
+
+    Not thread-safe: use one renderer per drawing thread (the RGB buffer is reused).
+    """
+
+    def __init__(self, names=None, show_conf=True, line_width=None):
+        self.names = names or {}
+        self.show_conf = show_conf
+        self.line_width = line_width
+        self.colors = _palette_bgr()
+        # Texto negro sobre colores claros, blanco sobre oscuros
+        self.text_colors = [(0, 0, 0) if 0.299 * r + 0.587 * g + 0.114 * b > 160 else (255, 255, 255)
+                            for b, g, r in self.colors]
+        self._lw = None
+        self._label_h = 0
+        self._patches = {}
+        self._rgb = None
+
+    def _line_width(self, frame):
+        if self.line_width:
+            return self.line_width
+        h, w = frame.shape[:2]
+        return max(round((h + w) / 2 * 0.003), 2)
+
+    def _prepare(self, lw):
+        """Drop the glyph cache when the line width (i.e. frame size) changes."""
+        if lw == self._lw:
+            return
+        self._lw = lw
+        self._patches = {}
+        self._font_scale = lw / 3
+        self._thickness = max(lw - 1, 1)
+        self._pad = max(lw // 2, 1)
+        (_, th), baseline = cv2.getTextSize('Ag', cv2.FONT_HERSHEY_SIMPLEX, self._font_scale, self._thickness)
+        self._text_h = th
+        self._label_h = th + baseline + 2 * self._pad
+
+    def _patch(self, text, color_index, rgb):
+        """Label patch (background + anti-aliased text) for text in a palette color, cached."""
+        key = (text, color_index, rgb)
+        patch = self._patches.get(key)
+        if patch is None:
+            if len(self._patches) >= MAX_PATCHES:
+                self._patches = {}
+            (tw, _), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, self._font_scale, self._thickness)
+            alpha = np.zeros((self._label_h, tw + 2 * self._pad), dtype=np.uint8)
+            cv2.putText(alpha, text, (self._pad, self._pad + self._text_h), cv2.FONT_HERSHEY_SIMPLEX,
+                        self._font_scale, 255, self._thickness, cv2.LINE_AA)
+            color = np.array(self.colors[color_index], dtype=np.float32)
+            text_color = np.array(self.text_colors[color_index], dtype=np.float32)
+            if rgb:
+                color, text_color = color[::-1], text_color[::-1]
+            a = alpha[..., None].astype(np.float32) / 255.0
+            patch = (color * (1.0 - a) + text_color * a).astype(np.uint8)
+            self._patches[key] = patch
+        return patch
+
+    def draw(self, frame, detections, rgb=False):
+        """Draw detections onto frame in place and return it. rgb=True for RGB-ordered frames."""
+        n = len(detections)
+        if n == 0:
+            return frame
+        if detections.names and not self.names:
+            self.names = detections.names
+        lw = self._line_width(frame)
+        self._prepare(lw)
+        h, w = frame.shape[:2]
+        boxes = np.round(detections.xyxy).astype(np.int32)
+        np.clip(boxes[:, 0::2], 0, w - 1, out=boxes[:, 0::2])
+        np.clip(boxes[:, 1::2], 0, h - 1, out=boxes[:, 1::2])
+        conf_idx = np.clip(np.round(detections.conf * 100), 0, 100).astype(np.int32)
+        track_ids = detections.track_id.tolist() if detections.track_id is not None else [None] * n
+        n_colors = len(self.colors)
+        label_h = self._label_h
+
+        for (x1, y1, x2, y2), cls_id, ci, track_id in zip(boxes.tolist(), detections.cls_id.tolist(),
+                                                         conf_idx.tolist(), track_ids):
+            color_index = cls_id % n_colors
+            color = self.colors[color_index]
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color[::-1] if rgb else color, lw, cv2.LINE_AA)
+
+            # Nombre y confianza son dos parches cacheados; la etiqueta se compone con dos copias
+            patches = [self._patch(str(self.names.get(cls_id, cls_id)), color_index, rgb)]
+            if track_id is not None:
+                patches.append(self._patch(f' #{track_id}', color_index, rgb))
+            if self.show_conf:
+                patches.append(self._patch(f' {ci / 100:.2f}', color_index, rgb))
+            label_w = sum(p.shape[1] for p in patches)
+            # Etiqueta encima de la caja si cabe; si no, dentro
+            top = y1 - label_h if y1 >= label_h else y1
+            left = min(x1, max(0, w - label_w))
+            x = left
+            for patch in patches:
+                rows = min(patch.shape[0], h - top)
+                cols = min(patch.shape[1], w - x)
+                if cols <= 0 or rows <= 0:
+                    break
+                frame[top:top + rows, x:x + cols] = patch[:rows, :cols]
+                x += cols
+        return frame
+
+    def render(self, frame, detections, bgr=True, rgb=False):
+        """
+        Annotate a BGR frame and return (bgr, rgb) as requested.
+
+        The BGR output is frame itself, drawn in place; the RGB output is one conversion into a
+        reusable buffer. With bgr=False and rgb=False nothing is drawn and (None, None) is
+        returned, for loops where nobody is viewing or recording.
+        """
+        if not (bgr or rgb):
+            return None, None
+        self.draw(frame, detections)
+        out_rgb = None
+        if rgb:
+            if self._rgb is None or self._rgb.shape != frame.shape:
+                self._rgb = np.empty_like(frame)
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+            out_rgb = self._rgb
+        return (frame if bgr else None), out_rgb
@@ -0,0 +1,252 @@
+"""
+Content-addressed cache of detection results.
+
+Clients resubmit the same images (retries, thumbnails, dashboard refreshes). The key is a
+BLAKE2b hash of the decoded pixels plus whatever else changes the result (model, backend,
+confidence floor, image size, tiling), so a hit skips inference entirely.
+
+The memory tier is an LRU with a byte budget and a TTL. An optional SQLite tier
+(RESULT_CACHE_PATH) keeps results across restarts, with its own byte budget; disk hits are
+promoted to memory. Hits, misses and the inference time they saved are counted per cache.
+
+Configuration (environment):
+    RESULT_CACHE_MB       memory budget in MB (default 64, 0 disables the cache)
+    RESULT_CACHE_TTL      seconds a result stays valid (default 3600)
+    RESULT_CACHE_PATH     SQLite file for the on-disk tier (default: memory only)
+    RESULT_CACHE_DISK_MB  on-disk budget in MB (default 512)
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from yolo_core.detections import Detections
+from yolo_core.metrics import metrics
+
+# Coste aproximado de una entrada aparte de los arrays (objeto, clave, diccionario)
+ENTRY_OVERHEAD = 400
+_HEADER = struct.Struct('<II')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    compute REAL NOT NULL,
+    expires REAL NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+"""
+
+
+def image_key(image, *parts):
+    """Hex key for an image array plus the settings that affect its result."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((image.shape, str(image.dtype), parts)).encode())
+    h.update(np.ascontiguousarray(image).data)
+    return h.hexdigest()
+
+
+def pack_detections(detections):
+    names = json.dumps({str(k): v for k, v in detections.names.items()}).encode()
+    return (_HEADER.pack(len(detections), len(names)) + names
+            + detections.xyxy.astype('<f4').tobytes() + detections.conf.astype('<f4').tobytes()
+            + detections.cls_id.astype('<i4').tobytes())
+
+
+def unpack_detections(blob):
+    n, names_len = _HEADER.unpack_from(blob)
+    offset = _HEADER.size
+    names = {int(k): v for k, v in json.loads(blob[offset:offset + names_len]).items()}
+    offset += names_len
+    xyxy = np.frombuffer(blob, dtype='<f4', count=n * 4, offset=offset).reshape(n, 4).astype(np.float32)
+    offset += n * 16
+    conf = np.frombuffer(blob, dtype='<f4', count=n, offset=offset).astype(np.float32)
+    offset += n * 4
+    cls_id = np.frombuffer(blob, dtype='<i4', count=n, offset=offset).astype(np.int32)
+    return Detections(xyxy, conf, cls_id, np.zeros(n, dtype=np.float64), names)
+
+
+def _entry_bytes(detections):
+    return (detections.xyxy.nbytes + detections.conf.nbytes + detections.cls_id.nbytes
+            + detections.frame_ts.nbytes + ENTRY_OVERHEAD)
+
+
+class ResultCache:
+    """
+    LRU + TTL cache of Detections keyed by image_key. Thread-safe.
+
+    put() takes the seconds the result took to compute; every hit adds them to the saved time.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=3600, path=None, max_disk_bytes=512 * 1024 * 1024,
+                 name='default'):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self.name = name
+        self.bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_puts = 0
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        self._counters = {result: metrics.counter('result_cache_requests_total', 'Result cache lookups',
+                                                  cache=name, result=result)
+                          for result in ('hit', 'disk_hit', 'miss')}
+        self._saved = metrics.counter('result_cache_saved_seconds_total',
+                                      'Inference time avoided by result cache hits', cache=name)
+
+    @classmethod
+    def from_env(cls, name='default'):
+        """Cache configured from RESULT_CACHE_*; None when RESULT_CACHE_MB is 0."""
+        mb = float(os.getenv("RESULT_CACHE_MB", "64"))
+        if mb <= 0:
+            return None
+        return cls(max_bytes=int(mb * 1024 * 1024),
+                   ttl=float(os.getenv("RESULT_CACHE_TTL", "3600")),
+                   path=os.getenv("RESULT_CACHE_PATH") or None,
+                   max_disk_bytes=int(float(os.getenv("RESULT_CACHE_DISK_MB", "512")) * 1024 * 1024),
+                   name=name)
+
+    def get(self, key):
+        """Cached Detections (stamped with the current time) or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._counters['hit'].inc()
+            else:
+                entry = self._disk_get(key, now)
+                if entry is None:
+                    self.misses += 1
+                    self._counters['miss'].inc()
+                    return None
+                self.disk_hits += 1
+                self._counters['disk_hit'].inc()
+                self._store(key, entry)
+            expires, size, detections, compute = entry
+            self.saved_seconds += compute
+        self._saved.inc(compute)
+        return Detections(detections.xyxy, detections.conf, detections.cls_id,
+                          np.full(len(detections), now, dtype=np.float64), detections.names)
+
+    def put(self, key, detections, compute_seconds=0.0):
+        if detections.track_id is not None:
+            # Las pistas dependen del frame anterior, no sólo de la imagen
+            return
+        now = time.time()
+        entry = (now + self.ttl, _entry_bytes(detections), detections, compute_seconds)
+        with self._lock:
+            self._store(key, entry)
+            if self._conn is not None:
+                blob = pack_detections(detections)
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO results (key, data, size, compute, expires, used) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", (key, blob, len(blob), compute_seconds, entry[0], now))
+                self._disk_puts += 1
+                # La cuota de disco se revisa cada 64 escrituras, no en cada una
+                if self._disk_puts % 64 == 1:
+                    self._enforce_disk(now)
+
+    def _store(self, key, entry):
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = entry
+        self.bytes += entry[1]
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= entry[1]
+
+    def _disk_get(self, key, now):
+        if self._conn is None:
+            return None
+        row = self._conn.execute("SELECT data, compute, expires FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        data, compute, expires = row
+        if expires < now:
+            with self._conn:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            return None
+        with self._conn:
+            self._conn.execute("UPDATE results SET used = ? WHERE key = ?", (now, key))
+        detections = unpack_detections(data)
+        return expires, _entry_bytes(detections), detections, compute
+
+    def _enforce_disk(self, now):
+        """Drop expired rows, then the least recently used until the tier fits max_disk_bytes."""
+        with self._conn:
+            self._conn.execute("DELETE FROM results WHERE expires < ?", (now,))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total <= self.max_disk_bytes:
+                return
+            freed = 0
+            doomed = []
+            for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY used"):
+                if total - freed <= self.max_disk_bytes:
+                    break
+                doomed.append((key,))
+                freed += size
+            self._conn.executemany("DELETE FROM results WHERE key = ?", doomed)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM results")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            out = {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'saved_seconds': self.saved_seconds,
+            }
+            if self._conn is not None:
+                out['disk_entries'], out['disk_bytes'] = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return out
@@ -0,0 +1,224 @@
+"""
+Event rules and a compiled rule engine.
+
+Rules are compiled into arrays indexed by rule (class id, thresholds, state) and evaluated once
+per frame against a whole Detections batch. Duration and debounce use a monotonic clock; a single
+low-confidence box no longer resets a rule, only the class being absent for longer than the
+rule's debounce time does.
+
+With a tracker (yolo_core.tracker) rules can also fire on track events instead of box presence:
+'enter' and 'exit' fire once per track, 'dwell' once a track has been present for min_duration
+(and again every repeat_interval). One person standing still is then one event, not one per frame.
+"""
+import json
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+RULE_FIELDS = ('trigger_class', 'event', 'min_confidence', 'min_duration', 'debounce', 'repeat_interval',
+               'cooldown', 'action_type', 'command', 'email_to', 'email_subject', 'email_body')
+# 'presence' evalúa las cajas de cada frame; el resto necesita pistas del tracker
+RULE_EVENTS = ('presence', 'enter', 'exit', 'dwell')
+
+
+class EventRule:
+    def __init__(self, trigger_class, config):
+        self.trigger_class = trigger_class
+        self.event = config.get('event', 'presence')
+        self.min_confidence = config.get('min_confidence', 0.5)
+        self.min_duration = config.get('min_duration', 0)
+        self.debounce = config.get('debounce', 1.0)
+        self.repeat_interval = config.get('repeat_interval', 0)
+        self.cooldown = config.get('cooldown', 10)
+        self.action_type = config.get('action_type', 'notify')
+        self.command = config.get('command', None)
+        self.email_to = config.get('email_to', None)
+        self.email_subject = config.get('email_subject', None)
+        self.email_body = config.get('email_body', None)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in RULE_FIELDS}
+
+
+def load_rules(path='event_rules.json'):
+    """Load rules from a JSON file; a missing or empty file means no rules."""
+    try:
+        with open(path, 'r') as f:
+            content = f.read()
+    except FileNotFoundError:
+        return []
+    if not content.strip():
+        return []
+    return [EventRule(rule['trigger_class'], rule) for rule in json.loads(content)]
+
+
+def save_rules(rules, path='event_rules.json'):
+    with open(path, 'w') as f:
+        json.dump([rule.to_dict() for rule in rules], f)
+
+
+class RuleEngine:
+    """
+    Evaluates all rules against one frame's detections at a time.
+
+    ``set_rules`` can be called from another thread (e.g. the GUI) while ``evaluate`` runs
+    on the worker; state is carried over for rules that are kept.
+    """
+
+    def __init__(self, names, rules=()):
+        self.class_lookup = {name: i for i, name in names.items()}
+        self.num_classes = max(names) + 1 if names else 0
+        self._lock = threading.Lock()
+        self.rules = []
+        self.evaluations = 0
+        self.eval_time = 0.0
+        # Inicio de cada pista activa y último disparo de permanencia por (regla, pista)
+        self._track_first_seen = {}
+        self._dwell_fired = {}
+        self.set_rules(rules)
+
+    def set_rules(self, rules):
+        rules = list(rules)
+        with self._lock:
+            old = {id(rule): i for i, rule in enumerate(self.rules)}
+            n = len(rules)
+            cls_id = np.array([self.class_lookup.get(r.trigger_class, -1) for r in rules], dtype=np.int64)
+            # Las reglas de pista no participan en la evaluación por presencia
+            presence = np.array([r.event == 'presence' for r in rules], dtype=bool)
+            cls_id = np.where(presence, cls_id, -1)
+            self._track_rules = [(rule, self.class_lookup.get(rule.trigger_class, -1))
+                                 for rule in rules if rule.event != 'presence']
+            min_conf = np.array([r.min_confidence for r in rules], dtype=np.float32)
+            min_duration = np.array([r.min_duration for r in rules], dtype=np.float64)
+            debounce = np.array([r.debounce for r in rules], dtype=np.float64)
+            repeat = np.array([r.repeat_interval for r in rules], dtype=np.float64)
+            active_since = np.full(n, np.nan)
+            last_seen = np.full(n, -np.inf)
+            last_fired = np.full(n, np.nan)
+            for i, rule in enumerate(rules):
+                j = old.get(id(rule))
+                if j is not None:
+                    active_since[i] = self._active_since[j]
+                    last_seen[i] = self._last_seen[j]
+                    last_fired[i] = self._last_fired[j]
+            self.rules = rules
+            self._cls_id = cls_id
+            self._min_conf = min_conf
+            self._min_duration = min_duration
+            self._debounce = debounce
+            self._repeat = repeat
+            self._active_since = active_since
+            self._last_seen = last_seen
+            self._last_fired = last_fired
+            # Índice por clase: sólo interesan las detecciones de clases con reglas
+            self._rule_classes = np.unique(cls_id[cls_id >= 0])
+
+    def evaluate(self, detections, now=None, track_events=None):
+        """
+        Update rule state with one frame and return the list of fired events.
+
+        With a tracker, detections are its tracks (track_id set) and track_events the
+        enter/exit events it returned for this frame; both must share the same clock as now.
+        """
+        t0 = time.perf_counter()
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for event in track_events or ():
+                if event['type'] == 'enter':
+                    self._track_first_seen[event['track_id']] = event['first_seen']
+                elif event['type'] == 'exit':
+                    self._track_first_seen.pop(event['track_id'], None)
+            if not self.rules:
+                return []
+            track_fired = self._evaluate_tracks(detections, track_events or (), now)
+            keep = np.isin(detections.cls_id, self._rule_classes)
+            cls_id = detections.cls_id[keep]
+            conf = detections.conf[keep]
+
+            # Confianza máxima por clase en este frame
+            best = np.full(max(self.num_classes, int(cls_id.max()) + 1 if len(cls_id) else 0, 1), -1.0)
+            np.maximum.at(best, cls_id, conf)
+            valid = self._cls_id >= 0
+            rule_best = np.where(valid, best[np.where(valid, self._cls_id, 0)], -1.0)
+            present = rule_best >= self._min_conf
+
+            self._last_seen[present] = now
+            starting = present & np.isnan(self._active_since)
+            self._active_since[starting] = now
+            lapsed = ~present & (now - self._last_seen > self._debounce)
+            self._active_since[lapsed] = np.nan
+            self._last_fired[lapsed] = np.nan
+
+            active = ~np.isnan(self._active_since)
+            held = active & (now - np.nan_to_num(self._active_since, nan=now) >= self._min_duration)
+            first = held & np.isnan(self._last_fired)
+            again = (held & (self._repeat > 0)
+                     & (now - np.nan_to_num(self._last_fired, nan=now) >= self._repeat))
+            fired = np.flatnonzero(first | again)
+            self._last_fired[fired] = now
+
+            events = []
+            if len(fired):
+                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                for i in fired:
+                    rule = self.rules[i]
+                    matches = (cls_id == self._cls_id[i]) & (conf >= self._min_conf[i])
+                    events.append({
+                        'rule': rule,
+                        'class': rule.trigger_class,
+                        'event': 'presence',
+                        'confidence': float(rule_best[i]) if present[i] else 0.0,
+                        'count': int(matches.sum()),
+                        'duration': float(now - self._active_since[i]),
+                        'timestamp': timestamp,
+                    })
+            events += track_fired
+        self.evaluations += 1
+        self.eval_time += time.perf_counter() - t0
+        return events
+
+    def _evaluate_tracks(self, detections, track_events, now):
+        """Fired events for the enter/exit/dwell rules."""
+        if not self._track_rules:
+            return []
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        events = []
+        for rule, cls_id in self._track_rules:
+            if rule.event in ('enter', 'exit'):
+                for event in track_events:
+                    if (event['type'] == rule.event and event['class_id'] == cls_id
+                            and event['confidence'] >= rule.min_confidence):
+                        events.append(self._track_event(rule, event['track_id'], event['confidence'],
+                                                        event['duration'], timestamp))
+            elif detections.track_id is not None and len(detections):
+                matches = (detections.cls_id == cls_id) & (detections.conf >= rule.min_confidence)
+                for track_id, conf in zip(detections.track_id[matches].tolist(),
+                                          detections.conf[matches].tolist()):
+                    first = self._track_first_seen.get(track_id)
+                    if first is None or now - first < rule.min_duration:
+                        continue
+                    key = (id(rule), track_id)
+                    last = self._dwell_fired.get(key)
+                    if last is None or (rule.repeat_interval > 0 and now - last >= rule.repeat_interval):
+                        self._dwell_fired[key] = now
+                        events.append(self._track_event(rule, track_id, conf, now - first, timestamp))
+        # Se olvidan los disparos de pistas que ya salieron
+        gone = {e['track_id'] for e in track_events if e['type'] == 'exit'}
+        if gone:
+            self._dwell_fired = {k: v for k, v in self._dwell_fired.items() if k[1] not in gone}
+        return events
+
+    @staticmethod
+    def _track_event(rule, track_id, confidence, duration, timestamp):
+        return {
+            'rule': rule,
+            'class': rule.trigger_class,
+            'event': rule.event,
+            'track_id': track_id,
+            'confidence': float(confidence),
+            'count': 1,
+            'duration': float(duration),
+            'timestamp': timestamp,
+        }
@@ -0,0 +1,135 @@
+"""
+Adaptive frame scheduler for capture/inference loops.
+
+Paces the loop to a target FPS using deadlines instead of a fixed sleep, runs inference only on
+every Nth frame when the model cannot keep up (the caller carries the last boxes forward), and
+steps the inference image size down under sustained load and back up when there is headroom.
+"""
+import math
+import time
+from collections import deque
+
+
+class RateMeter:
+    """Events per second over a sliding time window."""
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self._times = deque()
+
+    def tick(self, now):
+        self._times.append(now)
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+
+    def rate(self, now=None):
+        # Copia para poder leer desde otro hilo mientras el productor hace tick()
+        now = time.monotonic() if now is None else now
+        times = [t for t in list(self._times) if now - t <= self.window]
+        if len(times) < 2:
+            return 0.0
+        return (len(times) - 1) / max(times[-1] - times[0], 1e-9)
+
+
+class FrameScheduler:
+    """
+    Decides per frame whether to run inference and at which image size, and paces the loop.
+    """
+
+    def __init__(self, target_fps=30, imgsz_levels=(640, 512, 416, 320), max_skip=5,
+                 smoothing=0.2, adjust_after=15):
+        self.target_fps = target_fps
+        self.imgsz_levels = tuple(imgsz_levels)
+        self.level = 0
+        self.max_skip = max_skip
+        self.smoothing = smoothing
+        self.adjust_after = adjust_after
+        self.infer_time = None
+        self.stride = 1
+        self.skipped = 0
+        self.frames = 0
+        self._since_infer = 0
+        self._load_streak = 0
+        self._idle_streak = 0
+        self._deadline = None
+        self.capture_rate = RateMeter()
+        self.infer_rate = RateMeter()
+
+    @property
+    def period(self):
+        return 1.0 / self.target_fps if self.target_fps > 0 else 0.0
+
+    @property
+    def imgsz(self):
+        return self.imgsz_levels[self.level]
+
+    def frame_captured(self):
+        self.frames += 1
+        self.capture_rate.tick(time.monotonic())
+
+    def should_infer(self):
+        """True if this frame should go through the model; otherwise it counts as skipped."""
+        self._since_infer += 1
+        if self._since_infer >= self.stride:
+            self._since_infer = 0
+            return True
+        self.skipped += 1
+        return False
+
+    def inference_done(self, elapsed):
+        """Report how long inference took so stride and image size can adapt."""
+        self.infer_rate.tick(time.monotonic())
+        if self.infer_time is None:
+            self.infer_time = elapsed
+        else:
+            self.infer_time += self.smoothing * (elapsed - self.infer_time)
+        period = self.period
+        if period <= 0:
+            self.stride = 1
+            return
+        # Inferir cada N frames cuando el modelo tarda más que un periodo
+        self.stride = min(self.max_skip + 1, max(1, math.ceil(self.infer_time / period)))
+
+        # Bajar la resolución si sigue sin alcanzar; subirla si sobra margen
+        if self.infer_time > period:
+            self._load_streak += 1
+            self._idle_streak = 0
+        elif self.infer_time < 0.5 * period:
+            self._idle_streak += 1
+            self._load_streak = 0
+        else:
+            self._load_streak = self._idle_streak = 0
+        if self._load_streak >= self.adjust_after and self.level < len(self.imgsz_levels) - 1:
+            self.level += 1
+            self._load_streak = 0
+            self.infer_time = None
+        elif self._idle_streak >= self.adjust_after and self.level > 0:
+            self.level -= 1
+            self._idle_streak = 0
+            self.infer_time = None
+
+    def sleep(self):
+        """Sleep until the next frame deadline (no sleep at all when behind)."""
+        period = self.period
+        if period <= 0:
+            return
+        now = time.monotonic()
+        if self._deadline is None or now - self._deadline > period:
+            # Muy atrasados: no intentar recuperar frames perdidos
+            self._deadline = now
+        self._deadline += period
+        delay = self._deadline - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'capture_fps': self.capture_rate.rate(now),
+            'inference_fps': self.infer_rate.rate(now),
+            'inference_ms': (self.infer_time or 0.0) * 1000,
+            'stride': self.stride,
+            'imgsz': self.imgsz,
+            'frames': self.frames,
+            'skipped': self.skipped,
+        }
@@ -0,0 +1,208 @@
+"""
+Sliced (tiled) inference for frames much larger than the model input.
+
+A 4K frame passed whole to the model is shrunk to 640 px and small objects disappear. The tiler
+cuts the frame into overlapping tiles at the model's input size and runs all of them, plus an
+optional downscaled full frame for objects larger than a tile, as one batch. Boxes are shifted
+back to frame coordinates and duplicates across tile seams are merged with a class-aware
+greedy NMS whose memory stays linear in the number of boxes.
+
+For video, tiles whose content did not change since the previous frame can reuse their last
+detections instead of being inferred again (skip_unchanged).
+"""
+import cv2
+import numpy as np
+
+from yolo_core.detections import Detections
+from yolo_core.metrics import metrics
+
+FULL_FRAME = -1
+
+
+def tile_grid(height, width, tile=640, overlap=0.2):
+    """(N, 4) int32 array of x0, y0, x1, y1 tiles covering the frame with at least overlap."""
+    def starts(size):
+        if size <= tile:
+            return [0]
+        stride = max(int(tile * (1 - overlap)), 1)
+        n = int(np.ceil((size - tile) / stride)) + 1
+        # Reparto uniforme: el último tile termina justo en el borde, sin tiles estrechos
+        return np.linspace(0, size - tile, n).round().astype(int).tolist()
+
+    th, tw = min(tile, height), min(tile, width)
+    return np.array([(x, y, x + tw, y + th) for y in starts(height) for x in starts(width)],
+                    dtype=np.int32).reshape(-1, 4)
+
+
+def nms(xyxy, conf, cls_id, threshold=0.5, metric='iou', min_conf=0.0, max_candidates=None):
+    """
+    Class-aware greedy NMS. Returns the kept indices by descending confidence.
+
+    metric='ios' (intersection over the smaller box) also removes the partial boxes that a tile
+    seam cuts out of an object that a neighbouring tile sees whole. It only applies to boxes
+    smaller than the one being kept, so a large box is never removed for containing a small one.
+
+    Boxes below min_conf are dropped and only the max_candidates most confident are considered.
+    Each kept box is compared with the remaining candidates only (one row of overlaps at a time),
+    so memory stays linear in the number of boxes.
+    """
+    order = np.argsort(-conf, kind='stable')
+    if min_conf > 0:
+        order = order[conf[order] >= min_conf]
+    if max_candidates is not None:
+        order = order[:max_candidates]
+    if len(order) == 0:
+        return np.zeros(0, dtype=np.int64)
+    boxes = xyxy[order].astype(np.float32)
+    # Desplazamiento por clase: cajas de clases distintas nunca se solapan
+    boxes = boxes + cls_id[order].astype(np.float32)[:, None] * (float(boxes.max()) + 1.0)
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+
+    keep = []
+    rest = np.arange(len(order))
+    while len(rest):
+        i, rest = rest[0], rest[1:]
+        keep.append(i)
+        if not len(rest):
+            break
+        w = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        h = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = w * h
+        overlap = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        if metric == 'ios':
+            smaller = areas[rest] <= areas[i]
+            overlap[smaller] = inter[smaller] / np.maximum(areas[rest][smaller], 1e-9)
+        rest = rest[overlap <= threshold]
+    return order[np.asarray(keep)]
+
+
+class TilePlan:
+    """Crops to run for one frame; slots holds the tile index of each crop (FULL_FRAME = -1)."""
+
+    __slots__ = ('shape', 'crops', 'offsets', 'slots', 'grid')
+
+    def __init__(self, shape, crops, offsets, slots, grid):
+        self.shape = shape
+        self.crops = crops
+        self.offsets = offsets
+        self.slots = slots
+        self.grid = grid
+
+
+class TiledDetector:
+    """
+    Runs a model over overlapping tiles of a frame and merges the detections.
+
+    Without skip_unchanged the detector keeps no per-frame state and can be shared between
+    requests. With it, use one detector per video stream.
+    """
+
+    def __init__(self, model=None, tile=640, overlap=0.2, nms_threshold=0.6, metric='ios',
+                 full_frame=True, skip_unchanged=False, change_threshold=12, max_skip=30,
+                 min_conf=0.0, max_candidates=3000):
+        self.model = model
+        self.tile = tile
+        self.overlap = overlap
+        self.nms_threshold = nms_threshold
+        self.metric = metric
+        self.full_frame = full_frame
+        self.skip_unchanged = skip_unchanged
+        self.change_threshold = change_threshold
+        self.max_skip = max_skip
+        self.min_conf = min_conf
+        self.max_candidates = max_candidates
+        self._grid_key = None
+        self._grid = None
+        self._prev_small = None
+        self._cache = None
+        self._age = None
+        self._tiles_run = metrics.counter('tiles_total', 'Tiles seen by tiled inference', result='inferred')
+        self._tiles_skipped = metrics.counter('tiles_total', 'Tiles seen by tiled inference', result='skipped')
+
+    def grid(self, shape):
+        key = (shape[0], shape[1], self.tile, self.overlap)
+        if key != self._grid_key:
+            self._grid_key = key
+            self._grid = tile_grid(shape[0], shape[1], self.tile, self.overlap)
+            self._prev_small = None
+            self._cache = None
+        return self._grid
+
+    def _changed_tiles(self, frame, grid):
+        """
+        Boolean mask of tiles where any pixel of a 1/8 thumbnail changed by more than
+        change_threshold, or that were skipped max_skip frames in a row.
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.resize(gray, (max(gray.shape[1] // 8, 1), max(gray.shape[0] // 8, 1)),
+                           interpolation=cv2.INTER_AREA)
+        prev, self._prev_small = self._prev_small, small
+        if prev is None or self._cache is None:
+            return np.ones(len(grid), dtype=bool)
+        # Imagen integral de los píxeles cambiados: el recuento de cada tile son cuatro lecturas
+        changed = (cv2.absdiff(small, prev) > self.change_threshold).astype(np.uint8)
+        integral = cv2.integral(changed)
+        g = (grid // 8).clip(0)
+        x0, y0 = g[:, 0], g[:, 1]
+        x1 = np.maximum(g[:, 2], x0 + 1).clip(max=small.shape[1])
+        y1 = np.maximum(g[:, 3], y0 + 1).clip(max=small.shape[0])
+        counts = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+        return (counts > 0) | (self._age >= self.max_skip)
+
+    def plan(self, frame):
+        """Crops (views into frame, no copies) that need inference for this frame."""
+        grid = self.grid(frame.shape)
+        if len(grid) == 1:
+            # El frame cabe en un tile: inferencia normal
+            return TilePlan(frame.shape, [frame], np.zeros((1, 2), dtype=np.int32), [FULL_FRAME], grid)
+        run = self._changed_tiles(frame, grid) if self.skip_unchanged else np.ones(len(grid), dtype=bool)
+        slots = np.flatnonzero(run).tolist()
+        crops = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in grid[slots].tolist()]
+        offsets = grid[slots, :2]
+        if self.full_frame and slots:
+            crops.append(frame)
+            offsets = np.vstack([offsets, np.zeros((1, 2), dtype=np.int32)])
+            slots.append(FULL_FRAME)
+        self._tiles_run.inc(len(crops))
+        self._tiles_skipped.inc(len(grid) - int(run.sum()))
+        return TilePlan(frame.shape, crops, offsets, slots, grid)
+
+    def merge(self, plan, detections):
+        """Shift per-crop detections to frame coordinates, reuse cached tiles and run NMS."""
+        shifted = []
+        for d, (dx, dy) in zip(detections, plan.offsets.tolist()):
+            if dx or dy:
+                d = Detections(d.xyxy + np.array([dx, dy, dx, dy], dtype=np.float32),
+                               d.conf, d.cls_id, d.frame_ts, d.names)
+            shifted.append(d)
+        if self.skip_unchanged and len(plan.grid) > 1:
+            if self._cache is None:
+                self._cache = [Detections.empty() for _ in range(len(plan.grid) + 1)]
+                self._age = np.zeros(len(plan.grid), dtype=np.int32)
+            self._age += 1
+            for slot, d in zip(plan.slots, shifted):
+                self._cache[slot] = d
+                if slot != FULL_FRAME:
+                    self._age[slot] = 0
+            shifted = self._cache
+        merged = Detections.concat(shifted)
+        if len(plan.grid) > 1 and len(merged):
+            merged = merged[nms(merged.xyxy, merged.conf, merged.cls_id, self.nms_threshold, self.metric,
+                                self.min_conf, self.max_candidates)]
+        if not merged.names:
+            merged.names = next((d.names for d in shifted if d.names), {})
+        return merged
+
+    def __call__(self, frame, **kwargs):
+        """Tiled detection on one frame with self.model; kwargs go to the model call."""
+        plan = self.plan(frame)
+        if not plan.crops:
+            return self.merge(plan, [])
+        kwargs.setdefault('verbose', False)
+        if len(plan.grid) > 1:
+            kwargs.setdefault('imgsz', self.tile)
+        with metrics.time('model'):
+            results = self.model(plan.crops, **kwargs)
+        metrics.observe_speed(results)
+        return self.merge(plan, [Detections.from_result(r) for r in results])
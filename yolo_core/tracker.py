@@ -0,0 +1,256 @@
+"""
+Multi-object tracking: stable track IDs and enter/exit events on top of per-frame detections.
+
+Each track holds a constant-velocity Kalman filter over the box center and size
+(cx, cy, w, h and their velocities, per second). All tracks are predicted and updated together
+as stacked NumPy arrays. Detections are associated with the predicted boxes by class-aware IoU,
+greedily from the highest overlap down.
+
+A track is confirmed after min_hits matches, which emits an 'enter' event. It is dropped after
+max_age seconds without a match, which emits an 'exit' event. Between detections (frames where
+detection did not run) the filter keeps predicting, so the boxes follow the objects. Dwell time
+is the time since a track's first detection, and rules evaluate it (see yolo_core.rules).
+"""
+import time
+
+import numpy as np
+
+from yolo_core.detections import Detections
+from yolo_core.metrics import metrics
+
+TRACK_EVENTS = ('enter', 'exit')
+
+_H = np.hstack([np.eye(4), np.zeros((4, 4))])
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes."""
+    w = (np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])).clip(0)
+    h = (np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])).clip(0)
+    inter = w * h
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def greedy_match(scores, threshold):
+    """(rows, cols) of pairs with score >= threshold, best first, each row and column used once."""
+    rows, cols = np.nonzero(scores >= threshold)
+    order = np.argsort(-scores[rows, cols], kind='stable')
+    used_r = np.zeros(scores.shape[0], dtype=bool)
+    used_c = np.zeros(scores.shape[1], dtype=bool)
+    keep_r, keep_c = [], []
+    for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+        if used_r[r] or used_c[c]:
+            continue
+        used_r[r] = used_c[c] = True
+        keep_r.append(r)
+        keep_c.append(c)
+    return np.array(keep_r, dtype=np.int64), np.array(keep_c, dtype=np.int64)
+
+
+def _xyxy_to_z(xyxy):
+    w = xyxy[:, 2] - xyxy[:, 0]
+    h = xyxy[:, 3] - xyxy[:, 1]
+    return np.stack([xyxy[:, 0] + w / 2, xyxy[:, 1] + h / 2, w, h], axis=1).astype(np.float64)
+
+
+def _state_to_xyxy(x):
+    cx, cy = x[:, 0], x[:, 1]
+    w, h = x[:, 2].clip(1), x[:, 3].clip(1)
+    return np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1).astype(np.float32)
+
+
+class Tracker:
+    """
+    IoU + Kalman tracker. Not thread-safe: use one tracker per video stream.
+
+    update(detections) after each detection; update(None) on frames where detection was
+    skipped. Both return (tracks, events): tracks are the confirmed tracks as Detections with
+    track_id set, events a list of dicts for tracks that entered or left.
+    """
+
+    def __init__(self, iou_threshold=0.3, min_hits=2, max_age=1.0, pos_std=0.05, vel_std=0.5,
+                 meas_std=0.05, names=None, camera='0'):
+        self.iou_threshold = iou_threshold
+        self.min_hits = min_hits
+        self.max_age = max_age
+        self.pos_std = pos_std
+        self.vel_std = vel_std
+        self.meas_std = meas_std
+        self.names = names or {}
+        self.next_id = 1
+        self.last_time = None
+        self.entered = 0
+        self.exited = 0
+        self.boxes_seen = 0
+        self._x = np.zeros((0, 8))
+        self._p = np.zeros((0, 8, 8))
+        self._id = np.zeros(0, dtype=np.int64)
+        self._cls = np.zeros(0, dtype=np.int32)
+        self._conf = np.zeros(0, dtype=np.float32)
+        self._hits = np.zeros(0, dtype=np.int32)
+        self._first = np.zeros(0)
+        self._last = np.zeros(0)
+        self._confirmed = np.zeros(0, dtype=bool)
+        labels = {'camera': str(camera)}
+        self._counters = {kind: metrics.counter('track_events_total', 'Track enter/exit events',
+                                                type=kind, **labels)
+                          for kind in TRACK_EVENTS}
+
+    def __len__(self):
+        return int(self._confirmed.sum())
+
+    def _noise(self, scale, pos, vel):
+        """Diagonal (N, 8, 8) covariance with std proportional to each box's height."""
+        h = self._x[:, 3].clip(1) if scale is None else scale
+        std = np.concatenate([np.repeat((pos * h)[:, None], 4, axis=1),
+                              np.repeat((vel * h)[:, None], 4, axis=1)], axis=1)
+        out = np.zeros((len(h), 8, 8))
+        idx = np.arange(8)
+        out[:, idx, idx] = std ** 2
+        return out
+
+    def _predict(self, now):
+        dt = 0.0 if self.last_time is None else max(now - self.last_time, 0.0)
+        self.last_time = now
+        if not len(self._x) or dt == 0:
+            return
+        f = np.eye(8)
+        f[:4, 4:] = np.eye(4) * dt
+        self._x = self._x @ f.T
+        self._p = f @ self._p @ f.T + self._noise(None, self.pos_std, self.vel_std) * dt
+        # El tamaño no puede hacerse negativo por la velocidad
+        self._x[:, 2:4] = self._x[:, 2:4].clip(1)
+
+    def _correct(self, rows, z):
+        """Kalman update of tracks rows with measurements z (K, 4)."""
+        x, p = self._x[rows], self._p[rows]
+        r = self._noise(z[:, 3].clip(1), self.meas_std, 0)[:, :4, :4]
+        s = p[:, :4, :4] + r
+        k = p[:, :, :4] @ np.linalg.inv(s)
+        y = z - x[:, :4]
+        self._x[rows] = x + (k @ y[:, :, None])[:, :, 0]
+        self._p[rows] = p - k @ p[:, :4, :]
+
+    def _spawn(self, detections, now):
+        n = len(detections)
+        z = _xyxy_to_z(detections.xyxy)
+        x = np.hstack([z, np.zeros((n, 4))])
+        h = z[:, 3].clip(1)
+        p = self._noise(h, 2 * self.meas_std, 2 * self.vel_std)
+        self._x = np.vstack([self._x, x])
+        self._p = np.concatenate([self._p, p])
+        self._id = np.concatenate([self._id, np.arange(self.next_id, self.next_id + n, dtype=np.int64)])
+        self.next_id += n
+        self._cls = np.concatenate([self._cls, detections.cls_id.astype(np.int32)])
+        self._conf = np.concatenate([self._conf, detections.conf.astype(np.float32)])
+        self._hits = np.concatenate([self._hits, np.ones(n, dtype=np.int32)])
+        self._first = np.concatenate([self._first, np.full(n, now)])
+        self._last = np.concatenate([self._last, np.full(n, now)])
+        self._confirmed = np.concatenate([self._confirmed, np.full(n, self.min_hits <= 1)])
+
+    def _keep(self, mask):
+        for name in ('_x', '_p', '_id', '_cls', '_conf', '_hits', '_first', '_last', '_confirmed'):
+            setattr(self, name, getattr(self, name)[mask])
+
+    def _event(self, kind, i, now):
+        self._counters[kind].inc()
+        cls_id = int(self._cls[i])
+        return {
+            'type': kind,
+            'track_id': int(self._id[i]),
+            'class_id': cls_id,
+            'class': self.names.get(cls_id, str(cls_id)),
+            'confidence': float(self._conf[i]),
+            'first_seen': float(self._first[i]),
+            'duration': float(self._last[i] - self._first[i]),
+            'box': _state_to_xyxy(self._x[i:i + 1])[0].tolist(),
+        }
+
+    def update(self, detections=None, now=None):
+        """Advance all tracks to now and, if given, associate this frame's detections."""
+        now = time.monotonic() if now is None else now
+        if detections is not None and detections.names and not self.names:
+            self.names = detections.names
+        self._predict(now)
+        events = []
+
+        if detections is not None:
+            self.boxes_seen += len(detections)
+            rows = cols = np.zeros(0, dtype=np.int64)
+            if len(self._x) and len(detections):
+                ious = iou_matrix(_state_to_xyxy(self._x), detections.xyxy)
+                ious[self._cls[:, None] != detections.cls_id[None, :]] = 0
+                rows, cols = greedy_match(ious, self.iou_threshold)
+            if len(rows):
+                self._correct(rows, _xyxy_to_z(detections.xyxy[cols]))
+                self._conf[rows] = detections.conf[cols]
+                self._hits[rows] += 1
+                self._last[rows] = now
+                newly = rows[~self._confirmed[rows] & (self._hits[rows] >= self.min_hits)]
+                self._confirmed[newly] = True
+                events += [self._event('enter', i, now) for i in newly.tolist()]
+            # Una pista sin confirmar que no se vuelve a ver era ruido: se descarta sin evento
+            unmatched = np.ones(len(self._x), dtype=bool)
+            unmatched[rows] = False
+            self._keep(self._confirmed | ~unmatched)
+            fresh = np.ones(len(detections), dtype=bool)
+            fresh[cols] = False
+            if fresh.any():
+                start = len(self._x)
+                self._spawn(detections[fresh], now)
+                if self.min_hits <= 1:
+                    events += [self._event('enter', i, now) for i in range(start, len(self._x))]
+
+        expired = now - self._last > self.max_age
+        if expired.any():
+            events += [self._event('exit', i, now) for i in np.flatnonzero(expired & self._confirmed).tolist()]
+            self._keep(~expired)
+        self.entered += sum(e['type'] == 'enter' for e in events)
+        self.exited += sum(e['type'] == 'exit' for e in events)
+        return self.tracks(), events
+
+    def tracks(self):
+        """Confirmed tracks at their current (predicted or corrected) position."""
+        keep = self._confirmed
+        n = int(keep.sum())
+        return Detections(_state_to_xyxy(self._x[keep]), self._conf[keep].copy(), self._cls[keep].copy(),
+                          np.full(n, time.time(), dtype=np.float64), self.names, self._id[keep].copy())
+
+    def dwell(self, now=None):
+        """{track_id: seconds since first detection} for the confirmed tracks."""
+        now = time.monotonic() if now is None else now
+        keep = self._confirmed
+        return dict(zip(self._id[keep].tolist(), (now - self._first[keep]).tolist()))
+
+    def stats(self):
+        return {
+            'active': len(self),
+            'tentative': int((~self._confirmed).sum()),
+            'entered': self.entered,
+            'exited': self.exited,
+            'boxes': self.boxes_seen,
+        }
+
+
+class TrackedDetector:
+    """
+    Runs detect(image) -> Detections on every detect_every-th frame and the tracker on all of
+    them, so the boxes move with the objects between detections. Returns (tracks, events).
+    """
+
+    def __init__(self, detect, tracker=None, detect_every=1):
+        self.detect = detect
+        self.tracker = tracker or Tracker()
+        self.detect_every = max(int(detect_every), 1)
+        self.frames = 0
+        self.detections = 0
+
+    def __call__(self, frame, now=None):
+        run = self.frames % self.detect_every == 0
+        self.frames += 1
+        if not run:
+            return self.tracker.update(None, now)
+        self.detections += 1
+        return self.tracker.update(self.detect(frame), now)
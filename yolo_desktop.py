@@ -4,64 +4,122 @@ YOLO Event Detector - PyQt6 Desktop App
 This application allows you to select a camera, define custom event rules (notifications, commands, emails), and monitor real-time object detection using YOLOv8.
 """
 import sys
+import time
 import cv2
-import numpy as np
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QLabel, QComboBox, QPushButton,
                             QSpinBox, QCheckBox, QListWidget, QMessageBox,
                             QDialog, QFormLayout, QLineEdit, QTextEdit,
                             QDoubleSpinBox, QGroupBox, QRadioButton)
-from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QThread
-from PyQt6.QtGui import QImage, QPixmap
-from ultralytics import YOLO
-import json
+from PyQt6.QtCore import QTimer, pyqtSignal, QThread
+from PyQt6.QtGui import QImage, QPainter
+from yolo_core.model_registry import get_model, get_class_names
+from yolo_core.detections import Detections
+from yolo_core.rules import EventRule, RuleEngine, load_rules, save_rules
+from yolo_core.actions import ActionDispatcher, SMTPSender
+from yolo_core.frame_buffer import LatestFrameBuffer
+from yolo_core.renderer import AnnotationRenderer
+from yolo_core.scheduler import FrameScheduler
+from yolo_core.motion import GatedDetector, MotionGate, load_motion_config
+from yolo_core.tracker import TrackedDetector, Tracker
+from yolo_core.metrics import metrics, profiler, install_profiler_signal, start_logger_from_env
 import os
-from datetime import datetime
-import subprocess
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+
+# Nombres en la interfaz de los tipos de evento de las reglas
+EVENT_LABELS = {'presence': 'presencia', 'enter': 'entrada', 'exit': 'salida', 'dwell': 'permanencia'}
 
 class VideoThread(QThread):
-    change_pixmap_signal = pyqtSignal(np.ndarray)
-    detection_signal = pyqtSignal(dict)
+    frame_ready = pyqtSignal()
+    events_signal = pyqtSignal(list)
 
-    def __init__(self, camera_index=0):
+    def __init__(self, rule_engine, frame_buffer, camera_index=0, model_path="yolov8n.pt", target_fps=30,
+                 motion=False, track=False, detect_every=1):
         super().__init__()
+        self.frame_buffer = frame_buffer
         self.camera_index = camera_index
         self.running = True
-        self.model = YOLO("yolov8n.pt")
+        self.model_path = model_path
+        self.model = None
         self.confidence = 0.5
-        self.selected_classes = set()
+        self.rule_engine = rule_engine
+        self.scheduler = FrameScheduler(target_fps)
+        self.motion = motion
+        self.gated = None
+        self.track = track
+        self.detect_every = detect_every
+        self.tracked = None
 
     def run(self):
+        # Cargar el modelo en el hilo de trabajo para no bloquear la interfaz
+        self.model = get_model(self.model_path)
         cap = cv2.VideoCapture(self.camera_index)
+        scheduler = self.scheduler
+        renderer = AnnotationRenderer(self.model.names)
+        last_detections = None
+        frames_done = metrics.counter('frames_total', 'Frames fully processed')
+        frames_skipped = metrics.counter('frames_skipped_total', 'Frames shown without inference')
+
+        def detect(image):
+            t0 = time.perf_counter()
+            results = self.model(image, conf=self.confidence, imgsz=scheduler.imgsz, verbose=False)
+            elapsed = time.perf_counter() - t0
+            scheduler.inference_done(elapsed)
+            metrics.observe('model', elapsed)
+            metrics.observe_speed(results)
+            return Detections.from_results(results)
+
+        # Compuerta de movimiento: con la escena quieta se reutilizan las últimas detecciones
+        if self.motion:
+            gate = MotionGate(**load_motion_config(self.camera_index))
+            self.gated = GatedDetector(detect, gate, camera=self.camera_index)
+        detector = (lambda image: self.gated(image)[0]) if self.gated is not None else detect
+        # Seguimiento: IDs estables y eventos de entrada/salida; detectar cada N frames
+        if self.track:
+            tracker = Tracker(names=self.model.names, camera=self.camera_index)
+            self.tracked = TrackedDetector(detector, tracker, self.detect_every)
+        track_events = None
         while self.running:
-            ret, frame = cap.read()
+            with metrics.time('capture'):
+                ret, frame = cap.read()
             if ret:
-                # Realizar detección
-                results = self.model(frame, conf=self.confidence)
-
-                # Procesar detecciones
-                for r in results:
-                    for box in r.boxes:
-                        cls = int(box.cls[0])
-                        conf = float(box.conf[0])
-                        class_name = self.model.names[cls]
-
-                        # Si la clase está seleccionada, emitir señal
-                        if class_name in self.selected_classes:
-                            self.detection_signal.emit({
-                                'class': class_name,
-                                'confidence': conf,
-                                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                            })
-
-                # Dibujar detecciones
-                annotated_frame = results[0].plot()
-                self.change_pixmap_signal.emit(annotated_frame)
-
-            QThread.msleep(30)  # ~30 FPS
+                scheduler.frame_captured()
+                updated = True
+                if last_detections is None or scheduler.should_infer():
+                    # Realizar detección
+                    if self.tracked is not None:
+                        last_detections, track_events = self.tracked(frame)
+                    else:
+                        last_detections = detector(frame)
+                elif self.tracked is not None:
+                    # Frame saltado: el tracker predice dónde están ahora las cajas
+                    frames_skipped.inc()
+                    last_detections, track_events = self.tracked.tracker.update(None)
+                else:
+                    # Frame saltado: se arrastran las últimas cajas sobre el frame actual
+                    frames_skipped.inc()
+                    updated = False
+
+                # Evaluar todas las reglas una vez por frame; sólo los eventos disparados van a la GUI
+                if updated:
+                    with metrics.time('rules'):
+                        events = self.rule_engine.evaluate(last_detections, track_events=track_events)
+                    if events:
+                        self.events_signal.emit(events)
+
+                # Dibujar detecciones sobre el frame capturado, sin copia
+                with metrics.time('plot'):
+                    annotated_frame = renderer.draw(frame, last_detections)
+
+                # Escalar y convertir a RGB directamente en el buffer compartido;
+                # sólo se avisa a la vista si ya recogió el frame anterior
+                with metrics.time('convert'):
+                    notify = self.frame_buffer.write(annotated_frame)
+                if notify:
+                    self.frame_ready.emit()
+                frames_done.inc()
+
+            # Ritmo adaptativo en lugar de una espera fija
+            scheduler.sleep()
 
         cap.release()
 
@@ -69,6 +127,31 @@ class VideoThread(QThread):
         self.running = False
         self.wait()
 
+class VideoView(QWidget):
+    """Paints the newest frame of a LatestFrameBuffer without copying it."""
+
+    def __init__(self, frame_buffer, parent=None):
+        super().__init__(parent)
+        self.frame_buffer = frame_buffer
+
+    def resizeEvent(self, event):
+        self.frame_buffer.set_target_size(self.width(), self.height())
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        frame = self.frame_buffer.acquire()
+        if frame is None:
+            return
+        rgb, w, h = frame
+        try:
+            with metrics.time('display'):
+                qt_image = QImage(rgb.data, w, h, rgb.strides[0], QImage.Format.Format_RGB888)
+                painter = QPainter(self)
+                painter.drawImage((self.width() - w) // 2, (self.height() - h) // 2, qt_image)
+                painter.end()
+        finally:
+            self.frame_buffer.release()
+
 class EventConfigDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -84,6 +167,12 @@ class EventConfigDialog(QDialog):
         condition_group = QGroupBox("Condiciones")
         condition_layout = QFormLayout()
 
+        self.event_type = QComboBox()
+        for label in EVENT_LABELS.values():
+            self.event_type.addItem(label)
+        self.event_type.setToolTip("Entrada, salida y permanencia usan el seguimiento de objetos")
+        condition_layout.addRow("Evento:", self.event_type)
+
         self.min_confidence = QDoubleSpinBox()
         self.min_confidence.setRange(0.0, 1.0)
         self.min_confidence.setSingleStep(0.1)
@@ -95,6 +184,22 @@ class EventConfigDialog(QDialog):
         self.min_duration.setValue(0)
         condition_layout.addRow("Duración mínima (segundos):", self.min_duration)
 
+        self.debounce = QDoubleSpinBox()
+        self.debounce.setRange(0.0, 60.0)
+        self.debounce.setSingleStep(0.5)
+        self.debounce.setValue(1.0)
+        condition_layout.addRow("Tolerancia de ausencia (segundos):", self.debounce)
+
+        self.repeat_interval = QSpinBox()
+        self.repeat_interval.setRange(0, 3600)
+        self.repeat_interval.setValue(0)
+        condition_layout.addRow("Repetir cada (segundos, 0 = una vez):", self.repeat_interval)
+
+        self.cooldown = QSpinBox()
+        self.cooldown.setRange(0, 3600)
+        self.cooldown.setValue(10)
+        condition_layout.addRow("Espera entre acciones (segundos):", self.cooldown)
+
         condition_group.setLayout(condition_layout)
         layout.addWidget(condition_group)
 
@@ -150,8 +255,12 @@ class EventConfigDialog(QDialog):
 
     def get_config(self):
         config = {
+            'event': list(EVENT_LABELS)[self.event_type.currentIndex()],
             'min_confidence': self.min_confidence.value(),
             'min_duration': self.min_duration.value(),
+            'debounce': self.debounce.value(),
+            'repeat_interval': self.repeat_interval.value(),
+            'cooldown': self.cooldown.value(),
             'action_type': 'notify' if self.notify_radio.isChecked() else
                           'command' if self.command_radio.isChecked() else
                           'email',
@@ -162,49 +271,37 @@ class EventConfigDialog(QDialog):
         }
         return config
 
-class EventRule:
-    def __init__(self, trigger_class, config):
-        self.trigger_class = trigger_class
-        self.min_confidence = config.get('min_confidence', 0.5)
-        self.min_duration = config.get('min_duration', 0)
-        self.action_type = config.get('action_type', 'notify')
-        self.command = config.get('command', None)
-        self.email_to = config.get('email_to', None)
-        self.email_subject = config.get('email_subject', None)
-        self.email_body = config.get('email_body', None)
-        self.detection_start = None
-        self.detection_count = 0
-
-    def check_condition(self, detection):
-        if detection['confidence'] < self.min_confidence:
-            self.detection_start = None
-            self.detection_count = 0
-            return False
-
-        if self.detection_start is None:
-            self.detection_start = datetime.now()
-            self.detection_count = 1
-        else:
-            self.detection_count += 1
-
-        duration = (datetime.now() - self.detection_start).total_seconds()
-        return duration >= self.min_duration
-
 class MainWindow(QMainWindow):
+    notification_signal = pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("YOLO Event Detector")
         self.setGeometry(100, 100, 1200, 800)
 
         # Variables
+        self.model_path = "yolov8n.pt"
         self.video_thread = None
         self.event_rules = []
+        self.rule_engine = RuleEngine(get_class_names(self.model_path))
+        # Las acciones se ejecutan en segundo plano; las notificaciones vuelven por señal
+        self.notification_signal.connect(self.show_notification)
+        self.dispatcher = ActionDispatcher(notify=self.notification_signal.emit,
+                                           smtp=SMTPSender.from_env())
+        metrics.gauge('queue_depth', 'Items waiting in a stage queue',
+                      fn=lambda: self.dispatcher.stats()['queue_depth'], queue='actions')
+        # Volcado periódico de métricas al log (METRICS_LOG_INTERVAL, 60 s por defecto)
+        self.metrics_logger = start_logger_from_env(default_interval=60)
 
         # Crear interfaz
         self.create_ui()
         # Cargar reglas después de crear los widgets
         self.load_rules()
 
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.update_stats)
+        self.stats_timer.start(1000)
+
     def create_ui(self):
         # Widget principal
         main_widget = QWidget()
@@ -220,9 +317,14 @@ class MainWindow(QMainWindow):
         left_panel.setLayout(left_layout)
 
         # Etiqueta para el video
-        self.video_label = QLabel()
-        self.video_label.setMinimumSize(640, 480)
-        left_layout.addWidget(self.video_label)
+        self.frame_buffer = LatestFrameBuffer(640, 480)
+        self.video_view = VideoView(self.frame_buffer)
+        self.video_view.setMinimumSize(640, 480)
+        left_layout.addWidget(self.video_view)
+        self.frames_label = QLabel()
+        left_layout.addWidget(self.frames_label)
+        metrics.counter('frames_dropped_total', 'Frames discarded by a full stage queue',
+                        fn=lambda: self.frame_buffer.dropped, queue='display')
 
         # Controles de cámara
         camera_layout = QHBoxLayout()
@@ -243,6 +345,27 @@ class MainWindow(QMainWindow):
         self.confidence_spin.valueChanged.connect(self.update_confidence)
         detection_layout.addWidget(QLabel("Confianza:"))
         detection_layout.addWidget(self.confidence_spin)
+        self.fps_spin = QSpinBox()
+        self.fps_spin.setRange(1, 120)
+        self.fps_spin.setValue(30)
+        self.fps_spin.valueChanged.connect(self.update_target_fps)
+        detection_layout.addWidget(QLabel("FPS objetivo:"))
+        detection_layout.addWidget(self.fps_spin)
+        self.profiler_check = QCheckBox("Profiler")
+        self.profiler_check.toggled.connect(self.toggle_profiler)
+        detection_layout.addWidget(self.profiler_check)
+        self.motion_check = QCheckBox("Sólo con movimiento")
+        self.motion_check.setToolTip("Inferir sólo cuando la escena cambia (ajustes por cámara en MOTION_CONFIG)")
+        detection_layout.addWidget(self.motion_check)
+        self.track_check = QCheckBox("Seguimiento")
+        self.track_check.setToolTip("IDs estables por objeto; se activa solo si hay reglas de entrada/salida/permanencia")
+        detection_layout.addWidget(self.track_check)
+        self.detect_every_spin = QSpinBox()
+        self.detect_every_spin.setRange(1, 30)
+        self.detect_every_spin.setValue(1)
+        self.detect_every_spin.setToolTip("Con seguimiento, el tracker mueve las cajas entre detecciones")
+        detection_layout.addWidget(QLabel("Detectar cada:"))
+        detection_layout.addWidget(self.detect_every_spin)
         left_layout.addLayout(detection_layout)
 
         # Panel derecho (eventos y reglas)
@@ -267,6 +390,9 @@ class MainWindow(QMainWindow):
         self.event_list = QListWidget()
         right_layout.addWidget(self.event_list)
 
+        self.dispatcher_label = QLabel()
+        right_layout.addWidget(self.dispatcher_label)
+
         # Botones de acción
         button_layout = QHBoxLayout()
         self.add_rule_button = QPushButton("Añadir Regla")
@@ -285,17 +411,19 @@ class MainWindow(QMainWindow):
         layout.addWidget(right_panel, 1)
 
     def load_classes(self):
-        model = YOLO("yolov8n.pt")
-        for class_name in model.names.values():
+        for class_name in get_class_names(self.model_path).values():
             self.class_list.addItem(class_name)
 
     def toggle_camera(self):
         if self.video_thread is None or not self.video_thread.running:
             # Iniciar cámara
             camera_index = self.camera_combo.currentIndex()
-            self.video_thread = VideoThread(camera_index)
-            self.video_thread.change_pixmap_signal.connect(self.update_image)
-            self.video_thread.detection_signal.connect(self.handle_detection)
+            self.video_thread = VideoThread(self.rule_engine, self.frame_buffer, camera_index,
+                                            self.model_path, self.fps_spin.value(),
+                                            self.motion_check.isChecked(), self.tracking_needed(),
+                                            self.detect_every_spin.value())
+            self.video_thread.frame_ready.connect(self.video_view.update)
+            self.video_thread.events_signal.connect(self.handle_events)
             self.video_thread.start()
             self.start_button.setText("Detener")
         else:
@@ -304,28 +432,67 @@ class MainWindow(QMainWindow):
             self.video_thread = None
             self.start_button.setText("Iniciar")
 
-    def update_image(self, frame):
-        rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_image.shape
-        bytes_per_line = ch * w
-        qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-        self.video_label.setPixmap(QPixmap.fromImage(qt_image).scaled(
-            self.video_label.width(), self.video_label.height(),
-            Qt.AspectRatioMode.KeepAspectRatio))
+    def tracking_needed(self):
+        """Tracking is on when asked for, or when some rule works on track events."""
+        return (self.track_check.isChecked() or self.detect_every_spin.value() > 1
+                or any(rule.event != 'presence' for rule in self.event_rules))
 
     def update_confidence(self):
         if self.video_thread:
             self.video_thread.confidence = self.confidence_spin.value() / 100
 
-    def handle_detection(self, detection):
-        # Actualizar lista de eventos
-        event_text = f"{detection['timestamp']} - {detection['class']} ({detection['confidence']:.2f})"
-        self.event_list.addItem(event_text)
+    def update_target_fps(self):
+        if self.video_thread:
+            self.video_thread.scheduler.target_fps = self.fps_spin.value()
 
-        # Verificar reglas
-        for rule in self.event_rules:
-            if rule.trigger_class == detection['class'] and rule.check_condition(detection):
-                self.execute_action(rule, detection)
+    def toggle_profiler(self, enabled):
+        if enabled:
+            profiler.start()
+            self.statusBar().showMessage("Profiler de muestreo iniciado", 5000)
+        else:
+            profiler.stop()
+            path = profiler.write_folded(os.getenv("PROFILE_OUTPUT", "profile.folded"))
+            self.statusBar().showMessage(f"Perfil guardado en {path} ({profiler.samples} muestras)", 10000)
+
+    def handle_events(self, events):
+        # Las reglas ya se evaluaron en el hilo de video; aquí sólo llegan eventos disparados
+        for event in events:
+            if 'track_id' in event:
+                event_text = (f"{event['timestamp']} - {event['class']} #{event['track_id']} "
+                              f"{EVENT_LABELS[event['event']]} ({event['duration']:.0f} s)")
+            else:
+                event_text = (f"{event['timestamp']} - {event['class']} x{event['count']} "
+                              f"({event['confidence']:.2f})")
+            self.event_list.addItem(event_text)
+            self.dispatcher.submit(event)
+
+    def show_notification(self, message):
+        # Notificación no modal: no bloquea la interfaz
+        self.statusBar().showMessage(f"Evento: {message}", 10000)
+        self.event_list.addItem(f"→ {message}")
+
+    def update_stats(self):
+        frames_text = (f"Frames: generados {self.frame_buffer.written}, mostrados {self.frame_buffer.read}, "
+                       f"descartados {self.frame_buffer.dropped}")
+        if self.video_thread:
+            sched = self.video_thread.scheduler.stats()
+            frames_text += (f" | Captura {sched['capture_fps']:.1f} FPS, inferencia {sched['inference_fps']:.1f} FPS "
+                            f"({sched['inference_ms']:.0f} ms, imgsz {sched['imgsz']}), "
+                            f"saltados {sched['skipped']}")
+            if self.video_thread.gated is not None:
+                gate = self.video_thread.gated.stats()
+                frames_text += (f" | Movimiento: sin cambios {gate['skipped']} "
+                                f"({gate['skip_ratio']:.0%}), ~{gate['saved_s']:.1f} s ahorrados")
+            if self.video_thread.tracked is not None:
+                tracks = self.video_thread.tracked.tracker.stats()
+                frames_text += (f" | Pistas: {tracks['active']} activas, {tracks['entered']} entradas, "
+                                f"{tracks['exited']} salidas")
+        self.frames_label.setText(frames_text)
+        stats = self.dispatcher.stats()
+        self.dispatcher_label.setText(
+            f"Acciones: cola {stats['queue_depth']}, ejecutadas {stats['executed']}, "
+            f"agrupadas {stats['coalesced']}, descartadas {stats['dropped']}, "
+            f"latencia p50 {stats['latency_p50_ms']:.0f} ms / p99 {stats['latency_p99_ms']:.0f} ms")
 
     def add_rule(self):
         selected_items = self.class_list.selectedItems()
@@ -342,12 +509,12 @@ class MainWindow(QMainWindow):
             for item in selected_items:
                 rule = EventRule(item.text(), config)
                 self.event_rules.append(rule)
-                self.video_thread.selected_classes.add(item.text())
 
                 # Actualizar lista de reglas
-                rule_text = f"{item.text()} - {config['action_type']}"
+                rule_text = f"{item.text()} - {EVENT_LABELS[rule.event]} - {config['action_type']}"
                 self.rules_list.addItem(rule_text)
 
+            self.rule_engine.set_rules(self.event_rules)
             self.save_rules()
 
     def remove_rule(self):
@@ -361,95 +528,39 @@ class MainWindow(QMainWindow):
         indices.sort(reverse=True)  # Eliminar de atrás hacia adelante
 
         for index in indices:
-            rule = self.event_rules[index]
-            # Solo modificar selected_classes si el hilo está activo y la clase está presente
-            if self.video_thread and rule.trigger_class in self.video_thread.selected_classes:
-                self.video_thread.selected_classes.remove(rule.trigger_class)
             self.event_rules.pop(index)
             self.rules_list.takeItem(index)
 
+        self.rule_engine.set_rules(self.event_rules)
         self.save_rules()
 
-    def execute_action(self, rule, detection):
-        if rule.action_type == "notify":
-            QMessageBox.information(self, "Evento Detectado",
-                                  f"Se detectó {detection['class']} with confidence {detection['confidence']:.2f}")
-
-        elif rule.action_type == "command" and rule.command:
-            try:
-                subprocess.Popen(rule.command, shell=True)
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"Error al ejecutar comando: {str(e)}")
-
-        elif rule.action_type == "email" and rule.email_to:
-            try:
-                # Configurar email
-                msg = MIMEMultipart()
-                msg['From'] = "yolo_detector@example.com"  # Cambiar por tu email
-                msg['To'] = rule.email_to
-                msg['Subject'] = rule.email_subject
-
-                # Personalizar cuerpo del email
-                body = rule.email_body.format(
-                    class_name=detection['class'],
-                    confidence=detection['confidence'],
-                    timestamp=detection['timestamp']
-                )
-                msg.attach(MIMEText(body, 'plain'))
-
-                # Enviar email (necesitarás configurar el servidor SMTP)
-                # server = smtplib.SMTP('smtp.gmail.com', 587)
-                # server.starttls()
-                # server.login("tu_email@gmail.com", "tu_contraseña")
-                # server.send_message(msg)
-                # server.quit()
-
-                QMessageBox.information(self, "Email Enviado",
-                                      f"Se ha enviado un email a {rule.email_to}")
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"Error al enviar email: {str(e)}")
-
     def clear_events(self):
         self.event_list.clear()
 
     def save_rules(self):
-        rules_data = [{
-            'trigger_class': rule.trigger_class,
-            'min_confidence': rule.min_confidence,
-            'min_duration': rule.min_duration,
-            'action_type': rule.action_type,
-            'command': rule.command,
-            'email_to': rule.email_to,
-            'email_subject': rule.email_subject,
-            'email_body': rule.email_body
-        } for rule in self.event_rules]
-
-        with open('event_rules.json', 'w') as f:
-            json.dump(rules_data, f)
+        save_rules(self.event_rules, 'event_rules.json')
 
     def load_rules(self):
-        try:
-            with open('event_rules.json', 'r') as f:
-                rules_data = json.load(f)
-                self.event_rules = [
-                    EventRule(rule['trigger_class'], rule)
-                    for rule in rules_data
-                ]
+        self.event_rules = load_rules('event_rules.json')
+        self.rule_engine.set_rules(self.event_rules)
 
-                # Actualizar lista de reglas
-                for rule in self.event_rules:
-                    rule_text = f"{rule.trigger_class} - {rule.action_type}"
-                    self.rules_list.addItem(rule_text)
-        except FileNotFoundError:
-            self.event_rules = []
+        # Actualizar lista de reglas
+        for rule in self.event_rules:
+            rule_text = f"{rule.trigger_class} - {EVENT_LABELS.get(rule.event, rule.event)} - {rule.action_type}"
+            self.rules_list.addItem(rule_text)
 
     def closeEvent(self, event):
         if self.video_thread:
             self.video_thread.stop()
+        self.dispatcher.stop()
+        if self.metrics_logger is not None:
+            self.metrics_logger.stop()
         event.accept()
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
+    # SIGUSR1 activa/desactiva el profiler de muestreo sin tocar la interfaz
+    install_profiler_signal()
     window = MainWindow()
     window.show()
     sys.exit(app.exec())
@@ -0,0 +1,94 @@
+"""
+YOLO multi-camera runner
+
+Feeds N sources (camera indices, video files or RTSP/HTTP URLs) into one shared model. Frames
+from all streams are batched together with fair round-robin scheduling, and per-stream FPS and
+latency are reported periodically.
+
+Usage:
+    python yolo_multicam.py 0 1 rtsp://camera/stream
+    python yolo_multicam.py a.mp4 b.mp4 c.mp4 --headless --duration 60
+"""
+import argparse
+import threading
+import time
+
+import cv2
+
+from yolo_core.backends import BACKENDS
+from yolo_core.model_registry import get_model
+from yolo_core.multistream import MultiStreamRunner
+from yolo_core.queues import DropOldestQueue
+from yolo_core.renderer import AnnotationRenderer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='YOLO multi-camera runner with a shared model')
+    parser.add_argument('sources', nargs='+', help='Camera indices, video files or stream URLs')
+    parser.add_argument('--model', type=str, default='yolov8n.pt', help='Model path')
+    parser.add_argument('--backend', type=str, default=None, choices=BACKENDS,
+                        help='Inference backend (default: YOLO_BACKEND or torch)')
+    parser.add_argument('--conf', type=float, default=0.5, help='Confidence threshold')
+    parser.add_argument('--imgsz', type=int, default=640, help='Inference image size')
+    parser.add_argument('--max-batch', type=int, default=None, help='Max frames per model call (default: one per stream)')
+    parser.add_argument('--duration', type=float, default=None, help='Stop after N seconds')
+    parser.add_argument('--report-every', type=float, default=5.0, help='Seconds between stats reports')
+    parser.add_argument('--headless', action='store_true', help='Do not open display windows')
+    parser.add_argument('--no-realtime', action='store_true', help='Read video files as fast as possible')
+    return parser.parse_args()
+
+
+def print_report(stats):
+    print(f"Lotes: {stats['batches']}, tamaño medio {stats['mean_batch_size']:.1f}, "
+          f"inferencia {stats['inference_s']:.1f} s")
+    for i, s in enumerate(stats['streams']):
+        print(f"  [{i}] {s['source']}: captura {s['capture_fps']:.1f} FPS, inferencia {s['inference_fps']:.1f} FPS, "
+              f"latencia p50 {s['latency_p50_ms']:.0f} ms / p99 {s['latency_p99_ms']:.0f} ms, "
+              f"procesados {s['processed']}, descartados {s['dropped']}")
+
+
+def main():
+    args = parse_args()
+    model = get_model(args.model, args.backend)
+
+    displays = [DropOldestQueue(1) for _ in args.sources]
+    # on_result corre siempre en el hilo del runner: un único renderizador basta
+    renderer = AnnotationRenderer(model.names)
+
+    def on_result(stream_id, frame, result, detections):
+        if not args.headless:
+            displays[stream_id].put_latest(renderer.draw(frame, detections))
+
+    runner = MultiStreamRunner(model, args.sources, conf=args.conf, imgsz=args.imgsz,
+                               max_batch=args.max_batch, on_result=on_result,
+                               realtime=not args.no_realtime)
+    worker = threading.Thread(target=runner.run, kwargs={'duration': args.duration}, daemon=True)
+    worker.start()
+
+    # Las ventanas de OpenCV se manejan desde el hilo principal
+    last_report = time.monotonic()
+    try:
+        while worker.is_alive():
+            if args.headless:
+                worker.join(timeout=0.2)
+            else:
+                for i, display in enumerate(displays):
+                    if not display.empty():
+                        cv2.imshow(f"YOLO Stream {i}", display.get_nowait())
+                if cv2.waitKey(10) & 0xFF == ord('q'):
+                    break
+            if time.monotonic() - last_report >= args.report_every:
+                last_report = time.monotonic()
+                print_report(runner.stats())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        runner.stop()
+        worker.join(timeout=2)
+        if not args.headless:
+            cv2.destroyAllWindows()
+    print_report(runner.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,301 @@
 import cv2
+import os
 import time
 import argparse
-from ultralytics import YOLO
+import threading
+from yolo_core.backends import BACKENDS
+from yolo_core.model_registry import get_model
+from yolo_core.queues import DropOldestQueue
+from yolo_core.metrics import metrics, profiler, MetricsLogger, install_profiler_signal
+from yolo_core.detections import Detections
+from yolo_core.renderer import AnnotationRenderer
+from yolo_core.recorder import VideoRecorder, capture_fps
+from yolo_core.rules import EventRule, RuleEngine, load_rules
+from yolo_core.tiling import TiledDetector
+from yolo_core.motion import METHODS, GatedDetector, MotionGate, load_motion_config
+from yolo_core.tracker import TrackedDetector, Tracker
 import numpy as np
 
 def parse_args():
     parser = argparse.ArgumentParser(description='YOLO Real-time Object Detection')
     parser.add_argument('--model', type=str, default='yolov8n.pt', help='Model path')
     parser.add_argument('--camera', type=int, default=0, help='Camera index')
+    parser.add_argument('--source', type=str, default=None, help='Video file (overrides --camera)')
+    parser.add_argument('--backend', type=str, default=None, choices=BACKENDS,
+                        help='Inference backend (default: YOLO_BACKEND or torch)')
     parser.add_argument('--conf', type=float, default=0.5, help='Confidence threshold')
-    parser.add_argument('--save', action='store_true', help='Save video')
+    parser.add_argument('--save', action='store_true', help='Record video continuously')
+    parser.add_argument('--record-on', nargs='+', default=None, metavar='CLASS',
+                        help='Record only around detections of these classes (event mode)')
+    parser.add_argument('--record-rules', type=str, default=None,
+                        help='Record only around events fired by this rules file (event mode)')
+    parser.add_argument('--record-dir', type=str, default='recordings', help='Recordings directory')
+    parser.add_argument('--segment-seconds', type=float, default=300, help='Start a new file every N seconds')
+    parser.add_argument('--segment-mb', type=float, default=0, help='Start a new file at N MB (0 = no limit)')
+    parser.add_argument('--max-disk-mb', type=float, default=0,
+                        help='Delete the oldest recordings above N MB (0 = keep all)')
+    parser.add_argument('--pre-roll', type=float, default=5.0, help='Seconds recorded before an event')
+    parser.add_argument('--post-roll', type=float, default=10.0, help='Seconds recorded after the last event')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Run capture, inference and annotate/encode in separate threads')
+    parser.add_argument('--queue-size', type=int, default=2, help='Bounded queue size between stages')
+    parser.add_argument('--headless', action='store_true', help='Do not open a display window')
+    parser.add_argument('--tile', type=int, default=0,
+                        help='Sliced inference with N-pixel tiles for high-resolution sources (0 = off)')
+    parser.add_argument('--tile-overlap', type=float, default=0.2, help='Overlap between tiles (fraction)')
+    parser.add_argument('--skip-static-tiles', action='store_true',
+                        help='Reuse the last detections of tiles that did not change')
+    parser.add_argument('--motion', action='store_true',
+                        help='Run the model only when the scene changed (reuse detections otherwise)')
+    parser.add_argument('--motion-threshold', type=float, default=None,
+                        help='Fraction of changed pixels that triggers inference (default 0.002)')
+    parser.add_argument('--max-stale', type=float, default=None,
+                        help='Run the model at least every N seconds (default 2)')
+    parser.add_argument('--motion-method', type=str, default=None, choices=METHODS,
+                        help='Frame difference or MOG2 background subtraction (default diff)')
+    parser.add_argument('--motion-regions', action='store_true',
+                        help='Only run the model on the changed region when the change is local')
+    parser.add_argument('--motion-config', type=str, default=None,
+                        help='Per-camera motion settings JSON (default: MOTION_CONFIG)')
+    parser.add_argument('--track', action='store_true',
+                        help='Track objects (stable IDs); rules can fire on enter/exit/dwell')
+    parser.add_argument('--detect-every', type=int, default=1,
+                        help='Run detection every N frames and let the tracker carry the boxes (implies --track)')
+    parser.add_argument('--track-iou', type=float, default=0.3, help='Minimum IoU to match a box to a track')
+    parser.add_argument('--track-max-age', type=float, default=1.0,
+                        help='Seconds a track survives without detections before it exits')
+    parser.add_argument('--metrics-interval', type=float, default=0,
+                        help='Print stage timings and counters every N seconds (0 = only at exit)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Start the sampling profiler (also toggled at runtime with SIGUSR1)')
     return parser.parse_args()
 
-def main():
-    args = parse_args()
+def open_capture(args):
+    source = args.source if args.source is not None else args.camera
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        print(f"Error: No se pudo abrir la fuente {source}")
+        return None
+    return cap
 
-    # Cargar modelo
-    model = YOLO(args.model)
+def open_recorder(cap, args):
+    """Background recorder for --save (continuous) or --record-on/--record-rules (event clips)."""
+    event = bool(args.record_on or args.record_rules)
+    if not (args.save or event):
+        return None
+    mb = 1024 * 1024
+    return VideoRecorder(
+        output_dir=args.record_dir,
+        fps=capture_fps(cap),
+        segment_seconds=args.segment_seconds,
+        segment_bytes=args.segment_mb * mb or None,
+        max_total_bytes=args.max_disk_mb * mb or None,
+        mode='event' if event else 'continuous',
+        pre_roll=args.pre_roll,
+        post_roll=args.post_roll,
+    )
 
-    # Configurar cámara
-    cap = cv2.VideoCapture(args.camera)
-    if not cap.isOpened():
-        print(f"Error: No se pudo abrir la cámara {args.camera}")
-        return
+def record_triggers(model, args):
+    """
+    Rule engine whose fired events start/extend event clips (actions in the rules are ignored).
+    With --track the rules file can use enter/exit/dwell rules and presence follows the tracks.
+    """
+    rules = load_rules(args.record_rules) if args.record_rules else []
+    # Mientras la clase siga presente la regla vuelve a dispararse y alarga el clip
+    rules += [EventRule(name, {'min_confidence': args.conf, 'repeat_interval': 1.0})
+              for name in args.record_on or []]
+    return RuleEngine(model.names, rules) if rules else None
 
-    # Configurar grabación de video si se solicita
-    if args.save:
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter('output.mp4', fourcc, fps, (width, height))
+def print_recorder_stats(recorder):
+    stats = recorder.stats()
+    print(f"Grabación ({stats['mode']}, {stats['fps'] or 0:.1f} FPS): {stats['frames_written']} frames escritos, "
+          f"{stats['frames_dropped']} descartados, {stats['frames_repeated']} repetidos, "
+          f"{stats['segments']} segmentos, {stats['segments_deleted']} borrados por cuota")
+
+_STOP = object()
+
+class Pipeline:
+    """Capture -> inference -> annotate/encode, each stage on its own thread."""
+
+    def __init__(self, model, cap, conf, writer=None, queue_size=2, display=True, triggers=None, detector=None):
+        self.model = model
+        self.detector = detector or (lambda frame: (detect(model, None, frame, conf), None))
+        self.cap = cap
+        self.conf = conf
+        self.writer = writer
+        self.triggers = triggers
+        self.display = display
+        self.stop_event = threading.Event()
+        self.frames = DropOldestQueue(queue_size)
+        self.results = DropOldestQueue(queue_size)
+        self.shown = DropOldestQueue(1)
+        self.renderer = AnnotationRenderer(model.names)
+        self.frames_done = metrics.counter('frames_total', 'Frames fully processed')
+        for name, q in (('capture', self.frames), ('inference', self.results)):
+            metrics.counter('frames_dropped_total', 'Frames discarded by a full stage queue',
+                            fn=lambda q=q: q.dropped, queue=name)
+            metrics.gauge('queue_depth', 'Items waiting in a stage queue', fn=q.qsize, queue=name)
+        self.threads = [
+            threading.Thread(target=self._capture, daemon=True),
+            threading.Thread(target=self._infer, daemon=True),
+            threading.Thread(target=self._annotate, daemon=True),
+        ]
+
+    def _capture(self):
+        timer = metrics.stage('capture')
+        while not self.stop_event.is_set():
+            t0 = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            timer.observe(time.perf_counter() - t0)
+            # Si inferencia va atrasada se descarta el frame más viejo
+            self.frames.put_latest(frame)
+        self.frames.close(_STOP)
+
+    def _infer(self):
+        while True:
+            frame = self.frames.get()
+            if frame is _STOP:
+                break
+            self.results.put_latest((frame, *self.detector(frame)))
+        self.results.close(_STOP)
+
+    def _annotate(self):
+        prev_time = 0
+        while True:
+            item = self.results.get()
+            if item is _STOP:
+                break
+            self.frames_done.inc()
+            # Sin ventana ni grabación no hace falta dibujar nada
+            if not (self.display or self.writer is not None):
+                continue
+            frame, detections, events = item
+            with metrics.time('plot'):
+                annotated_frame, _ = self.renderer.render(frame, detections)
+            curr_time = time.perf_counter()
+            fps = 1 / (curr_time - prev_time) if prev_time > 0 else 0
+            prev_time = curr_time
+            cv2.putText(annotated_frame, f'FPS: {fps:.1f}', (20, 40),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            if self.writer is not None:
+                # El recorder codifica en su propio hilo; aquí sólo se encola
+                self.writer.write(annotated_frame)
+                if self.triggers is not None and self.triggers.evaluate(detections, track_events=events):
+                    self.writer.trigger()
+            if self.display:
+                self.shown.put_latest(annotated_frame)
+        self.shown.close(_STOP)
+
+    def run(self):
+        start = time.perf_counter()
+        for t in self.threads:
+            t.start()
+
+        # La ventana de OpenCV debe manejarse desde el hilo principal
+        while True:
+            if self.display:
+                frame = self.shown.get()
+                if frame is _STOP:
+                    break
+                with metrics.time('display'):
+                    cv2.imshow("YOLO Real-Time", frame)
+                    key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
+                    break
+            else:
+                self.threads[-1].join(timeout=0.5)
+                if not self.threads[-1].is_alive():
+                    break
+
+        self.stop_event.set()
+        for t in self.threads:
+            t.join(timeout=2)
+        self.report(time.perf_counter() - start)
+
+    def report(self, elapsed):
+        for line in metrics.summary_lines():
+            print(line)
+        annotated = self.frames_done.value
+        print(f"Descartados: captura->inferencia {self.frames.dropped}, "
+              f"inferencia->anotación {self.results.dropped}")
+        if elapsed > 0:
+            print(f"Total: {annotated} frames en {elapsed:.1f} s ({annotated / elapsed:.1f} FPS)")
+
+def detect(model, tiler, frame, conf):
+    """Detections for one frame, whole or tiled."""
+    if tiler is not None:
+        return tiler(frame, conf=conf)
+    with metrics.time('model'):
+        results = model(frame, conf=conf, verbose=False)
+    metrics.observe_speed(results)
+    return Detections.from_result(results[0])
+
+def make_detector(model, args):
+    """
+    Frame -> (detections, track events) for this run: whole frame or tiled, optionally behind a
+    motion gate, optionally tracked. Also returns the gate and the tracking stage for stats.
+    """
+    # Inferencia por tiles: un tiler por fuente, porque recuerda qué tiles cambiaron
+    tiler = None
+    if args.tile > 0:
+        tiler = TiledDetector(model, tile=args.tile, overlap=args.tile_overlap,
+                              skip_unchanged=args.skip_static_tiles)
+
+    def detector(frame):
+        return detect(model, tiler, frame, args.conf)
 
+    camera = args.source if args.source is not None else args.camera
+    gated = None
+    if args.motion:
+        gated = make_gate(detector, camera, tiler is not None, args)
+        detector = lambda frame: gated(frame)[0]
+
+    if not (args.track or args.detect_every > 1):
+        return (lambda frame: (detector(frame), None)), gated, None
+    # Detectar cada N frames: entre detecciones el tracker predice dónde están las cajas
+    tracker = Tracker(iou_threshold=args.track_iou, max_age=args.track_max_age, names=model.names, camera=camera)
+    tracked = TrackedDetector(detector, tracker, detect_every=args.detect_every)
+    return tracked, gated, tracked
+
+def make_gate(detector, camera, tiled, args):
+    """Motion gate with the per-camera MOTION_CONFIG settings overridden by the CLI flags."""
+    settings = load_motion_config(camera, args.motion_config)
+    for key, value in (('threshold', args.motion_threshold), ('max_stale', args.max_stale),
+                       ('method', args.motion_method), ('regions', args.motion_regions or None)):
+        if value is not None:
+            settings[key] = value
+    if tiled and settings.get('regions'):
+        # Los recortes cambian de tamaño en cada frame y anularían la caché de tiles
+        print("Aviso: --motion-regions no se usa junto con --tile")
+        settings['regions'] = False
+    return GatedDetector(detector, MotionGate(**settings), camera=camera)
+
+def print_gate_stats(gated):
+    stats = gated.stats()
+    print(f"Compuerta de movimiento: {stats['inferred']} inferencias, {stats['region_inferences']} por región, "
+          f"{stats['skipped']} frames saltados ({stats['skip_ratio']:.0%}), "
+          f"{stats['gate_ms']:.2f} ms/frame, ~{stats['saved_s']:.1f} s de inferencia ahorrados")
+
+def print_track_stats(tracked):
+    stats = tracked.tracker.stats()
+    events = stats['entered'] + stats['exited']
+    print(f"Seguimiento: {stats['entered']} pistas nuevas, {stats['exited']} salidas, {stats['active']} activas; "
+          f"{tracked.detections} detecciones en {tracked.frames} frames, "
+          f"{stats['boxes']} cajas -> {events} eventos")
+
+def run_sequential(model, cap, args, out, triggers=None, detector=None):
     # Variables para FPS
     prev_time = 0
     curr_time = 0
+    frames_done = metrics.counter('frames_total', 'Frames fully processed')
+    renderer = AnnotationRenderer(model.names)
+    draw = not args.headless or out is not None
 
     while True:
-        ret, frame = cap.read()
+        with metrics.time('capture'):
+            ret, frame = cap.read()
         if not ret:
             break
 
@@ -47,31 +305,88 @@ def main():
         prev_time = curr_time
 
         # Infiere con YOLO
-        results = model(frame, conf=args.conf)
+        if detector is not None:
+            detections, events = detector(frame)
+        else:
+            detections, events = detect(model, None, frame, args.conf), None
 
-        # Dibuja las detecciones en el frame
-        annotated_frame = results[0].plot()
+        frames_done.inc()
+        if not draw:
+            continue
+
+        # Dibuja las detecciones directamente sobre el frame capturado
+        with metrics.time('plot'):
+            annotated_frame, _ = renderer.render(frame, detections)
 
         # Añadir FPS al frame
         cv2.putText(annotated_frame, f'FPS: {fps:.1f}', (20, 40),
                     cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
 
-        # Guardar frame si se solicita
-        if args.save:
+        # Guardar frame si se solicita (encolado; se codifica en segundo plano)
+        if out is not None:
             out.write(annotated_frame)
+            if triggers is not None and triggers.evaluate(detections, track_events=events):
+                out.trigger()
 
         # Mostrar el frame
-        cv2.imshow("YOLO Real-Time", annotated_frame)
+        if not args.headless:
+            with metrics.time('display'):
+                cv2.imshow("YOLO Real-Time", annotated_frame)
+                key = cv2.waitKey(1) & 0xFF
 
-        # Salir con 'q'
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+            # Salir con 'q'
+            if key == ord('q'):
+                break
+
+def main():
+    args = parse_args()
+
+    # Métricas periódicas y profiler activable con SIGUSR1
+    install_profiler_signal()
+    if args.profile:
+        profiler.start()
+    logger = MetricsLogger(metrics, args.metrics_interval) if args.metrics_interval > 0 else None
+    if logger is not None:
+        logger.start()
+
+    # Cargar modelo
+    model = get_model(args.model, args.backend)
+
+    # Configurar cámara o archivo de video
+    cap = open_capture(args)
+    if cap is None:
+        return
+
+    # Configurar grabación de video si se solicita
+    out = open_recorder(cap, args)
+    triggers = record_triggers(model, args) if out is not None and out.mode == 'event' else None
+
+    detector, gated, tracked = make_detector(model, args)
+
+    if args.pipeline:
+        Pipeline(model, cap, args.conf, writer=out, queue_size=args.queue_size,
+                 display=not args.headless, triggers=triggers, detector=detector).run()
+    else:
+        run_sequential(model, cap, args, out, triggers, detector)
+        for line in metrics.summary_lines():
+            print(line)
+    if gated is not None:
+        print_gate_stats(gated)
+    if tracked is not None:
+        print_track_stats(tracked)
 
     # Liberar recursos
     cap.release()
-    if args.save:
-        out.release()
-    cv2.destroyAllWindows()
+    if out is not None:
+        out.close()
+        print_recorder_stats(out)
+    if not args.headless:
+        cv2.destroyAllWindows()
+    if logger is not None:
+        logger.stop()
+    if profiler.running:
+        profiler.stop()
+        print(f"Perfil guardado en {profiler.write_folded(os.getenv('PROFILE_OUTPUT', 'profile.folded'))}")
 
 if __name__ == "__main__":
     main()